@@ -1,11 +1,16 @@
 import sys
 import os
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import asyncio
+from contextlib import asynccontextmanager
+import time
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pydantic import BaseModel, ConfigDict
 import uvicorn
 from dotenv import load_dotenv
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import uuid
+from datetime import datetime
 
 # Ensure src modules can be imported
 sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
@@ -13,12 +18,112 @@ sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
 # Load environment variables
 load_dotenv()
 
-from calender.main import run
+from calender.main import run_cached
+from calender.plan_cache import plan_cache
+from calender.progress import format_sse
+from calender.batch import run_batch
+from calender.replan import planner_llm_call, replan
+from calender.cancellation import CancelToken, RunCancelled, DEADLINE, PLAN_DEADLINE_SECONDS
+from calender.workers import CREW_WORKERS, crew_workers
+from calender.metrics import METRICS_ENABLED, REQUESTS_IN_FLIGHT, REQUEST_LATENCY, registry
+from jobs import JobStore, JobManager, DEFAULT_DB_PATH
+
+# Crew runs are synchronous and can take minutes, so they execute on a bounded
+# worker pool instead of inside the event loop.
+job_manager = JobManager(
+    JobStore(os.getenv("JOB_DB_PATH", DEFAULT_DB_PATH)),
+    run_cached,
+    # With crew worker processes these threads only wait on them, so allow one per worker
+    max_workers=int(os.getenv("JOB_WORKERS", max(2, CREW_WORKERS))),
+)
+
+# Upper bound for a single long-poll on /jobs/{id}/wait
+MAX_WAIT_SECONDS = 60.0
+
+# Idle seconds between SSE keep-alive comments on /run/stream
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", 15))
+
+# /run/batch limits; requests may ask for less concurrency but not more than the maximum
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 3))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", 8))
+BATCH_LLM_RPM = float(os.getenv("BATCH_LLM_RPM", 0)) or None
+BATCH_MAX_TOPICS = int(os.getenv("BATCH_MAX_TOPICS", 50))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if crew_workers is not None:
+        crew_workers.start()
+    job_manager.start()
+    yield
+    job_manager.shutdown()
+    if crew_workers is not None:
+        crew_workers.shutdown()
+
+
+app = FastAPI(
+    title="Calendar Agent API",
+    description="API for scheduling tasks using CrewAI agents.",
+    lifespan=lifespan,
+)
+
+if METRICS_ENABLED:
+    @app.middleware("http")
+    async def record_request_metrics(request: Request, call_next):
+        start = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc(server="api")
+        try:
+            return await call_next(request)
+        finally:
+            REQUESTS_IN_FLIGHT.dec(server="api")
+            # Label by route template so /jobs/{job_id} is one series
+            route = request.scope.get("route")
+            REQUEST_LATENCY.observe(time.perf_counter() - start, route=getattr(route, "path", "unmatched"))
+
+
+class BusyInterval(BaseModel):
+    start: datetime
+    end: datetime
 
-app = FastAPI(title="Calendar Agent API", description="API for scheduling tasks using CrewAI agents.")
 
 class TaskRequest(BaseModel):
     input_task: str
+    # Existing calendar events the scheduler must keep free
+    busy: List[BusyInterval] = []
+    # Stop the crew run after this many seconds (defaults to PLAN_DEADLINE_SECONDS)
+    deadline_seconds: Optional[float] = None
+
+
+def _busy(request: TaskRequest):
+    return [(interval.start, interval.end) for interval in request.busy]
+
+
+class JobRequest(BaseModel):
+    # Jobs are stored by topic alone and may run after a restart, so busy times and
+    # deadlines are rejected rather than silently dropped
+    model_config = ConfigDict(extra="forbid")
+
+    input_task: str
+
+
+class ReplanRequest(BaseModel):
+    # The previous roadmap items, e.g. the result of /run
+    plan: List[Dict[str, Any]]
+    # update/remove/add/revise operations (see calender.replan.replan)
+    delta: List[Dict[str, Any]]
+    # The original topic, sent as context when the delta has free-text requests
+    topic: str = ""
+    busy: List[BusyInterval] = []
+    deadline_seconds: Optional[float] = None
+
+
+class BatchRequest(BaseModel):
+    topics: List[str]
+    max_concurrency: Optional[int] = None
+    llm_rpm: Optional[float] = None
+    stream: bool = False
+    # Stop the whole batch after this many seconds; unfinished topics report "cancelled"
+    deadline_seconds: Optional[float] = None
 
 
 class MCPRequest(BaseModel):
@@ -40,28 +145,220 @@ def _extract_input_from_mcp(req: MCPRequest) -> str:
         return str(req.inputs)
     raise ValueError("No input provided in MCP request")
 
+
+def _cancel_token(deadline_seconds: Optional[float] = None) -> CancelToken:
+    return CancelToken(deadline_seconds or PLAN_DEADLINE_SECONDS)
+
+
+async def _cancel_on_disconnect(http_request: Request, token: CancelToken):
+    # The body has been read, so the next message is the disconnect. Request.is_disconnected()
+    # only peeks and misses it behind the metrics middleware.
+    while (await http_request.receive())["type"] != "http.disconnect":
+        pass
+    token.cancel("client disconnected")
+
+
+async def _run_in_pool(input_task: str, busy=(), http_request: Optional[Request] = None,
+                       deadline_seconds: Optional[float] = None):
+    """
+    Run the crew on the job worker pool without blocking the event loop.
+    The run stops early when the client disconnects or the deadline passes.
+    """
+    return await _run_with_token(lambda token: run_cached(input_task, busy=busy, cancel=token),
+                                 http_request, deadline_seconds)
+
+
+async def _run_with_token(work, http_request: Optional[Request] = None, deadline_seconds: Optional[float] = None,
+                          driver: bool = False):
+    """
+    Run `work(token)` on the job worker pool; the token is cancelled on disconnect and carries the deadline.
+    With `driver`, `work` only waits on runs it queues on the job pool itself, so it runs on the
+    event loop's default pool instead of taking one of their slots.
+    """
+    token = _cancel_token(deadline_seconds)
+    watcher = asyncio.create_task(_cancel_on_disconnect(http_request, token)) if http_request is not None else None
+    try:
+        if driver:
+            return await asyncio.get_running_loop().run_in_executor(None, work, token)
+        return await asyncio.wrap_future(job_manager.executor.submit(work, token))
+    except asyncio.CancelledError:
+        token.cancel()
+        raise
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+
+
+def _cancelled_response(e: RunCancelled) -> HTTPException:
+    # 499 (client closed request) is only ever seen in logs; the client is gone
+    return HTTPException(status_code=504 if e.reason == DEADLINE else 499, detail=str(e))
+
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/cache/stats")
+def cache_stats():
+    """Plan cache hit/miss counters, useful for tuning PLAN_CACHE_TTL."""
+    return plan_cache.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Latency histograms, counters and in-flight gauges in the Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/run")
-async def run_task(request: TaskRequest):
+async def run_task(request: TaskRequest, http_request: Request):
     """
     Run the calendar crew with a given task.
     """
     try:
         # result is likely a string or a CrewOutput object. 
         # API requires a serializable format.
-        result = run(request.input_task)
+        result = await _run_in_pool(request.input_task, _busy(request), http_request, request.deadline_seconds)
         
         # If result is complex, we might need to str() it or extract logic
         return {"status": "success", "result": str(result)}
+    except RunCancelled as e:
+        raise _cancelled_response(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _sse_response(work, executor=None, token: Optional[CancelToken] = None) -> StreamingResponse:
+    """
+    Run `work(emit, token)` on a worker thread and stream every event it emits as Server-Sent Events.
+    An `accepted` event is sent before the work starts so the client gets its first byte right away.
+    If the client disconnects first, `token` is cancelled so the work can stop early.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    token = token or _cancel_token()
+
+    def emit(event):
+        # Called from the worker thread
+        loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def run():
+        try:
+            work(emit, token)
+        except RunCancelled as e:
+            emit({"event": "cancelled", "reason": e.reason, "detail": str(e)})
+        except Exception as e:
+            emit({"event": "error", "detail": str(e)})
+        finally:
+            emit(None)
+
+    loop.run_in_executor(executor, run)
+
+    async def events():
+        finished = False
+        try:
+            yield format_sse({"event": "accepted"})
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    finished = True
+                    break
+                yield format_sse(event)
+        finally:
+            # Starlette stops this generator when the client disconnects
+            if not finished:
+                token.cancel("client disconnected")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/run/stream")
+async def run_task_stream(request: TaskRequest):
+    """
+    Run the calendar crew and stream its progress as Server-Sent Events.
+
+    Events: accepted, crew_started, agent_started, tool_called, partial_output,
+    task_finished, then crew_finished (with the plan), cancelled (deadline) or error.
+    """
+    def work(emit, token):
+        result = run_cached(request.input_task, on_event=emit, busy=_busy(request), cancel=token)
+        emit({"event": "crew_finished", "result": str(result)})
+
+    return _sse_response(work, job_manager.executor, _cancel_token(request.deadline_seconds))
+
+
+@app.post("/run/batch")
+async def run_batch_endpoint(request: BatchRequest, http_request: Request):
+    """
+    Plan many topics concurrently.
+
+    Each item reports its own status, so one failing topic does not fail the batch.
+    With `"stream": true` results are sent as Server-Sent Events (`item` for each
+    finished topic, then `batch_finished` with throughput figures); otherwise the
+    response lists the results in input order.
+    """
+    if not request.topics:
+        raise HTTPException(status_code=400, detail="No topics provided")
+    if len(request.topics) > BATCH_MAX_TOPICS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_TOPICS} topics per batch")
+
+    concurrency = min(request.max_concurrency or BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    llm_rpm = request.llm_rpm or BATCH_LLM_RPM
+
+    def items(token):
+        return run_batch(request.topics, run_cached, max_concurrency=concurrency, llm_rpm=llm_rpm, cancel=token,
+                         executor=job_manager.executor)
+
+    if request.stream:
+        def work(emit, token):
+            for item in items(token):
+                if item.pop("summary", False):
+                    emit({"event": "batch_finished", **item})
+                else:
+                    emit({"event": "item", **item})
+
+        return _sse_response(work, token=_cancel_token(request.deadline_seconds))
+
+    results = await _run_with_token(lambda token: list(items(token)), http_request, request.deadline_seconds,
+                                    driver=True)
+    summary = results.pop()
+    summary.pop("summary")
+    results.sort(key=lambda item: item["index"])
+    return {"status": "success", "results": results, "summary": summary}
+
+
+@app.post("/replan")
+async def replan_task(request: ReplanRequest, http_request: Request):
+    """
+    Apply a delta to a previous plan instead of running the crew again.
+
+    Explicit edits are applied locally, free-text requests cost one short LLM call, and
+    unchanged tasks keep their calendar slots while changed ones are re-slotted.
+    """
+    if not request.delta:
+        raise HTTPException(status_code=400, detail="No delta provided")
+
+    def work(token):
+        return replan(request.plan, request.delta, planner_llm_call, _busy(request), request.topic, cancel=token)
+
+    try:
+        result = await _run_with_token(work, http_request, request.deadline_seconds)
+    except RunCancelled as e:
+        raise _cancelled_response(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"status": "success", **result}
+
+
 @app.post("/mcp/invoke")
-async def mcp_invoke(request: MCPRequest):
+async def mcp_invoke(request: MCPRequest, http_request: Request):
     """
     Minimal MCP-compatible invoke endpoint.
 
@@ -75,7 +372,7 @@ async def mcp_invoke(request: MCPRequest):
         raise HTTPException(status_code=400, detail=str(e))
 
     try:
-        result = run(input_text)
+        result = await _run_in_pool(input_text, http_request=http_request)
 
         response = {
             "mcp_version": "1.0",
@@ -90,9 +387,41 @@ async def mcp_invoke(request: MCPRequest):
         }
 
         return response
+    except RunCancelled as e:
+        raise _cancelled_response(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@app.post("/jobs", status_code=202)
+async def create_job(request: JobRequest):
+    """
+    Queue a crew run and return its job id immediately.
+    Poll GET /jobs/{job_id} or long-poll GET /jobs/{job_id}/wait for the result.
+    """
+    job_id = job_manager.submit(request.input_task)
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/jobs/{job_id}/wait")
+async def wait_job(job_id: str, timeout: float = 30.0):
+    """
+    Long-poll a job: returns as soon as it finishes, or its current state after `timeout` seconds.
+    """
+    timeout = max(0.0, min(timeout, MAX_WAIT_SECONDS))
+    job = await job_manager.wait(job_id, timeout)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 if __name__ == "__main__":
     host = os.getenv("API_HOST", "0.0.0.0")
     port = int(os.getenv("API_PORT", 8000))
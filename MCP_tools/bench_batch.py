@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+from calender.batch import run_batch
+
+
+def simulated_run(latency):
+    """Stand-in for a crew run that spends `latency` seconds waiting on the LLM."""
+    def run(topic, on_event=None):
+        if on_event is not None:
+            on_event({"event": "crew_started"})
+        time.sleep(latency)
+        return f"plan for {topic}"
+    return run
+
+
+def bench_batch(topics, run_topic, concurrency, llm_rpm=None):
+    start = time.perf_counter()
+    for topic in topics:
+        run_topic(topic)
+    sequential = time.perf_counter() - start
+
+    summary = list(run_batch(topics, run_topic, max_concurrency=concurrency, llm_rpm=llm_rpm))[-1]
+
+    print(f"Sequential: {sequential:.2f}s, {len(topics) * 60 / sequential:.1f} topics/min")
+    print(f"Batch (concurrency {concurrency}): {summary['elapsed']:.2f}s, "
+          f"{summary['topics_per_minute']:.1f} topics/min, {summary['failed']} failed")
+    print(f"Speedup: {sequential / summary['elapsed']:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of run_batch against sequential crew runs.")
+    parser.add_argument("--topics", type=int, default=15)
+    parser.add_argument("--concurrency", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=1.0, help="Simulated seconds per crew run")
+    parser.add_argument("--llm-rpm", type=float, default=None)
+    parser.add_argument("--live", action="store_true", help="Run the real crew (needs API keys; plan cache disabled)")
+    args = parser.parse_args()
+
+    topics = [f"Module {i + 1}: syllabus reading and exercises" for i in range(args.topics)]
+    if args.live:
+        from calender.main import run
+        run_topic = lambda topic, on_event=None: str(run(topic, on_event))  # noqa: E731
+    else:
+        run_topic = simulated_run(args.latency)
+    bench_batch(topics, run_topic, args.concurrency, args.llm_rpm)
@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+
+# Crew construction only; no LLM call is made, so a placeholder key is enough
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+from calender.crew import Calender
+from calender.template import CrewTemplate
+
+
+def _measure(build, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        build()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "mean_ms": 1000 * sum(timings) / len(timings),
+        "p50_ms": 1000 * timings[len(timings) // 2],
+        "max_ms": 1000 * timings[-1],
+    }
+
+
+def bench_crew_setup(iterations=50):
+    """Compare per-request crew construction: cold Calender() vs. a copy of the warm template."""
+    # Warm imports and caches so the first cold build doesn't skew the numbers
+    Calender().crew()
+    template = CrewTemplate()
+    template.template()
+
+    cold = _measure(lambda: Calender().crew(), iterations)
+    warm = _measure(template.crew, iterations)
+
+    print(f"Per-request crew construction over {iterations} iterations:")
+    print(f"  Calender().crew()      mean {cold['mean_ms']:.2f} ms  p50 {cold['p50_ms']:.2f} ms  max {cold['max_ms']:.2f} ms")
+    print(f"  CrewTemplate.crew()    mean {warm['mean_ms']:.2f} ms  p50 {warm['p50_ms']:.2f} ms  max {warm['max_ms']:.2f} ms")
+    print(f"  Speedup: {cold['mean_ms'] / warm['mean_ms']:.1f}x")
+    return cold, warm
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    bench_crew_setup(iterations)
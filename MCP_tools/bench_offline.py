@@ -0,0 +1,506 @@
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import resource
+import subprocess
+from datetime import datetime, timezone
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT_DIR = os.path.join(_SCRIPT_DIR, "result")
+
+SCENARIOS = ("asgi", "uvicorn", "mcp", "mcp_http", "workers")
+
+# Child processes load the fakes before importing the server module
+UVICORN_BOOT = (
+    "import offline_stubs; offline_stubs.install()\n"
+    "import uvicorn, api\n"
+    "uvicorn.run(api.app, host='127.0.0.1', port={port}, log_level='warning')\n"
+)
+MCP_BOOT = (
+    "import offline_stubs, runpy; offline_stubs.install()\n"
+    "runpy.run_path('mcp_server.py', run_name='__main__')\n"
+)
+MCP_HTTP_BOOT = (
+    "import sys, offline_stubs, runpy; offline_stubs.install()\n"
+    "sys.argv = ['mcp_server.py', '--transport', 'http', '--port', '{port}']\n"
+    "runpy.run_path('mcp_server.py', run_name='__main__')\n"
+)
+
+
+def latency_stats(latencies, errors, elapsed):
+    """Summarize one workload: nearest-rank percentiles in milliseconds and throughput."""
+    ordered = sorted(latencies)
+
+    def percentile(p):
+        if not ordered:
+            return None
+        rank = max(1, -(-len(ordered) * p // 100))
+        return round(ordered[int(rank) - 1] * 1000, 2)
+
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else None,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+        "elapsed_s": round(elapsed, 3),
+    }
+
+
+async def drive(call, requests, concurrency):
+    """Run `call(i)` for i in range(requests) with at most `concurrency` in flight."""
+    latencies = []
+    errors = 0
+    queue = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in queue:
+            start = time.perf_counter()
+            try:
+                await call(i)
+            except Exception:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latency_stats(latencies, errors, time.perf_counter() - start)
+
+
+def _topic(i):
+    return f"Module {i + 1}: offline benchmark syllabus reading and exercises"
+
+
+async def _api_workloads(client, requests, concurrency):
+    """The same request mix against the in-process app and the uvicorn server."""
+
+    async def post_run(topic):
+        response = await client.post("/run", json={"input_task": topic})
+        response.raise_for_status()
+
+    async def health(i):
+        (await client.get("/health")).raise_for_status()
+
+    results = {"health": await drive(health, requests, concurrency)}
+    # Unique topics miss the plan cache and run the crew against the fake LLM
+    results["plan_cold"] = await drive(lambda i: post_run(_topic(i)), requests, concurrency)
+    # Topics planned above are now served from the cache and only rescheduled
+    results["plan_cached"] = await drive(lambda i: post_run(_topic(i % concurrency)), requests, concurrency)
+    return results
+
+
+def peak_rss_mb(pid=None):
+    """Peak resident set size of `pid` (Linux only) or of this process."""
+    if pid is not None:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return round(int(line.split()[1]) / 1024, 1)
+        except OSError:
+            pass
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+async def run_asgi(requests, concurrency):
+    """Drive api.app in this process through httpx's ASGI transport (no sockets)."""
+    import offline_stubs
+    offline_stubs.install()
+    import httpx
+    import api
+
+    async with api.lifespan(api.app):
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            workloads = await _api_workloads(client, requests, concurrency)
+    return {"peak_rss_mb": peak_rss_mb(), "workloads": workloads}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _spawn(code, **kwargs):
+    return subprocess.Popen([sys.executable, "-c", code], cwd=_SCRIPT_DIR, stderr=subprocess.DEVNULL, **kwargs)
+
+
+def _stop(proc):
+    rss = peak_rss_mb(proc.pid)
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+    return rss
+
+
+async def run_uvicorn(requests, concurrency):
+    """Drive api.py served by a real uvicorn process over loopback HTTP."""
+    import httpx
+
+    port = _free_port()
+    start = time.perf_counter()
+    proc = _spawn(UVICORN_BOOT.format(port=port), stdout=subprocess.DEVNULL)
+    try:
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=300) as client:
+            while True:
+                if proc.poll() is not None:
+                    raise RuntimeError("uvicorn exited before it was ready")
+                try:
+                    (await client.get("/health")).raise_for_status()
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            startup_ms = round((time.perf_counter() - start) * 1000, 1)
+            workloads = await _api_workloads(client, requests, concurrency)
+    finally:
+        rss = _stop(proc)
+    return {"startup_ms": startup_ms, "peak_rss_mb": rss, "workloads": workloads}
+
+
+class StdioClient:
+    """Minimal JSON-RPC client for the stdio MCP server that keeps many requests in flight."""
+
+    def __init__(self, proc):
+        self.proc = proc
+        self.pending = {}
+        self.next_id = 0
+        self.reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        while True:
+            line = await self.proc.stdout.readline()
+            if not line:
+                break
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            future = self.pending.pop(message.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(message)
+        for future in self.pending.values():
+            future.set_exception(RuntimeError("MCP server exited"))
+
+    def notify(self, method, params=None):
+        message = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            message["params"] = params
+        self.proc.stdin.write((json.dumps(message) + "\n").encode("utf-8"))
+
+    async def request(self, method, params=None):
+        self.next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending[self.next_id] = future
+        self.proc.stdin.write((json.dumps({
+            "jsonrpc": "2.0", "id": self.next_id, "method": method, "params": params or {},
+        }) + "\n").encode("utf-8"))
+        await self.proc.stdin.drain()
+        message = await future
+        if "error" in message or message.get("result", {}).get("isError"):
+            raise RuntimeError(message)
+        return message["result"]
+
+    async def call_tool(self, name, **arguments):
+        return await self.request("tools/call", {"name": name, "arguments": arguments})
+
+
+async def run_mcp(requests, concurrency):
+    """Drive mcp_server.py over stdio, the way the Flutter app starts it."""
+    start = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "-c", MCP_BOOT,
+        cwd=_SCRIPT_DIR,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        limit=16 * 1024 * 1024,
+    )
+    client = StdioClient(proc)
+    try:
+        await client.request("initialize", {
+            "protocolVersion": "2024-11-05",
+            "capabilities": {},
+            "clientInfo": {"name": "bench_offline", "version": "1.0"},
+        })
+        startup_ms = round((time.perf_counter() - start) * 1000, 1)
+        client.notify("notifications/initialized")
+
+        workloads = {
+            "get_weather": await drive(
+                lambda i: client.call_tool("get_weather", latitude=25.0 + i % 7, longitude=121.5),
+                requests, concurrency),
+            "check_gmail": await drive(
+                lambda i: client.call_tool("check_gmail", query="is:inbox", max_results=10),
+                requests, concurrency),
+            "web_search": await drive(
+                lambda i: client.call_tool("web_search", query=f"offline benchmark {i}"),
+                requests, concurrency),
+            # Three queries per call fanned out at once; the shared ones come from the search cache
+            "web_search_many": await drive(
+                lambda i: client.call_tool("web_search_many", queries=[
+                    f"offline benchmark {i}", f"offline calendar {i % 4}", "offline benchmark review"]),
+                requests, concurrency),
+            "planner_cold": await drive(
+                lambda i: client.call_tool("task_and_schedule_planer", topic=_topic(i)),
+                requests, concurrency),
+            # Quick tools while the planner pool is saturated; they must not queue behind crew runs
+            "get_weather_under_load": await _under_load(client, requests, concurrency),
+        }
+    finally:
+        rss = peak_rss_mb(proc.pid)
+        proc.terminate()
+        await proc.wait()
+        client.reader.cancel()
+    # One process per client
+    return {"startup_ms": startup_ms, "peak_rss_mb": rss, "rss_per_client_mb": rss, "workloads": workloads}
+
+
+async def _wait_healthy(proc, url):
+    import httpx
+
+    async with httpx.AsyncClient(timeout=5) as client:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"Server exited before {url} was ready")
+            try:
+                (await client.get(url)).raise_for_status()
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+
+
+async def run_mcp_http(requests, concurrency):
+    """Drive one shared mcp_server.py over streamable HTTP from `concurrency` clients, each its own user."""
+    from contextlib import AsyncExitStack
+    from fastmcp import Client
+    from fastmcp.client.transports import StreamableHttpTransport
+
+    port = _free_port()
+    start = time.perf_counter()
+    proc = _spawn(MCP_HTTP_BOOT.format(port=port), stdout=subprocess.DEVNULL)
+    try:
+        await _wait_healthy(proc, f"http://127.0.0.1:{port}/health")
+        startup_ms = round((time.perf_counter() - start) * 1000, 1)
+        async with AsyncExitStack() as stack:
+            clients = [
+                await stack.enter_async_context(Client(StreamableHttpTransport(
+                    f"http://127.0.0.1:{port}/mcp", headers={"X-DayCrafter-User": f"user{i}"})))
+                for i in range(concurrency)
+            ]
+
+            def call(i, name, **arguments):
+                return clients[i % len(clients)].call_tool(name, arguments)
+
+            workloads = {
+                "get_weather": await drive(
+                    lambda i: call(i, "get_weather", latitude=25.0 + i % 7, longitude=121.5), requests, concurrency),
+                "check_gmail": await drive(
+                    lambda i: call(i, "check_gmail", query="is:inbox", max_results=10), requests, concurrency),
+                "planner_cold": await drive(
+                    lambda i: call(i, "task_and_schedule_planer", topic=f"HTTP {_topic(i)}"), requests, concurrency),
+            }
+    finally:
+        rss = _stop(proc)
+    return {"startup_ms": startup_ms, "peak_rss_mb": rss, "clients": concurrency,
+            "rss_per_client_mb": round(rss / concurrency, 1) if rss else None, "workloads": workloads}
+
+
+async def _under_load(client, requests, concurrency):
+    planners = [
+        asyncio.create_task(client.call_tool("task_and_schedule_planer", topic=f"Load {i}: {_topic(i)}"))
+        for i in range(concurrency)
+    ]
+    try:
+        return await drive(lambda i: client.call_tool("get_weather", latitude=25.05, longitude=121.53),
+                           requests, concurrency)
+    finally:
+        await asyncio.gather(*planners, return_exceptions=True)
+
+
+def _worker_counts(max_workers):
+    counts, n = [], 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    return counts + [max_workers]
+
+
+async def run_workers(requests, max_workers):
+    """
+    Cold crew runs against the fake LLM with n threads of this process and with n worker
+    processes, for n from 1 to `max_workers`; each level keeps n runs in flight.
+    """
+    import offline_stubs
+    offline_stubs.install()
+    from calender.main import run
+    from calender.plan_model import plan_to_json
+    from calender.workers import WorkerPool
+
+    def plan_in_thread(topic):
+        return plan_to_json(run(topic))
+
+    workloads, startup_ms, worker_rss = {}, {}, {}
+    for n in _worker_counts(max_workers):
+        workloads[f"threads_{n}"] = await drive(
+            lambda i: asyncio.to_thread(plan_in_thread, f"Threads {n}: {_topic(i)}"), requests, n)
+
+        pool = WorkerPool(n, max_jobs=0, max_rss_mb=0)
+        start = time.perf_counter()
+        if not pool.wait_ready():
+            pool.shutdown()
+            raise RuntimeError(f"{n} crew worker(s) did not start")
+        startup_ms[n] = round((time.perf_counter() - start) * 1000, 1)
+        try:
+            workloads[f"workers_{n}"] = await drive(
+                lambda i: asyncio.to_thread(pool.plan, f"Workers {n}: {_topic(i)}"), requests, n)
+            worker_rss[n] = [peak_rss_mb(pid) for pid in pool.pids()]
+        finally:
+            pool.shutdown()
+
+    return {"peak_rss_mb": peak_rss_mb(), "cpus": os.cpu_count(), "worker_startup_ms": startup_ms,
+            "worker_peak_rss_mb": worker_rss, "workloads": workloads}
+
+
+def _run_child(flag, name, requests, concurrency, env, *extra):
+    """Run a scenario in its own process so its peak RSS and the fakes it installs aren't mixed with the others."""
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), flag,
+         "--requests", str(requests), "--concurrency", str(concurrency), *extra],
+        cwd=_SCRIPT_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{name} scenario failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=_SCRIPT_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_offline(scenarios, requests, concurrency, max_workers):
+    results = {}
+    for name in scenarios:
+        if name == "asgi":
+            results[name] = _run_child("--asgi-child", "ASGI", requests, concurrency, os.environ.copy())
+        elif name == "workers":
+            results[name] = _run_child("--workers-child", "Workers", requests, concurrency, os.environ.copy(),
+                                       "--workers", str(max_workers))
+        elif name == "uvicorn":
+            results[name] = asyncio.run(run_uvicorn(requests, concurrency))
+        elif name == "mcp_http":
+            results[name] = asyncio.run(run_mcp_http(requests, concurrency))
+        else:
+            results[name] = asyncio.run(run_mcp(requests, concurrency))
+        print_scenario(name, results[name])
+    return results
+
+
+def print_scenario(name, result):
+    extra = f", startup {result['startup_ms']:.0f} ms" if "startup_ms" in result else ""
+    if "rss_per_client_mb" in result:
+        extra += f", {result['rss_per_client_mb']} MB per client"
+    if "worker_startup_ms" in result:
+        extra += f", {result['cpus']} CPU(s), worker warm-up {result['worker_startup_ms']} ms"
+    print(f"{name}: peak RSS {result['peak_rss_mb']} MB{extra}")
+    print(f"  {'workload':<24} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8} {'errors':>7}")
+    for workload, stats in result["workloads"].items():
+        print(f"  {workload:<24} {_fmt(stats['p50_ms']):>9} {_fmt(stats['p95_ms']):>9} "
+              f"{_fmt(stats['p99_ms']):>9} {_fmt(stats['throughput_rps']):>8} {stats['errors']:>7}")
+
+
+def _fmt(value):
+    return "-" if value is None else f"{value:.1f}"
+
+
+def compare(previous, current):
+    """Print p95 and throughput changes against an earlier results file."""
+    print(f"Compared with {previous.get('git_commit')} ({previous.get('timestamp')}):")
+    for name, result in current["scenarios"].items():
+        before = previous.get("scenarios", {}).get(name, {}).get("workloads", {})
+        for workload, stats in result["workloads"].items():
+            old = before.get(workload)
+            if not old or not old["p95_ms"] or not stats["p95_ms"]:
+                continue
+            p95 = (stats["p95_ms"] / old["p95_ms"] - 1) * 100
+            rps = (stats["throughput_rps"] / old["throughput_rps"] - 1) * 100 if old["throughput_rps"] else 0.0
+            print(f"  {name}/{workload:<24} p95 {p95:+6.1f}%  throughput {rps:+6.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Offline load benchmark for api.py and the MCP server, with a fake LLM and stubbed services.")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=40, help="Requests per workload")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=None, help="Seconds per fake LLM call (default 0.5)")
+    parser.add_argument("--http-latency", type=float, default=None, help="Seconds per ipapi/open-meteo call")
+    parser.add_argument("--gmail-latency", type=float, default=None, help="Seconds per Gmail round trip")
+    parser.add_argument("--search-latency", type=float, default=None, help="Seconds per web search")
+    parser.add_argument("--output", default=None, help="Results file (default result/bench_offline-<commit>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier results file to compare against")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Largest crew worker count in the workers scenario (default: CPUs, at most 4)")
+    parser.add_argument("--asgi-child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--workers-child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.asgi_child:
+        print(json.dumps(asyncio.run(run_asgi(args.requests, args.concurrency))))
+        sys.exit(0)
+    if args.workers_child:
+        print(json.dumps(asyncio.run(run_workers(args.requests, args.workers))))
+        sys.exit(0)
+
+    # offline_stubs.install() reads these in every child process
+    for flag, env in (("llm_latency", "OFFLINE_LLM_LATENCY"), ("http_latency", "OFFLINE_HTTP_LATENCY"),
+                      ("gmail_latency", "OFFLINE_GMAIL_LATENCY"), ("search_latency", "OFFLINE_SEARCH_LATENCY")):
+        if getattr(args, flag) is not None:
+            os.environ[env] = str(getattr(args, flag))
+
+    commit = _git_commit()
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            **{key: value for key, value in os.environ.items()
+               if key.startswith("OFFLINE_") or key in ("JOB_WORKERS", "PLANNER_CONCURRENCY")},
+        },
+        "scenarios": bench_offline(args.scenarios, args.requests, args.concurrency, args.workers),
+    }
+
+    output = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"bench_offline-{commit or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import argparse
+import statistics
+
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+load_dotenv()
+# Building the crew needs a key even though the profile makes no LLM calls.
+# The profile's kickoff is not a real run, so skip telemetry and the first-run trace prompt.
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("CREWAI_TESTING", "true")
+
+from calender.prompt_profile import capture_prompt, format_profile, profile_prompt
+
+
+def time_to_first_token(messages, model, runs):
+    """Stream `runs` completions and return (median seconds to first content token, prompt tokens)."""
+    from openai import OpenAI
+
+    client = OpenAI()
+    ttfts = []
+    prompt_tokens = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        first = None
+        stream = client.chat.completions.create(
+            model=model, messages=messages, stream=True, max_tokens=16,
+            stream_options={"include_usage": True},
+        )
+        for chunk in stream:
+            if first is None and chunk.choices and chunk.choices[0].delta.content:
+                first = time.perf_counter() - start
+            if chunk.usage is not None:
+                prompt_tokens = chunk.usage.prompt_tokens
+        ttfts.append(first if first is not None else time.perf_counter() - start)
+    return statistics.median(ttfts), prompt_tokens
+
+
+def bench_prompt(topic, model=None, live=False, runs=5):
+    default = profile_prompt(topic, compact=False, model=model)
+    compact = profile_prompt(topic, compact=True, model=model)
+    print(format_profile(default))
+    print(format_profile(compact))
+    saved = default["total_tokens"] - compact["total_tokens"]
+    print(f"Compaction saves {saved} of {default['total_tokens']} input tokens "
+          f"({saved / max(default['total_tokens'], 1):.1%}) per LLM call.")
+
+    if live:
+        results = {}
+        for name, flag in (("default", False), ("compact", True)):
+            captured = capture_prompt(topic, compact=flag, model=model)
+            results[name] = time_to_first_token(captured["messages"], captured["model"], runs)
+        for name, (ttft, tokens) in results.items():
+            print(f"{name:<8} prompt tokens (API): {tokens}, median time to first token: {ttft * 1000:.0f} ms")
+        change = results["compact"][0] / results["default"][0] - 1
+        print(f"Time to first token: {change:+.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Token profile of the calendar_manager prompt, default vs compact.")
+    parser.add_argument("--topic-file", default="input_task.txt", help="File with the topic text")
+    parser.add_argument("--model", default=None, help="Model for token counting (default $MODEL or gpt-4o-mini)")
+    parser.add_argument("--live", action="store_true", help="Also measure time to first token (needs OPENAI_API_KEY)")
+    parser.add_argument("--runs", type=int, default=5, help="Streamed completions per prompt form with --live")
+    args = parser.parse_args()
+
+    with open(args.topic_file, 'r', encoding='utf-8') as f:
+        topic = f.read()
+    bench_prompt(topic, args.model, args.live, args.runs)
@@ -0,0 +1,123 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_PATH = os.path.join(_SCRIPT_DIR, "mcp_server.py")
+
+# Defaults sized for a developer laptop; override per machine/CI runner
+DEFAULT_IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", 1500))
+DEFAULT_RESPONSE_BUDGET_MS = float(os.getenv("STARTUP_RESPONSE_BUDGET_MS", 2500))
+
+
+def import_time_breakdown(top=15):
+    """Run `python -X importtime` on the server module and return (total_ms, [(module, cumulative_ms, self_ms)])."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import mcp_server"],
+        cwd=_SCRIPT_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "MCP_PRELOAD": "0"},
+    )
+    # -X importtime prints children before their parent; a top-level entry has one leading space
+    pending = []
+    direct = []
+    total_ms = 0.0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        row = (name, int(cumulative_us) / 1000, int(self_us) / 1000)
+        if not name.startswith("  "):
+            if name.strip() == "mcp_server":
+                total_ms = row[1]
+                direct = [r for r in pending if r[0].startswith("   ") and not r[0].startswith("    ")]
+            pending = []
+        else:
+            pending.append(row)
+    direct.sort(key=lambda row: row[1], reverse=True)
+    return total_ms, [(name.strip(), cum, own) for name, cum, own in direct[:top]]
+
+
+def _send(proc, message):
+    proc.stdin.write(json.dumps(message) + "\n")
+    proc.stdin.flush()
+
+
+def _read_response(proc, request_id):
+    while True:
+        line = proc.stdout.readline()
+        if not line:
+            raise RuntimeError("MCP server exited before responding")
+        message = json.loads(line)
+        if message.get("id") == request_id:
+            return message
+
+
+def time_to_first_response():
+    """Spawn the stdio server the way the Flutter app does and time `initialize` and `tools/list`."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, SERVER_PATH],
+        cwd=_SCRIPT_DIR,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    try:
+        _send(proc, {
+            "jsonrpc": "2.0", "id": 1, "method": "initialize",
+            "params": {
+                "protocolVersion": "2024-11-05",
+                "capabilities": {},
+                "clientInfo": {"name": "bench_startup", "version": "1.0"},
+            },
+        })
+        _read_response(proc, 1)
+        initialize_ms = (time.perf_counter() - start) * 1000
+
+        _send(proc, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+        _send(proc, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+        tools = _read_response(proc, 2)["result"]["tools"]
+        tools_list_ms = (time.perf_counter() - start) * 1000
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return initialize_ms, tools_list_ms, len(tools)
+
+
+def bench_startup(import_budget_ms, response_budget_ms, top=15):
+    total_ms, direct = import_time_breakdown(top)
+    print(f"Import time for mcp_server: {total_ms:.0f} ms (budget {import_budget_ms:.0f} ms)")
+    print("Slowest direct imports (cumulative / self):")
+    for name, cumulative, own in direct:
+        print(f"  {name:<40} {cumulative:8.1f} ms {own:8.1f} ms")
+
+    initialize_ms, tools_list_ms, tool_count = time_to_first_response()
+    print(f"Time to initialize response: {initialize_ms:.0f} ms (budget {response_budget_ms:.0f} ms)")
+    print(f"Time to tools/list response: {tools_list_ms:.0f} ms ({tool_count} tools)")
+
+    failures = []
+    if total_ms > import_budget_ms:
+        failures.append(f"import time {total_ms:.0f} ms > {import_budget_ms:.0f} ms")
+    if initialize_ms > response_budget_ms:
+        failures.append(f"time to first response {initialize_ms:.0f} ms > {response_budget_ms:.0f} ms")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Startup benchmark for the stdio MCP server.")
+    parser.add_argument("--import-budget-ms", type=float, default=DEFAULT_IMPORT_BUDGET_MS)
+    parser.add_argument("--response-budget-ms", type=float, default=DEFAULT_RESPONSE_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    failures = bench_startup(args.import_budget_ms, args.response_budget_ms, args.top)
+    if failures:
+        print("Startup budget exceeded: " + "; ".join(failures))
+        sys.exit(1)
+    print("Startup within budget.")
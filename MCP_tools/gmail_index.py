@@ -0,0 +1,314 @@
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from gmail_utils import fetch_message_metadata
+
+logger = logging.getLogger("gmail_index")
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INDEX_PATH = os.path.join(_SCRIPT_DIR, 'tokens', 'gmail_index.db')
+
+# Query terms the index can answer; anything else goes to the Gmail API
+_LABEL_TERMS = {
+    "is:unread": ("UNREAD", True),
+    "is:read": ("UNREAD", False),
+    "is:inbox": ("INBOX", True),
+    "in:inbox": ("INBOX", True),
+    "is:starred": ("STARRED", True),
+    "is:important": ("IMPORTANT", True),
+}
+_FIELD_TERM = re.compile(r'^(from|to):(?:"([^"]+)"|(\S+))$', re.IGNORECASE)
+_TOKEN = re.compile(r'\S+:"[^"]*"|\S+')
+
+
+def parse_query(query: str) -> Optional[List[Tuple[str, str, object]]]:
+    """
+    Translate a Gmail search query into index filters.
+
+    Returns a list of (kind, field, value) filters, or None if the query uses
+    anything the index can't answer exactly.
+    """
+    filters = []
+    for token in _TOKEN.findall(query or ""):
+        lowered = token.lower()
+        if lowered in _LABEL_TERMS:
+            label, present = _LABEL_TERMS[lowered]
+            filters.append(("label", label, present))
+            continue
+        match = _FIELD_TERM.match(token)
+        if match and (match.group(2) or match.group(3)).lower() != "me":
+            field = "sender" if match.group(1).lower() == "from" else "recipient"
+            filters.append(("contains", field, (match.group(2) or match.group(3)).lower()))
+            continue
+        return None
+    return filters
+
+
+def _like_escape(value: str) -> str:
+    """`value` with LIKE's wildcards escaped, for use with ESCAPE '\\'."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _direct(fn: Callable[[], Any]) -> Any:
+    return fn()
+
+
+def _is_history_expired(error: Exception) -> bool:
+    return getattr(getattr(error, "resp", None), "status", None) == 404
+
+
+class GmailIndex:
+    """
+    Local SQLite index of Gmail message metadata per app user.
+
+    A full sync indexes the newest `depth` messages and records the history id
+    and the oldest indexed date (the boundary). Later syncs apply only the
+    changes from `history.list`; a full resync happens when Gmail reports the
+    history id as expired. Every message newer than the boundary is in the
+    index, so a query is answered locally when it has at least `max_results`
+    matches there, or when the index covers the whole mailbox.
+
+    Args:
+        db_path: SQLite database file.
+        depth: Messages fetched by a full sync.
+        freshness: Seconds after a sync during which the index is used without syncing again.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_INDEX_PATH, depth: int = 200, freshness: float = 30.0):
+        self.db_path = db_path
+        self.depth = depth
+        self.freshness = freshness
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._user_locks: Dict[str, threading.Lock] = {}
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS messages (
+                    user_id TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    thread_id TEXT,
+                    subject TEXT,
+                    sender TEXT,
+                    recipient TEXT,
+                    date TEXT,
+                    snippet TEXT,
+                    labels TEXT,
+                    internal_date INTEGER,
+                    PRIMARY KEY (user_id, id)
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS messages_by_date ON messages (user_id, internal_date DESC)"
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    user_id TEXT PRIMARY KEY,
+                    history_id TEXT NOT NULL,
+                    boundary INTEGER NOT NULL,
+                    complete INTEGER NOT NULL,
+                    synced_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        with self._lock:
+            return self._user_locks.setdefault(user_id, threading.Lock())
+
+    def _state(self, user_id: str) -> Optional[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute("SELECT * FROM sync_state WHERE user_id = ?", (user_id,)).fetchone()
+
+    @staticmethod
+    def _row(user_id: str, msg: dict) -> tuple:
+        headers = {h['name']: h['value'] for h in msg.get('payload', {}).get('headers', [])}
+        labels = msg.get('labelIds', [])
+        return (
+            user_id,
+            msg['id'],
+            msg.get('threadId'),
+            headers.get('Subject', '(No Subject)'),
+            headers.get('From', 'Unknown'),
+            headers.get('To', ''),
+            headers.get('Date', ''),
+            msg.get('snippet', ''),
+            f" {' '.join(labels)} ",
+            int(msg.get('internalDate', 0)),
+        )
+
+    def _upsert(self, user_id: str, messages: List[dict]):
+        # Called inside the caller's transaction
+        if messages:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [self._row(user_id, msg) for msg in messages],
+            )
+
+    def full_sync(self, service, user_id: str, call: Optional[Callable[[Callable], Any]] = None):
+        call = call or _direct
+        # Take the history id before listing so no change between the two is lost
+        history_id = call(service.users().getProfile(userId='me').execute)['historyId']
+
+        message_ids: List[str] = []
+        page_token = None
+        complete = False
+        while len(message_ids) < self.depth:
+            kwargs = {"userId": 'me', "maxResults": min(500, self.depth - len(message_ids))}
+            if page_token:
+                kwargs["pageToken"] = page_token
+            page = call(service.users().messages().list(**kwargs).execute)
+            message_ids.extend(m['id'] for m in page.get('messages', []))
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                complete = True
+                break
+
+        messages = call(lambda: fetch_message_metadata(service, message_ids))
+        boundary = min((int(m.get('internalDate', 0)) for m in messages), default=0)
+
+        # One transaction, so readers never see the index emptied but not yet refilled
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages WHERE user_id = ?", (user_id,))
+            self._upsert(user_id, messages)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?, ?)",
+                (user_id, str(history_id), 0 if complete else boundary, int(complete), time.time()),
+            )
+        logger.info(f"Full Gmail index sync for user='{user_id}': {len(messages)} message(s)")
+
+    def incremental_sync(self, service, user_id: str, history_id: str,
+                         call: Optional[Callable[[Callable], Any]] = None) -> bool:
+        """Apply changes since `history_id`. Returns False if the history has expired."""
+        call = call or _direct
+        changed, deleted = set(), set()
+        latest_history_id = history_id
+        page_token = None
+        try:
+            while True:
+                kwargs = {"userId": 'me', "startHistoryId": history_id}
+                if page_token:
+                    kwargs["pageToken"] = page_token
+                page = call(service.users().history().list(**kwargs).execute)
+                for record in page.get('history', []):
+                    for item in record.get('messagesDeleted', []):
+                        deleted.add(item['message']['id'])
+                        changed.discard(item['message']['id'])
+                    for key in ('messagesAdded', 'labelsAdded', 'labelsRemoved'):
+                        for item in record.get(key, []):
+                            if item['message']['id'] not in deleted:
+                                changed.add(item['message']['id'])
+                latest_history_id = page.get('historyId', latest_history_id)
+                page_token = page.get('nextPageToken')
+                if not page_token:
+                    break
+        except Exception as e:
+            if _is_history_expired(e):
+                return False
+            raise
+
+        messages = call(lambda: fetch_message_metadata(service, sorted(changed)))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM messages WHERE user_id = ? AND id = ?",
+                [(user_id, msg_id) for msg_id in deleted],
+            )
+            self._upsert(user_id, messages)
+            self._conn.execute(
+                "UPDATE sync_state SET history_id = ?, synced_at = ? WHERE user_id = ?",
+                (str(latest_history_id), time.time(), user_id),
+            )
+        return True
+
+    def sync(self, service, user_id: str, call: Optional[Callable[[Callable], Any]] = None):
+        """
+        Bring the index for `user_id` up to date, unless it was synced within `freshness` seconds.
+        Each Gmail API round trip runs through `call` (e.g. an outbound Dependency's `call_sync`);
+        reads and writes of the index itself don't.
+        """
+        with self._user_lock(user_id):
+            state = self._state(user_id)
+            if state is not None and time.time() - state["synced_at"] < self.freshness:
+                return
+            if state is None or not self.incremental_sync(service, user_id, state["history_id"], call):
+                self.full_sync(service, user_id, call)
+
+    def search(self, service, user_id: str, query: str, max_results: int,
+               call: Optional[Callable[[Callable], Any]] = None) -> Optional[List[dict]]:
+        """
+        Answer `query` from the index, syncing it first if needed.
+
+        Returns email dicts in `check_gmail`'s shape, newest first, or None when
+        the query must go to the Gmail API. `call` is passed to `sync`.
+        """
+        filters = parse_query(query)
+        if filters is None:
+            return None
+
+        self.sync(service, user_id, call)
+        state = self._state(user_id)
+        rows = self._matches(user_id, filters, state, max_results)
+
+        # Older matches may exist outside the index unless it covers the whole mailbox
+        if len(rows) < max_results and not state["complete"]:
+            return None
+        return [self._email(row) for row in rows]
+
+    def search_local(self, user_id: str, query: str, max_results: int) -> Optional[List[dict]]:
+        """
+        Answer `query` from the index as it is, without syncing, for when Gmail is unreachable.
+        Recent changes and older mail outside the index are missing. None when the query is not
+        one the index can answer or the user was never synced.
+        """
+        filters = parse_query(query)
+        state = self._state(user_id)
+        if filters is None or state is None:
+            return None
+        return [self._email(row) for row in self._matches(user_id, filters, state, max_results)]
+
+    def _matches(self, user_id: str, filters, state: sqlite3.Row, max_results: int) -> List[sqlite3.Row]:
+        # Gmail search leaves out spam and trash unless asked for
+        clauses = ["user_id = ?", "internal_date >= ?", "labels NOT LIKE '% SPAM %'", "labels NOT LIKE '% TRASH %'"]
+        params: list = [user_id, state["boundary"]]
+        for kind, field, value in filters:
+            # "%" and "_" in an address or label (CATEGORY_SOCIAL) are matched literally
+            if kind == "label":
+                clauses.append(f"labels {'' if value else 'NOT '}LIKE ? ESCAPE '\\'")
+                params.append(f"% {_like_escape(field)} %")
+            else:
+                clauses.append(f"LOWER({field}) LIKE ? ESCAPE '\\'")
+                params.append(f"%{_like_escape(value)}%")
+        params.append(max_results)
+
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT * FROM messages WHERE {' AND '.join(clauses)} ORDER BY internal_date DESC LIMIT ?",
+                params,
+            ).fetchall()
+
+    @staticmethod
+    def _email(row: sqlite3.Row) -> dict:
+        return {
+            "id": row["id"],
+            "subject": row["subject"],
+            "from": row["sender"],
+            "to": row["recipient"],
+            "date": row["date"],
+            "snippet": row["snippet"],
+            "is_unread": " UNREAD " in row["labels"],
+        }
+
+    def drop_user(self, user_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages WHERE user_id = ?", (user_id,))
+            self._conn.execute("DELETE FROM sync_state WHERE user_id = ?", (user_id,))
@@ -0,0 +1,279 @@
+import os
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, List, Dict, Any, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+logger = logging.getLogger("gmail_utils")
+
+# Gmail accepts at most 100 calls per batch request and starts rate limiting
+# larger batches, so 50 is the recommended size.
+GMAIL_BATCH_LIMIT = 100
+DEFAULT_BATCH_SIZE = 50
+
+METADATA_HEADERS = ['Subject', 'From', 'Date', 'To']
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _execute_batch(service, message_ids, metadata_headers, results, errors):
+    def callback(request_id, response, exception):
+        msg_id = message_ids[int(request_id)]
+        if exception is not None:
+            errors[msg_id] = exception
+        else:
+            results[msg_id] = response
+            errors.pop(msg_id, None)
+
+    batch = service.new_batch_http_request(callback=callback)
+    for index, msg_id in enumerate(message_ids):
+        batch.add(
+            service.users().messages().get(
+                userId='me',
+                id=msg_id,
+                format='metadata',
+                metadataHeaders=metadata_headers,
+            ),
+            request_id=str(index),
+        )
+    batch.execute()
+
+
+def fetch_message_metadata(service, message_ids: List[str], metadata_headers=METADATA_HEADERS,
+                           batch_size: int = DEFAULT_BATCH_SIZE) -> List[Dict[str, Any]]:
+    """
+    Fetch metadata for many Gmail messages using batch requests.
+
+    Ids are split into chunks that fit the batch limit, so N messages cost
+    ceil(N / batch_size) round trips instead of N. Messages that fail inside a
+    batch (typically rate limited) are retried once in a follow-up batch.
+
+    Args:
+        service: Gmail API service from `googleapiclient.discovery.build`.
+        message_ids: Message ids, in the order the results should be returned.
+        metadata_headers: Headers to include in each message payload.
+        batch_size: Calls per batch request (capped at GMAIL_BATCH_LIMIT).
+
+    Returns:
+        Message resources in the same order as `message_ids`.
+    """
+    batch_size = max(1, min(batch_size, GMAIL_BATCH_LIMIT))
+    results: Dict[str, Any] = {}
+    errors: Dict[str, Exception] = {}
+
+    for chunk in _chunks(list(message_ids), batch_size):
+        _execute_batch(service, chunk, metadata_headers, results, errors)
+
+    if errors:
+        logger.warning(f"Retrying {len(errors)} Gmail message fetch(es) that failed in batch")
+        for chunk in _chunks(list(errors), batch_size):
+            _execute_batch(service, chunk, metadata_headers, results, errors)
+        if errors:
+            raise next(iter(errors.values()))
+
+    return [results[msg_id] for msg_id in message_ids]
+
+
+@contextmanager
+def token_file_lock(token_path: str):
+    """Hold an exclusive lock on `<token_path>.lock` so processes don't race on the token file."""
+    os.makedirs(os.path.dirname(token_path), exist_ok=True)
+    with open(f"{token_path}.lock", 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def write_token_file(token_path: str, creds) -> None:
+    """Write credentials to `token_path` atomically (temp file + rename)."""
+    tmp_path = f"{token_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'w') as token_file:
+            token_file.write(creds.to_json())
+        os.replace(tmp_path, token_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class _CachedService:
+    __slots__ = ("creds", "service", "token_mtime", "lock")
+
+    def __init__(self, creds, service, token_mtime, lock):
+        self.creds = creds
+        self.service = service
+        self.token_mtime = token_mtime
+        # Keeps the user's lock alive while the service is cached
+        self.lock = lock
+
+
+class GmailServiceCache:
+    """
+    In-process cache of Gmail credentials and built service objects, keyed by app user.
+
+    Entries are evicted LRU once `max_entries` is reached. A background thread
+    refreshes tokens that expire within `refresh_margin` seconds so tool calls
+    never pay the refresh round trip. Token files are written atomically under a
+    file lock, and an entry is reloaded when its token file changes on disk
+    (e.g. after `setup_auth.py` re-authenticates the user).
+
+    Args:
+        token_path_for: Maps a user id to its token file path.
+        scopes: OAuth scopes the token must carry.
+        max_entries: Maximum number of users kept in memory.
+        refresh_margin: Seconds before expiry at which tokens are refreshed.
+        check_interval: Seconds between background refresh sweeps.
+    """
+
+    def __init__(self, token_path_for: Callable[[str], str], scopes: List[str], max_entries: int = 32,
+                 refresh_margin: float = 300.0, check_interval: float = 60.0):
+        self.token_path_for = token_path_for
+        self.scopes = scopes
+        self.max_entries = max_entries
+        self.refresh_margin = refresh_margin
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _CachedService]" = OrderedDict()
+        # A user's lock lives while their service is cached or a caller holds it, then is dropped
+        self._user_locks: "weakref.WeakValueDictionary[str, threading.RLock]" = weakref.WeakValueDictionary()
+        self._refresher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _token_mtime(token_path: str) -> Optional[int]:
+        try:
+            return os.stat(token_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def lock_for(self, user_id: str) -> threading.RLock:
+        """
+        Per-user lock. Built services share one httplib2 connection, which is not
+        thread-safe, so callers hold this while using a user's service.
+        """
+        with self._lock:
+            lock = self._user_locks.get(user_id)
+            if lock is None:
+                lock = self._user_locks[user_id] = threading.RLock()
+            return lock
+
+    def get(self, user_id: str = "default"):
+        """Return a Gmail API service for `user_id`, loading and refreshing credentials only when needed."""
+        token_path = self.token_path_for(user_id)
+        token_mtime = self._token_mtime(token_path)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+
+        if entry is not None and entry.token_mtime == token_mtime and entry.creds.valid:
+            return entry.service
+
+        entry = self._load(user_id, token_path)
+        with self._lock:
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self._ensure_refresher()
+        return entry.service
+
+    def _load(self, user_id: str, token_path: str) -> _CachedService:
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+        from googleapiclient.discovery import build
+
+        with token_file_lock(token_path):
+            creds = None
+            if os.path.exists(token_path):
+                creds = Credentials.from_authorized_user_file(token_path, self.scopes)
+
+            if not creds or not creds.valid:
+                if creds and creds.expired and creds.refresh_token:
+                    try:
+                        creds.refresh(Request())
+                    except Exception as e:
+                        logger.error(f"Error refreshing token: {e}")
+                        raise Exception(
+                            "Gmail authentication failed (refresh failed). "
+                            "Please run `python3 MCP_tools/setup_auth.py` in your terminal to re-authenticate."
+                        )
+                    write_token_file(token_path, creds)
+                else:
+                    # DO NOT run local server here as it blocks the headless process
+                    raise Exception(
+                        "Gmail authentication required. "
+                        "Please run `python3 MCP_tools/setup_auth.py` in your terminal to authenticate."
+                    )
+            token_mtime = self._token_mtime(token_path)
+
+        service = build('gmail', 'v1', credentials=creds, cache_discovery=False)
+        return _CachedService(creds, service, token_mtime, self.lock_for(user_id))
+
+    def evict(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _ensure_refresher(self):
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._stop.clear()
+            self._refresher = threading.Thread(target=self._refresh_loop, name="gmail-token-refresh", daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.check_interval):
+            self.refresh_expiring()
+
+    def refresh_expiring(self):
+        """Refresh every cached token that expires within `refresh_margin` seconds."""
+        from google.auth.transport.requests import Request
+
+        # Credentials.expiry is a naive UTC datetime
+        horizon = datetime.utcnow() + timedelta(seconds=self.refresh_margin)
+        with self._lock:
+            entries = list(self._entries.items())
+
+        for user_id, entry in entries:
+            creds = entry.creds
+            if not creds.refresh_token or creds.expiry is None or creds.expiry > horizon:
+                continue
+            token_path = self.token_path_for(user_id)
+            with self.lock_for(user_id):
+                try:
+                    with token_file_lock(token_path):
+                        with self._lock:
+                            # Evicted meanwhile (e.g. switch_gmail_account): don't write the token back
+                            if self._entries.get(user_id) is not entry:
+                                continue
+                        creds.refresh(Request())
+                        write_token_file(token_path, creds)
+                        entry.token_mtime = self._token_mtime(token_path)
+                    logger.info(f"Refreshed Gmail token ahead of expiry for user='{user_id}'")
+                except Exception as e:
+                    # Leave the entry; the next get() retries synchronously and reports the error
+                    logger.warning(f"Background Gmail token refresh failed for user='{user_id}': {e}")
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,121 @@
+import time
+import asyncio
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+import httpx
+
+from calender.metrics import METRICS_ENABLED, HTTP_CALLS, HTTP_LATENCY, record_cache
+
+# Keep-alive pool shared by every tool in the MCP server
+_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0)
+_TIMEOUT = httpx.Timeout(5.0)
+
+# One client per event loop; a client is dropped together with the loop it was created on
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+async def _on_request(request: httpx.Request):
+    request.extensions["started_at"] = time.perf_counter()
+
+
+async def _on_response(response: httpx.Response):
+    request = response.request
+    host = request.url.host
+    HTTP_CALLS.inc(host=host, status=response.status_code)
+    started_at = request.extensions.get("started_at")
+    if started_at is not None:
+        HTTP_LATENCY.observe(time.perf_counter() - started_at, host=host)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the pooled async HTTP client for the running event loop, creating it on first use.
+    A client is tied to the loop it was created on, so each loop gets its own; it goes away
+    with that loop instead of piling up when tools run under asyncio.run() repeatedly.
+    """
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        client = _clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=_LIMITS,
+                timeout=_TIMEOUT,
+                http2=_http2_available(),
+                headers={"User-Agent": "DayCrafter-MCP/1.0"},
+                event_hooks={"request": [_on_request], "response": [_on_response]} if METRICS_ENABLED else None,
+            )
+            _clients[loop] = client
+    return client
+
+
+async def close_http_client():
+    """Close the running loop's client and release its pooled connections."""
+    with _clients_lock:
+        client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+class TTLCache:
+    """
+    Small thread-safe cache whose entries expire after `ttl` seconds.
+    The least recently used entry is dropped once `max_entries` is reached.
+    Lookups are counted in the cache metrics under `name`.
+    With `stale_ttl`, expired entries are kept that much longer for `get_stale`,
+    so a caller can fall back to them while the source is down.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 256, name: str = "ttl", stale_ttl: float = 0.0):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] > self.ttl:
+                if entry is not None and time.monotonic() - entry[1] > self.ttl + self.stale_ttl:
+                    del self._entries[key]
+                self.misses += 1
+                record_cache(self.name, hit=False)
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            record_cache(self.name, hit=True)
+            return entry[0]
+
+    def get_stale(self, key: Hashable) -> Optional[Any]:
+        """The entry for `key` even if expired, as long as it is within `stale_ttl` of expiring."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] > self.ttl + self.stale_ttl:
+                return None
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,187 @@
+import os
+import asyncio
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Dict, Any, List, Tuple
+
+logger = logging.getLogger("jobs")
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+FINISHED_STATES = (SUCCEEDED, FAILED)
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB_PATH = os.path.join(_SCRIPT_DIR, 'result', 'jobs.db')
+
+
+class JobStore:
+    """Small SQLite-backed store so queued and finished jobs survive a restart."""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    input TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+                """
+            )
+
+    def create(self, input_task: str) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, input, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, QUEUED, input_task, time.time()),
+            )
+        return job_id
+
+    def mark_running(self, job_id: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ? WHERE id = ?",
+                (RUNNING, time.time(), job_id),
+            )
+
+    def mark_finished(self, job_id: str, result: Optional[str] = None, error: Optional[str] = None):
+        status = FAILED if error is not None else SUCCEEDED
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, result, error, time.time(), job_id),
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def unfinished(self):
+        """Return ids of jobs that were queued or running when the process stopped."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (QUEUED, RUNNING),
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobManager:
+    """
+    Runs crew jobs on a bounded thread pool so request handlers never block the event loop.
+
+    Args:
+        store: Persistent job store.
+        runner: Callable taking the input task and returning the crew result.
+        max_workers: Number of crew runs allowed at the same time.
+    """
+
+    def __init__(self, store: JobStore, runner: Callable[[str], Any], max_workers: int = 2):
+        self.store = store
+        self.runner = runner
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="crew-job")
+        # Long-polls waiting on each job: (event loop, future resolved when the job finishes)
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+        self._waiters_lock = threading.Lock()
+
+    def start(self):
+        """Re-queue jobs that a previous process accepted but never finished."""
+        pending = self.store.unfinished()
+        for job_id in pending:
+            self.executor.submit(self._execute, job_id)
+        if pending:
+            logger.info(f"Resumed {len(pending)} unfinished job(s)")
+
+    def shutdown(self, wait: bool = False):
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+    def submit(self, input_task: str) -> str:
+        job_id = self.store.create(input_task)
+        self.executor.submit(self._execute, job_id)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Wait until the job finishes or `timeout` seconds pass, then return its current record.
+        Waiting holds no thread: the job's worker resolves a future on the waiter's event loop.
+        """
+        loop = asyncio.get_running_loop()
+        finished = loop.create_future()
+        waiter = (loop, finished)
+        # Registered before the status check, so a job finishing in between still wakes us
+        with self._waiters_lock:
+            self._waiters.setdefault(job_id, []).append(waiter)
+        try:
+            job = self.store.get(job_id)
+            if job is None or job["status"] in FINISHED_STATES:
+                return job
+            try:
+                await asyncio.wait_for(finished, timeout)
+            except asyncio.TimeoutError:
+                pass
+            return self.store.get(job_id)
+        finally:
+            with self._waiters_lock:
+                waiters = self._waiters.get(job_id, [])
+                if waiter in waiters:
+                    waiters.remove(waiter)
+                if not waiters:
+                    self._waiters.pop(job_id, None)
+
+    def _wake(self, job_id: str):
+        with self._waiters_lock:
+            waiters = self._waiters.pop(job_id, [])
+        for loop, finished in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, finished)
+            except RuntimeError:
+                # The waiter's loop has closed
+                pass
+
+    def _execute(self, job_id: str):
+        job = self.store.get(job_id)
+        if job is None:
+            return
+        self.store.mark_running(job_id)
+        try:
+            result = self.runner(job["input"])
+            self.store.mark_finished(job_id, result=str(result))
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            self.store.mark_finished(job_id, error=str(e))
+        finally:
+            self._wake(job_id)
+
+
+def _resolve(finished: asyncio.Future):
+    if not finished.done():
+        finished.set_result(None)
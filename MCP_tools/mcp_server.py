@@ -1,9 +1,15 @@
 import sys
 import os
 import json
+import argparse
+import asyncio
 import logging
 import base64
-from contextlib import redirect_stdout
+import atexit
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from typing import Optional
 from datetime import datetime
 
@@ -14,14 +20,25 @@ sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
 from dotenv import load_dotenv
 load_dotenv()
 
-from fastmcp import FastMCP
-from calender.main import run
-
-# Gmail API imports
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from fastmcp import FastMCP, Context
+from fastmcp.exceptions import NotFoundError, ToolError
+from fastmcp.server.dependencies import get_http_headers
+from fastmcp.server.middleware import Middleware
+
+# crewai and the Google client libraries are heavy; they are imported on first use
+# (or preloaded in the background) so the server answers `initialize` quickly.
+from calender.plan_cache import plan_cache
+from calender.progress import describe_event
+from calender.batch import run_batch
+from calender.email_digest import plan_emails
+from calender.cancellation import CancelToken, RunCancelled, PLAN_DEADLINE_SECONDS
+from calender.workers import CREW_WORKERS, crew_workers
+from calender.metrics import METRICS_ENABLED, instrument_tool, record_cache, registry, start_dump_thread
+from gmail_utils import GmailServiceCache, fetch_message_metadata, token_file_lock
+from gmail_index import GmailIndex, DEFAULT_INDEX_PATH
+from http_client import TTLCache
+from outbound import STALE_CACHE_TTL, dependency, is_outage
+from search_backend import SEARCH_MAX_QUERIES, SEARCH_MAX_RESULTS, web_searcher
 
 # Setup logging to stderr so it doesn't interfere with stdout JSON-RPC
 logging.basicConfig(stream=sys.stderr, level=logging.INFO, format='%(levelname)s: %(message)s')
@@ -30,6 +47,103 @@ logger = logging.getLogger("mcp_server")
 # Create the FastMCP server instance
 mcp = FastMCP("CalendarMCPServer")
 
+
+def _preload_heavy_modules():
+    """Import crewai and the Google clients and warm the crew template."""
+    start = time.perf_counter()
+    try:
+        with _stdout_to_stderr():
+            import googleapiclient.discovery  # noqa: F401
+            import google.oauth2.credentials  # noqa: F401
+            if crew_workers is not None:
+                # Crews run in the worker processes, which build their own template
+                crew_workers.start()
+            else:
+                from calender.template import crew_template
+                crew_template.template()
+        logger.info(f"Preloaded heavy dependencies in {time.perf_counter() - start:.2f}s")
+    except Exception as e:
+        logger.warning(f"Background preload failed (will load on first use): {e}")
+
+
+class PreloadMiddleware(Middleware):
+    """Start the background preload once the client has finished the handshake."""
+
+    def __init__(self):
+        self._started = False
+
+    async def on_request(self, context, call_next):
+        if not self._started:
+            self._started = True
+            threading.Thread(target=_preload_heavy_modules, name="preload", daemon=True).start()
+        return await call_next(context)
+
+
+# Set MCP_PRELOAD=0 to load heavy dependencies only when a tool first needs them
+if os.getenv("MCP_PRELOAD", "1") != "0":
+    mcp.add_middleware(PreloadMiddleware())
+
+# HTTP clients send this header to bind their tool calls to one app user
+USER_HEADER = "x-daycrafter-user"
+
+
+class UserIsolationMiddleware(Middleware):
+    """
+    Pin the `user_id` argument of tool calls to the client's X-DayCrafter-User header.
+
+    One HTTP server serves many users, so a client must not be able to pass another
+    user's id. Calls without the header (stdio, or HTTP clients that don't send it)
+    keep the user_id they pass, unless MCP_REQUIRE_USER=1.
+    """
+
+    def __init__(self, require_user: bool = False):
+        self.require_user = require_user
+
+    async def on_call_tool(self, context, call_next):
+        message = context.message
+        try:
+            tool = await mcp.get_tool(message.name)
+        except NotFoundError:
+            # Unknown tools are reported by the server itself
+            return await call_next(context)
+        if "user_id" in tool.parameters.get("properties", {}):
+            user = get_http_headers().get(USER_HEADER)
+            arguments = dict(message.arguments or {})
+            if user:
+                if arguments.get("user_id") not in (None, user):
+                    raise ToolError("user_id does not match the X-DayCrafter-User header of this client")
+                arguments["user_id"] = user
+                message.arguments = arguments
+            elif self.require_user and get_http_headers(include_all=True):
+                raise ToolError("This server requires an X-DayCrafter-User header")
+        return await call_next(context)
+
+
+class InFlightMiddleware(Middleware):
+    """Counts tool calls in progress so shutdown can wait for them (e.g. crew runs) to finish."""
+
+    def __init__(self):
+        self.count = 0
+
+    async def on_call_tool(self, context, call_next):
+        self.count += 1
+        try:
+            return await call_next(context)
+        finally:
+            self.count -= 1
+
+    async def drain(self, timeout: float) -> int:
+        """Wait up to `timeout` seconds for calls in progress; return how many are still running."""
+        deadline = time.monotonic() + timeout
+        while self.count and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        return self.count
+
+
+mcp.add_middleware(UserIsolationMiddleware(require_user=os.getenv("MCP_REQUIRE_USER", "0") == "1"))
+in_flight_calls = InFlightMiddleware()
+mcp.add_middleware(in_flight_calls)
+
 # Gmail API scopes (read-only)
 GMAIL_SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 
@@ -46,65 +160,217 @@ def _get_token_path(user_id: str) -> str:
     return os.path.join(_TOKENS_DIR, f'token_{safe_id}.json')
 
 
+# Credentials and built Gmail services per app user; tokens are refreshed in the background
+gmail_services = GmailServiceCache(
+    _get_token_path,
+    GMAIL_SCOPES,
+    max_entries=int(os.getenv("GMAIL_CACHE_SIZE", 32)),
+)
+
+# Local metadata index for check_gmail; set GMAIL_INDEX=0 to always query Gmail
+gmail_index = None
+if os.getenv("GMAIL_INDEX", "1") != "0":
+    gmail_index = GmailIndex(
+        os.getenv("GMAIL_INDEX_PATH", DEFAULT_INDEX_PATH),
+        depth=int(os.getenv("GMAIL_INDEX_DEPTH", 200)),
+        freshness=float(os.getenv("GMAIL_INDEX_FRESHNESS", 30)),
+    )
+
+
 def _get_gmail_service(user_id: str = "default"):
-    """Authenticate and return a Gmail API service instance for a specific app user."""
-    token_path = _get_token_path(user_id)
-    creds = None
-
-    # Load existing token
-    if os.path.exists(token_path):
-        creds = Credentials.from_authorized_user_file(token_path, GMAIL_SCOPES)
-
-    # Refresh or re-authenticate
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            try:
-                creds.refresh(Request())
-            except Exception as e:
-                logger.error(f"Error refreshing token: {e}")
-                raise Exception(
-                    "Gmail authentication failed (refresh failed). "
-                    "Please run `python3 MCP_tools/setup_auth.py` in your terminal to re-authenticate."
-                )
-        else:
-            # DO NOT run local server here as it blocks the headless process
-            raise Exception(
-                "Gmail authentication required. "
-                "Please run `python3 MCP_tools/setup_auth.py` in your terminal to authenticate."
-            )
+    """Return a cached Gmail API service instance for a specific app user."""
+    return gmail_services.get(user_id)
+
+
+# Crew runs take minutes; they get their own bounded pool so they never block the event loop
+# or starve the default thread pool used by the I/O tools.
+# With crew worker processes the planner threads only wait on them, so allow one per worker.
+PLANNER_CONCURRENCY = int(os.getenv("PLANNER_CONCURRENCY", max(2, CREW_WORKERS)))
+_planner_executor = ThreadPoolExecutor(
+    max_workers=PLANNER_CONCURRENCY,
+    thread_name_prefix="planner",
+)
+
+# Optional cap on LLM calls per minute across a plan_batch call
+BATCH_LLM_RPM = float(os.getenv("BATCH_LLM_RPM", 0)) or None
+
+_stdout_lock = threading.Lock()
+_stdout_depth = 0
+_real_stdout = None
+
+
+@contextmanager
+def _stdout_to_stderr():
+    """
+    Like redirect_stdout(sys.stderr), but safe for concurrent crew runs: stdout is
+    restored only when the last run finishes, so no run can print into the JSON-RPC stream.
+    """
+    global _stdout_depth, _real_stdout
+    with _stdout_lock:
+        if _stdout_depth == 0:
+            _real_stdout = sys.stdout
+            sys.stdout = sys.stderr
+        _stdout_depth += 1
+    try:
+        yield
+    finally:
+        with _stdout_lock:
+            _stdout_depth -= 1
+            if _stdout_depth == 0:
+                sys.stdout = _real_stdout
+
 
-        # Save token for future use
-        with open(token_path, 'w') as token_file:
-            token_file.write(creds.to_json())
+def run_cached(topic: str, on_event=None, cancel=None) -> str:
+    """Run the crew through the plan cache, importing crewai on first use."""
+    from calender.main import run_cached as _run_cached
+    return _run_cached(topic, on_event=on_event, cancel=cancel)
 
-    return build('gmail', 'v1', credentials=creds)
+
+def _run_planner(topic: str, on_event=None, cancel=None) -> str:
+    # Execute the crew run function, redirecting stdout to stderr to prevent MCP JSON pollution
+    with _stdout_to_stderr():
+        return run_cached(topic, on_event=on_event, cancel=cancel)
 
 
 @mcp.tool()
-def task_and_schedule_planer(topic: str) -> str:
+@instrument_tool()
+async def task_and_schedule_planer(topic: str, ctx: Context, deadline_seconds: Optional[float] = None) -> str:
     """
     Plan and schedule tasks using the calendar crew agent.
     Use this for ANY task-related request including planning, scheduling, creating, or organizing tasks.
 
     Args:
         topic: The task description or query from the user
+        deadline_seconds: Optional limit on the planning time; the run stops once it is exceeded
     """
     logger.info(f"Executing task_and_schedule_planer with topic: {topic}")
-    
+    # Cancelled when the client sends notifications/cancelled, so the crew stops at its next step
+    token = CancelToken(deadline_seconds or PLAN_DEADLINE_SECONDS)
+
     try:
-        # Execute the crew run function, redirecting stdout to stderr to prevent MCP JSON pollution
-        with redirect_stdout(sys.stderr):
-            result = run(topic)
-        
-        # The result from run() might be complex, ensure it's a string
-        return str(result)
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+
+        async def forward_progress():
+            # Runs in the request's context, which report_progress needs to find the
+            # client's progress token (it is a no-op when the client sent none)
+            progress = 0
+            await ctx.report_progress(progress, None, "Planning started")
+            while (event := await events.get()) is not None:
+                progress += 1
+                await ctx.report_progress(progress, None, describe_event(event))
+
+        def on_event(event):
+            # Called on the planner thread
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        forwarder = asyncio.create_task(forward_progress())
+        try:
+            result = await loop.run_in_executor(_planner_executor, _run_planner, topic, on_event, token)
+        except asyncio.CancelledError:
+            token.cancel()
+            logger.info(f"task_and_schedule_planer cancelled by the client: {topic[:80]}")
+            raise
+        finally:
+            # Deliver every progress notification before the result
+            events.put_nowait(None)
+            await forwarder
+
+        logger.info(f"Plan cache stats: {plan_cache.stats()}")
+        return result
+    except RunCancelled as e:
+        raise ToolError(str(e))
     except Exception as e:
         logger.error(f"Error executing tool: {e}")
         raise
 
 
 @mcp.tool()
-def check_gmail(query: str = "is:inbox", max_results: int = 10, user_id: str = "default") -> str:
+@instrument_tool()
+async def plan_batch(topics: list[str], ctx: Context, max_concurrency: Optional[int] = None) -> str:
+    """
+    Plan several independent topics at once, e.g. every module of a syllabus.
+    Use this instead of calling task_and_schedule_planer repeatedly.
+
+    Args:
+        topics: The task descriptions to plan, one roadmap per topic
+        max_concurrency: Optional limit on topics planned at the same time
+    """
+    logger.info(f"Executing plan_batch with {len(topics)} topic(s)")
+    concurrency = min(max_concurrency or PLANNER_CONCURRENCY, PLANNER_CONCURRENCY)
+    loop = asyncio.get_running_loop()
+    items: asyncio.Queue = asyncio.Queue()
+    token = CancelToken(PLAN_DEADLINE_SECONDS)
+
+    def drive():
+        # Runs on a default-pool thread (not a planner thread, which its own runs would wait behind);
+        # the runs share the planner pool with single plans, and each finished topic goes to the event loop
+        try:
+            for item in run_batch(topics, _run_planner, max_concurrency=concurrency, llm_rpm=BATCH_LLM_RPM,
+                                  cancel=token, executor=_planner_executor):
+                loop.call_soon_threadsafe(items.put_nowait, item)
+        finally:
+            loop.call_soon_threadsafe(items.put_nowait, None)
+
+    driver = loop.run_in_executor(None, drive)
+    results, summary = [], {}
+    try:
+        while (item := await items.get()) is not None:
+            if item.pop("summary", False):
+                summary = item
+                continue
+            results.append(item)
+            status = "Planned" if item["status"] == "success" else "Failed"
+            await ctx.report_progress(len(results), len(topics), f"{status}: {item['topic'][:80]}")
+        await driver
+    except asyncio.CancelledError:
+        # Topics not started yet are skipped and runs in progress stop at their next step
+        token.cancel()
+        raise
+
+    results.sort(key=lambda item: item["index"])
+    logger.info(f"plan_batch finished: {summary}")
+    return json.dumps({"results": results, "summary": summary}, ensure_ascii=False)
+
+
+def _fetch_emails(service, query: str, max_results: int) -> list:
+    """Query the Gmail API directly and return emails in check_gmail's shape."""
+    # List messages matching the query
+    results = service.users().messages().list(
+        userId='me',
+        q=query,
+        maxResults=max_results,
+    ).execute()
+
+    messages = results.get('messages', [])
+    if not messages:
+        return []
+
+    # Fetch all message metadata in batch requests instead of one round trip per message
+    message_ids = [msg_ref['id'] for msg_ref in messages]
+    metadata = fetch_message_metadata(service, message_ids)
+
+    email_list = []
+    for msg_ref, msg in zip(messages, metadata):
+        headers = {h['name']: h['value'] for h in msg.get('payload', {}).get('headers', [])}
+        snippet = msg.get('snippet', '')
+        labels = msg.get('labelIds', [])
+
+        email_list.append({
+            "id": msg_ref['id'],
+            "subject": headers.get('Subject', '(No Subject)'),
+            "from": headers.get('From', 'Unknown'),
+            "to": headers.get('To', ''),
+            "date": headers.get('Date', ''),
+            "snippet": snippet,
+            "is_unread": 'UNREAD' in labels,
+        })
+    return email_list
+
+
+@mcp.tool()
+@instrument_tool()
+async def check_gmail(query: str = "is:inbox", max_results: int = 10, user_id: str = "default") -> str:
     """
     Check Gmail inbox and return recent emails.
     Use this when the user wants to check, read, or search their email.
@@ -115,50 +381,59 @@ def check_gmail(query: str = "is:inbox", max_results: int = 10, user_id: str = "
         user_id: The app user identifier to isolate Gmail tokens per account.
     """
     logger.info(f"Executing check_gmail for user='{user_id}' with query='{query}', max_results={max_results}")
+    # The Gmail client is blocking; run it on a worker thread
+    return await asyncio.to_thread(_check_gmail, query, max_results, user_id)
 
-    try:
-        service = _get_gmail_service(user_id)
-
-        # List messages matching the query
-        results = service.users().messages().list(
-            userId='me',
-            q=query,
-            maxResults=max_results,
-        ).execute()
 
-        messages = results.get('messages', [])
+def _search_emails(query: str, max_results: int, user_id: str) -> list:
+    # Built services share one HTTP connection per user, which is not thread-safe
+    with gmail_services.lock_for(user_id):
+        service = _get_gmail_service(user_id)
+        # Only Gmail API calls go through the guard; index lookups and their errors are local
+        gmail = dependency("gmail")
+        try:
+            # Common queries are answered from the local index, kept fresh through history.list
+            email_list = None
+            if gmail_index is not None:
+                try:
+                    email_list = gmail_index.search(service, user_id, query, max_results, call=gmail.call_sync)
+                except Exception as e:
+                    if is_outage(e):
+                        raise
+                    logger.warning(f"Gmail index unavailable, querying Gmail directly: {e}")
+
+                record_cache("gmail_index", hit=email_list is not None)
+
+            if email_list is None:
+                email_list = gmail.call_sync(lambda: _fetch_emails(service, query, max_results))
+            return email_list
+        except Exception as e:
+            # While Gmail is down, answer from the index as of its last sync
+            stale = gmail_index.search_local(user_id, query, max_results) \
+                if gmail_index is not None and is_outage(e) else None
+            if stale is None:
+                raise
+            gmail.served_stale()
+            logger.warning(f"Serving stale Gmail results from the index: {e}")
+            return [dict(email, stale=True) for email in stale]
+
+
+def _check_gmail(query: str, max_results: int, user_id: str) -> str:
+    try:
+        email_list = _search_emails(query, max_results, user_id)
 
-        if not messages:
+        if not email_list:
             return json.dumps({"emails": [], "total": 0, "message": "No emails found matching your query."})
 
-        email_list = []
-        for msg_ref in messages:
-            msg = service.users().messages().get(
-                userId='me',
-                id=msg_ref['id'],
-                format='metadata',
-                metadataHeaders=['Subject', 'From', 'Date', 'To'],
-            ).execute()
-
-            headers = {h['name']: h['value'] for h in msg.get('payload', {}).get('headers', [])}
-            snippet = msg.get('snippet', '')
-            labels = msg.get('labelIds', [])
-
-            email_list.append({
-                "id": msg_ref['id'],
-                "subject": headers.get('Subject', '(No Subject)'),
-                "from": headers.get('From', 'Unknown'),
-                "to": headers.get('To', ''),
-                "date": headers.get('Date', ''),
-                "snippet": snippet,
-                "is_unread": 'UNREAD' in labels,
-            })
-
-        return json.dumps({
+        result = {
             "emails": email_list,
             "total": len(email_list),
             "query": query,
-        })
+        }
+        if any(email.get("stale") for email in email_list):
+            result["stale"] = True
+            result["message"] = "Gmail is unreachable; these results are from the last sync and may be incomplete."
+        return json.dumps(result)
 
     except FileNotFoundError as e:
         return json.dumps({"error": str(e)})
@@ -167,8 +442,107 @@ def check_gmail(query: str = "is:inbox", max_results: int = 10, user_id: str = "
         return json.dumps({"error": f"Failed to check Gmail: {str(e)}"})
 
 
+def plan_topic(topic: str, on_event=None, cancel=None) -> str:
+    """The unscheduled roadmap for a topic through the plan cache, importing crewai on first use."""
+    from calender.main import plan_cached
+    with _stdout_to_stderr():
+        return plan_cached(topic, on_event=on_event, cancel=cancel)
+
+
+@mcp.tool()
+@instrument_tool()
+async def plan_from_emails(ctx: Context, query: str = "is:unread in:inbox", max_results: int = 30,
+                           user_id: str = "default") -> str:
+    """
+    Turn the user's emails into scheduled calendar tasks, each tagged with the email it came from.
+    Use this when the user wants tasks or a plan made from their inbox; it plans many emails
+    in a few crew runs instead of one run per email.
+
+    Args:
+        query: Gmail search query selecting the emails, as for check_gmail. Defaults to unread inbox emails.
+        max_results: Maximum number of emails to read. Defaults to 30.
+        user_id: The app user identifier to isolate Gmail tokens per account.
+    """
+    logger.info(f"Executing plan_from_emails for user='{user_id}' with query='{query}', max_results={max_results}")
+    try:
+        emails = await asyncio.to_thread(_search_emails, query, max_results, user_id)
+    except Exception as e:
+        logger.error(f"Error reading Gmail: {e}")
+        raise ToolError(f"Error reading Gmail: {e}")
+
+    loop = asyncio.get_running_loop()
+    batches: asyncio.Queue = asyncio.Queue()
+    token = CancelToken(PLAN_DEADLINE_SECONDS)
+
+    async def forward_progress():
+        done = 0
+        while (item := await batches.get()) is not None:
+            done += 1
+            status = "Planned" if item["status"] == "success" else "Failed"
+            await ctx.report_progress(done, None, f"{status} email batch {item['index'] + 1}")
+
+    def on_batch(item):
+        # Called on the worker thread
+        loop.call_soon_threadsafe(batches.put_nowait, item)
+
+    forwarder = asyncio.create_task(forward_progress())
+    try:
+        digest = await loop.run_in_executor(None, lambda: plan_emails(
+            emails, plan_topic, max_concurrency=PLANNER_CONCURRENCY, cancel=token, on_batch=on_batch,
+            executor=_planner_executor))
+    except asyncio.CancelledError:
+        # Batches not started yet are skipped and runs in progress stop at their next step
+        token.cancel()
+        raise
+    finally:
+        batches.put_nowait(None)
+        await forwarder
+
+    logger.info(f"plan_from_emails planned {digest['planned_emails']} of {digest['emails']} email(s) "
+                f"in {digest['batches']} batch(es)")
+    return json.dumps(digest, ensure_ascii=False)
+
+
+def _replan(plan, delta, topic: str, cancel=None) -> dict:
+    """Re-plan through the planner agent's LLM, importing crewai on first use."""
+    from calender.replan import planner_llm_call, replan
+    with _stdout_to_stderr():
+        return replan(plan, delta, planner_llm_call, topic=topic, cancel=cancel)
+
+
+@mcp.tool()
+@instrument_tool()
+async def replan_tasks(plan: list[dict], delta: list[dict], topic: str = "") -> str:
+    """
+    Change an existing plan instead of planning it again, e.g. when a task moved, was dropped,
+    or needs an extra subtask. Unchanged tasks keep their calendar slots.
+
+    Args:
+        plan: The previous plan's tasks, as returned by task_and_schedule_planer.
+        delta: The changes, applied in order. Each is one of
+            {"op": "update", "task": <task name or 1-based position>, "set": {<field>: <value>}},
+            {"op": "remove", "task": ...},
+            {"op": "add", "item": {<task>}} or {"op": "add", "request": "<what to add>"},
+            {"op": "revise", "task": ..., "request": "<how to change it>"}.
+        topic: The previous plan's topic, used as context for "request" changes.
+    """
+    logger.info(f"Executing replan_tasks with {len(delta)} change(s)")
+    token = CancelToken(PLAN_DEADLINE_SECONDS)
+    loop = asyncio.get_running_loop()
+    try:
+        result = await loop.run_in_executor(_planner_executor, _replan, plan, delta, topic, token)
+    except asyncio.CancelledError:
+        token.cancel()
+        raise
+    except (RunCancelled, ValueError) as e:
+        raise ToolError(str(e))
+    logger.info(f"replan_tasks re-slotted {len(result['rescheduled'])} task(s) with {result['llm_calls']} LLM call(s)")
+    return json.dumps(result, ensure_ascii=False)
+
+
 @mcp.tool()
-def switch_gmail_account(user_id: str = "default") -> str:
+@instrument_tool()
+async def switch_gmail_account(user_id: str = "default") -> str:
     """
     Switch to a different Gmail account by clearing the saved authentication.
     Use this when the user wants to switch, change, or log out of their current Gmail account.
@@ -178,11 +552,22 @@ def switch_gmail_account(user_id: str = "default") -> str:
         user_id: The app user identifier whose Gmail token should be cleared.
     """
     logger.info(f"Executing switch_gmail_account for user='{user_id}' - clearing saved token")
+    return await asyncio.to_thread(_switch_gmail_account, user_id)
 
+
+def _switch_gmail_account(user_id: str) -> str:
     try:
-        token_path = _get_token_path(user_id)
-        if os.path.exists(token_path):
-            os.remove(token_path)
+        # Held so a search or token refresh for this user can't rebuild the service or rewrite its token meanwhile
+        with gmail_services.lock_for(user_id):
+            gmail_services.evict(user_id)
+            if gmail_index is not None:
+                gmail_index.drop_user(user_id)
+            token_path = _get_token_path(user_id)
+            with token_file_lock(token_path):
+                removed = os.path.exists(token_path)
+                if removed:
+                    os.remove(token_path)
+        if removed:
             return json.dumps({
                 "status": "success",
                 "message": "Gmail account disconnected. The next email check will prompt you to log in with a new account."
@@ -197,20 +582,60 @@ def switch_gmail_account(user_id: str = "default") -> str:
         return json.dumps({"error": f"Failed to switch account: {str(e)}"})
 
 
+# Slow-changing lookups are cached; weather by coordinates snapped to a grid
+IPAPI_URL = os.getenv("IPAPI_URL", "https://ipapi.co/json/")
+OPEN_METEO_URL = os.getenv("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+WEATHER_GRID_DEGREES = float(os.getenv("WEATHER_GRID_DEGREES", 0.1))
+_location_cache = TTLCache(ttl=float(os.getenv("LOCATION_CACHE_TTL", 3600)), max_entries=1, name="location",
+                           stale_ttl=STALE_CACHE_TTL)
+_weather_cache = TTLCache(ttl=float(os.getenv("WEATHER_CACHE_TTL", 600)), name="weather", stale_ttl=STALE_CACHE_TTL)
+
+# Simple WMO Weather interpretation
+_WEATHER_STATUS = {
+    0: "Clear sky",
+    1: "Mainly clear", 2: "Partly cloudy", 3: "Overcast",
+    45: "Fog", 48: "Depositing rime fog",
+    51: "Light drizzle", 53: "Moderate drizzle", 55: "Dense drizzle",
+    61: "Slight rain", 63: "Moderate rain", 65: "Heavy rain",
+    71: "Slight snow fall", 73: "Moderate snow fall", 75: "Heavy snow fall",
+    77: "Snow grains",
+    80: "Slight rain showers", 81: "Moderate rain showers", 82: "Violent rain showers",
+    85: "Slight snow showers", 86: "Heavy snow showers",
+    95: "Thunderstorm", 96: "Thunderstorm with slight hail", 99: "Thunderstorm with heavy hail"
+}
+
+
+def _snap_to_grid(value: float) -> float:
+    return round(round(value / WEATHER_GRID_DEGREES) * WEATHER_GRID_DEGREES, 4)
+
+
+def _stale(guard, cache: TTLCache, key, error: Exception) -> Optional[str]:
+    """The last cached answer for `key`, marked stale, when `error` means the service is down."""
+    cached = cache.get_stale(key) if is_outage(error) else None
+    if cached is None:
+        return None
+    guard.served_stale()
+    logger.warning(f"Serving stale {cache.name} data: {error}")
+    return json.dumps({**json.loads(cached), "stale": True})
+
+
 @mcp.tool()
-def get_location() -> str:
+@instrument_tool()
+async def get_location() -> str:
     """
     Get the user's current precise location (latitude, longitude, city, country).
     Use this for context-aware recommendations, weather, or local time.
     """
     logger.info("Executing get_location")
+    cached = _location_cache.get("self")
+    if cached is not None:
+        return cached
     try:
-        import httpx
-        # Using ipapi.co for simple geolocation
-        response = httpx.get("https://ipapi.co/json/", timeout=5.0)
+        # Using ipapi.co for simple geolocation; the lookup is per process (its public IP)
+        response = await dependency("ipapi").get(IPAPI_URL)
         if response.status_code == 200:
             data = response.json()
-            return json.dumps({
+            result = json.dumps({
                 "city": data.get("city"),
                 "region": data.get("region"),
                 "country": data.get("country_name"),
@@ -219,14 +644,20 @@ def get_location() -> str:
                 "postal": data.get("postal"),
                 "timezone": data.get("timezone")
             })
+            _location_cache.set("self", result)
+            return result
         return json.dumps({"error": "Failed to fetch location data"})
     except Exception as e:
+        stale = _stale(dependency("ipapi"), _location_cache, "self", e)
+        if stale is not None:
+            return stale
         logger.error(f"Error getting location: {e}")
         return json.dumps({"error": str(e)})
 
 
 @mcp.tool()
-def get_weather(latitude: float, longitude: float) -> str:
+@instrument_tool()
+async def get_weather(latitude: float, longitude: float) -> str:
     """
     Get the current weather and temperature for a specific location.
     
@@ -235,11 +666,16 @@ def get_weather(latitude: float, longitude: float) -> str:
         longitude: Longitude of the location.
     """
     logger.info(f"Executing get_weather for lat={latitude}, lon={longitude}")
+    key = (_snap_to_grid(latitude), _snap_to_grid(longitude))
+    cached = _weather_cache.get(key)
+    if cached is not None:
+        return cached
     try:
-        import httpx
         # Use open-meteo for free, no-key weather data
-        url = f"https://api.open-meteo.com/v1/forecast?latitude={latitude}&longitude={longitude}&current_weather=true"
-        response = httpx.get(url, timeout=5.0)
+        response = await dependency("open_meteo").get(
+            OPEN_METEO_URL,
+            params={"latitude": key[0], "longitude": key[1], "current_weather": "true"},
+        )
         
         if response.status_code == 200:
             data = response.json()
@@ -247,35 +683,36 @@ def get_weather(latitude: float, longitude: float) -> str:
             temp = current.get("temperature")
             code = current.get("weathercode")
             
-            # Simple WMO Weather interpretation
-            status_map = {
-                0: "Clear sky",
-                1: "Mainly clear", 2: "Partly cloudy", 3: "Overcast",
-                45: "Fog", 48: "Depositing rime fog",
-                51: "Light drizzle", 53: "Moderate drizzle", 55: "Dense drizzle",
-                61: "Slight rain", 63: "Moderate rain", 65: "Heavy rain",
-                71: "Slight snow fall", 73: "Moderate snow fall", 75: "Heavy snow fall",
-                77: "Snow grains",
-                80: "Slight rain showers", 81: "Moderate rain showers", 82: "Violent rain showers",
-                85: "Slight snow showers", 86: "Heavy snow showers",
-                95: "Thunderstorm", 96: "Thunderstorm with slight hail", 99: "Thunderstorm with heavy hail"
-            }
-            
-            status = status_map.get(code, "Clear")
-            return json.dumps({
+            status = _WEATHER_STATUS.get(code, "Clear")
+            result = json.dumps({
                 "temperature": temp,
                 "unit": "°C",
                 "status": status,
                 "weather_code": code
             })
+            _weather_cache.set(key, result)
+            return result
         return json.dumps({"error": f"Failed to fetch weather: {response.status_code}"})
     except Exception as e:
+        stale = _stale(dependency("open_meteo"), _weather_cache, key, e)
+        if stale is not None:
+            return stale
         logger.error(f"Error getting weather: {e}")
         return json.dumps({"error": str(e)})
 
 
+def _format_results(results) -> str:
+    summary = "Web Search Results:\n\n"
+    if any(r.get("stale") for r in results):
+        summary = "Web Search Results (cached; the search service is unavailable right now):\n\n"
+    for i, r in enumerate(results):
+        summary += f"{i+1}. {r['title']}\n   Source: {r['href']}\n   {r['body']}\n\n"
+    return summary
+
+
 @mcp.tool()
-def web_search(query: str) -> str:
+@instrument_tool()
+async def web_search(query: str) -> str:
     """
     Search the web for up-to-date information.
     Use this for news, weather, traffic, or general knowledge not in the personal knowledge base.
@@ -285,21 +722,10 @@ def web_search(query: str) -> str:
     """
     logger.info(f"Executing web_search for query: {query}")
     try:
-        from duckduckgo_search import DDGS
-        
-        results = DDGS().text(query, max_results=5)
-        
+        results = await web_searcher.search(query, max_results=SEARCH_MAX_RESULTS)
         if not results:
             return "No results found."
-            
-        summary = "Web Search Results:\n\n"
-        for i, r in enumerate(results):
-            title = r.get('title', 'No Title')
-            link = r.get('href', '#')
-            body = r.get('body', '')
-            summary += f"{i+1}. {title}\n   Source: {link}\n   {body}\n\n"
-            
-        return summary
+        return _format_results(results)
     except ImportError:
         return "Error: duckduckgo-search package not installed. Please run 'pip install duckduckgo-search'."
     except Exception as e:
@@ -308,6 +734,34 @@ def web_search(query: str) -> str:
 
 
 @mcp.tool()
+@instrument_tool()
+async def web_search_many(queries: list[str], max_results: int = 5) -> str:
+    """
+    Search the web for several queries at once and return one merged list without duplicate links.
+    Use this instead of calling web_search repeatedly, e.g. to research every part of a plan.
+
+    Args:
+        queries: The search query strings; near-identical ones are searched once.
+        max_results: Results per query. Defaults to 5, which is also the most web_search returns.
+    """
+    logger.info(f"Executing web_search_many with {len(queries)} queries")
+    if len(queries) > SEARCH_MAX_QUERIES:
+        raise ToolError(f"At most {SEARCH_MAX_QUERIES} queries per call, got {len(queries)}")
+    # Capped like web_search; every query would otherwise ask the backend for this many
+    max_results = max(1, min(max_results, SEARCH_MAX_RESULTS))
+    merged = await web_searcher.search_many(queries, max_results=max_results)
+    if not merged["results"] and merged["errors"]:
+        return "Error: " + "; ".join(f"{e['query']}: {e['error']}" for e in merged["errors"])
+    if not merged["results"]:
+        return "No results found."
+    summary = _format_results(merged["results"])
+    for error in merged["errors"]:
+        summary += f"Search failed for '{error['query']}': {error['error']}\n"
+    return summary
+
+
+@mcp.tool()
+@instrument_tool()
 def create_project(name: str, description: str, color_hex: str = "#4F46E5", icon: str = "Folder") -> str:
     """
     Create a new project in the system.
@@ -331,7 +785,85 @@ def create_project(name: str, description: str, color_hex: str = "#4F46E5", icon
     })
 
 
-if __name__ == "__main__":
-    logger.info("Starting Calendar MCP Server (FastMCP)...")
-    mcp.run()
+# The stdio server has no HTTP port, so metrics are written to a file in the Prometheus text format
+METRICS_DUMP_PATH = os.getenv("METRICS_DUMP_PATH", os.path.join(_SCRIPT_DIR, "result", "mcp_metrics.prom"))
+METRICS_DUMP_INTERVAL = float(os.getenv("METRICS_DUMP_INTERVAL", 15))
+
 
+def _dump_metrics():
+    try:
+        registry.dump(METRICS_DUMP_PATH)
+    except OSError as e:
+        logger.warning(f"Could not write metrics to {METRICS_DUMP_PATH}: {e}")
+
+
+# Seconds an HTTP server waits for tool calls in progress when asked to stop
+MCP_DRAIN_SECONDS = float(os.getenv("MCP_DRAIN_SECONDS", 300))
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request):
+    """Prometheus text for HTTP transports (the stdio server dumps it to METRICS_DUMP_PATH instead)."""
+    from starlette.responses import PlainTextResponse
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@mcp.custom_route("/health", methods=["GET"])
+async def health_endpoint(request):
+    from starlette.responses import JSONResponse
+    return JSONResponse({"status": "healthy", "tool_calls_in_flight": in_flight_calls.count})
+
+
+def run_http(transport: str, host: str, port: int, drain_seconds: float = MCP_DRAIN_SECONDS):
+    """
+    Serve many clients from this process over streamable HTTP (or SSE).
+
+    Every client shares the warm crew template, plan cache, Gmail services and HTTP
+    pool. On SIGINT/SIGTERM the server stops accepting connections, waits up to
+    `drain_seconds` for tool calls in progress (crew runs included) to finish, then exits.
+    """
+    import uvicorn
+    from sse_starlette.sse import AppStatus
+
+    # sse-starlette ends every open SSE response on the exit signal, which would cut off
+    # the responses of calls being drained; streams are closed after the drain instead
+    AppStatus.disable_automatic_graceful_drain()
+
+    class DrainingServer(uvicorn.Server):
+        async def shutdown(self, sockets=None):
+            for server in self.servers:
+                server.close()
+            logger.info(f"Draining {in_flight_calls.count} tool call(s) in progress...")
+            remaining = await in_flight_calls.drain(drain_seconds)
+            if remaining:
+                logger.warning(f"Shutting down with {remaining} tool call(s) still running")
+            # Give the responses of drained calls a moment to reach their clients
+            await asyncio.sleep(0.5)
+            AppStatus.should_exit = True
+            await super().shutdown(sockets)
+
+    app = mcp.http_app(transport=transport)
+    # Responses of drained calls only need a moment to flush
+    config = uvicorn.Config(app, host=host, port=port, lifespan="on", timeout_graceful_shutdown=5, log_level="info")
+    DrainingServer(config).run()
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="DayCrafter MCP server.")
+    parser.add_argument("--transport", choices=("stdio", "http", "sse"), default=os.getenv("MCP_TRANSPORT", "stdio"),
+                        help="stdio (one client per process, the default) or http/sse (many clients per process)")
+    parser.add_argument("--host", default=os.getenv("MCP_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("MCP_PORT", 8765)))
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    logger.info(f"Starting Calendar MCP Server (FastMCP, {args.transport})...")
+    if args.transport == "stdio":
+        if METRICS_ENABLED:
+            start_dump_thread(METRICS_DUMP_PATH, METRICS_DUMP_INTERVAL)
+            atexit.register(_dump_metrics)
+        mcp.run()
+    else:
+        run_http(args.transport, args.host, args.port)
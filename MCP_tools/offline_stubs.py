@@ -0,0 +1,409 @@
+"""
+Offline stand-ins for the LLM and the external services, for benchmarks and tests.
+
+`install()` points a process at local fakes so the API and the MCP server can be
+driven without network access or credentials:
+
+- the crew's LLM is replaced by `FakeLLM`, which waits a configurable latency
+  and answers with a deterministic roadmap;
+- ipapi.co and open-meteo are served by a local HTTP stub;
+- Gmail is a `FakeGmailService` with a per-call latency;
+- web search runs against `FakeSearchIndex`, a small local index with a per-search delay;
+- each fake service has `Faults` that inject error statuses, Retry-After headers and delays.
+
+Settings come from keyword arguments or the OFFLINE_* environment variables, so a
+subprocess can be configured with `python -c "import offline_stubs; offline_stubs.install(); ..."`.
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+
+class Faults:
+    """
+    Failures a fake service injects into its next calls, for testing how callers cope with outages.
+
+    `inject(status=503)` fails every call with that status until `clear()`; `times` limits it to
+    the next n calls, `retry_after` adds a Retry-After, and `delay` slows calls down without failing them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def inject(self, status: Optional[int] = None, retry_after: Optional[float] = None, delay: float = 0.0,
+               times: Optional[int] = None):
+        with self._lock:
+            self.status, self.retry_after, self.delay, self.remaining = status, retry_after, delay, times
+
+    def clear(self):
+        self.inject()
+
+    def take(self):
+        """(status, retry_after, delay) for the next call; status None means it succeeds."""
+        with self._lock:
+            if self.remaining == 0:
+                return None, None, 0.0
+            if self.remaining is not None:
+                self.remaining -= 1
+            return self.status, self.retry_after, self.delay
+
+
+def _gmail_fault(service):
+    status, retry_after, delay = service.faults.take()
+    time.sleep(delay)
+    if status is not None:
+        headers = {"status": status}
+        if retry_after is not None:
+            headers["retry-after"] = str(retry_after)
+        raise HttpError(httplib2.Response(headers), b"injected fault")
+
+
+class FakeRequest:
+    def __init__(self, service, response):
+        self.service = service
+        self.response = response
+
+    def execute(self):
+        self.service.round_trips += 1
+        _gmail_fault(self.service)
+        time.sleep(self.service.latency)
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+
+class FakeBatch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        assert len(self.requests) < 100, "Gmail batch limit exceeded"
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        # One HTTP round trip for the whole batch
+        self.service.round_trips += 1
+        _gmail_fault(self.service)
+        self.service.batch_sizes.append(len(self.requests))
+        time.sleep(self.service.latency)
+        for request_id, request in self.requests:
+            self.callback(request_id, request.response, None)
+
+
+class FakeHistory:
+    def __init__(self, service):
+        self.service = service
+
+    def list(self, userId, startHistoryId, pageToken=None):
+        service = self.service
+        if int(startHistoryId) < service.oldest_history_id:
+            return FakeRequest(service, HttpError(httplib2.Response({"status": 404}), b"history expired"))
+        records = [r for r in service.history_records if r["id"] > int(startHistoryId)]
+        return FakeRequest(service, {"history": records, "historyId": str(service.history_id)})
+
+
+class FakeGmailService:
+    """Local stand-in for the Gmail discovery service with per-call latency."""
+
+    def __init__(self, message_count, latency=0.02):
+        self.latency = latency
+        self.faults = Faults()
+        self.round_trips = 0
+        self.batch_sizes = []
+        self.history_id = 1000
+        self.oldest_history_id = 0
+        self.history_records = []
+        self.store = {}
+        for i in range(message_count):
+            self._put(f"m{i}", i, ["INBOX", "UNREAD"] if i % 2 else ["INBOX"])
+
+    def _put(self, msg_id, i, labels):
+        self.store[msg_id] = {
+            "id": msg_id,
+            "threadId": msg_id,
+            "snippet": f"snippet {i}",
+            "labelIds": labels,
+            # m0 is the newest message, like Gmail's list order
+            "internalDate": str(1_700_000_000_000 - i * 60_000),
+            "payload": {"headers": [
+                {"name": "Subject", "value": f"Subject {i}"},
+                {"name": "From", "value": f"sender{i}@example.com"},
+                {"name": "To", "value": "me@example.com"},
+                {"name": "Date", "value": "Mon, 1 Jan 2024 09:00:00 +0000"},
+            ]},
+        }
+
+    def _record(self, key, msg_id):
+        self.history_id += 1
+        self.history_records.append({"id": self.history_id, key: [{"message": {"id": msg_id}}]})
+
+    def add_message(self, msg_id, labels=("INBOX", "UNREAD")):
+        self._put(msg_id, -len(self.store), list(labels))
+        self.store = {msg_id: self.store.pop(msg_id), **self.store}
+        self._record("messagesAdded", msg_id)
+
+    def mark_read(self, msg_id):
+        self.store[msg_id]["labelIds"] = [l for l in self.store[msg_id]["labelIds"] if l != "UNREAD"]
+        self._record("labelsRemoved", msg_id)
+
+    def delete_message(self, msg_id):
+        del self.store[msg_id]
+        self._record("messagesDeleted", msg_id)
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def history(self):
+        return FakeHistory(self)
+
+    def getProfile(self, userId):
+        return FakeRequest(self, {"historyId": str(self.history_id)})
+
+    def list(self, userId, maxResults, q=None, pageToken=None):
+        start = int(pageToken or 0)
+        ids = list(self.store)[start:start + maxResults]
+        response = {"messages": [{"id": i, "threadId": i} for i in ids]}
+        if start + maxResults < len(self.store):
+            response["nextPageToken"] = str(start + maxResults)
+        return FakeRequest(self, response)
+
+    def get(self, userId, id, format, metadataHeaders):
+        return FakeRequest(self, self.store[id])
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+
+def fake_roadmap(topic: str, count: int = 5) -> list:
+    """Deterministic roadmap items for `topic`, in the shape the execution task asks for."""
+    return [
+        {
+            "DueDate": "",
+            "task": f"Step {i + 1}: {topic[:60]}",
+            "priority": i + 1,
+            "links": "",
+            "Description": f"Offline plan item {i + 1} for {topic[:60]}",
+            "duration_minutes": 30 + 15 * (i % 3),
+        }
+        for i in range(count)
+    ]
+
+
+def _fake_llm_class():
+    # crewai is heavy; only import it when a crew is actually built
+    from crewai.llms.base_llm import BaseLLM
+
+    class FakeLLM(BaseLLM):
+        """
+        LLM that waits `latency` seconds and answers with a roadmap, without a network call.
+
+        Token usage is estimated at four characters per token so usage metrics stay meaningful.
+        """
+
+        def __init__(self, latency: float = 0.5, items: int = 5, stream: bool = False):
+            super().__init__(model="offline-fake", provider="offline")
+            self.latency = latency
+            self.items = items
+            self.stream = stream
+
+        def call(self, messages, tools=None, callbacks=None, available_functions=None,
+                 from_task=None, from_agent=None, response_model=None) -> str:
+            prompt = messages if isinstance(messages, str) else "\n".join(
+                str(m.get("content", "")) for m in messages)
+            topic = ""
+            if from_task is not None:
+                topic = getattr(from_task, "description", "") or ""
+            topic = " ".join(topic.split()[-12:]) or "offline topic"
+            reply = "Thought: I now know the final answer\nFinal Answer: " + json.dumps(
+                fake_roadmap(topic, self.items), indent=2)
+
+            time.sleep(self.latency)
+            if self.stream:
+                for start in range(0, len(reply), 32):
+                    self._emit_stream_chunk_event(reply[start:start + 32], from_task=from_task, from_agent=from_agent)
+            self._track_token_usage_internal({
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": len(reply) // 4,
+            })
+            return reply
+
+        def supports_function_calling(self) -> bool:
+            return False
+
+        def get_context_window_size(self) -> int:
+            return 128000
+
+    return FakeLLM
+
+
+class ExternalStubHandler(BaseHTTPRequestHandler):
+    """Serves canned ipapi.co and open-meteo responses after `latency` seconds, or the faults injected."""
+
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    faults: Faults
+
+    def do_GET(self):
+        status, retry_after, delay = self.faults.take()
+        time.sleep(self.latency + delay)
+        if status is not None:
+            self.send_response(status)
+            if retry_after is not None:
+                self.send_header("Retry-After", str(retry_after))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if urlparse(self.path).path == "/json/":
+            body = {"city": "Taipei", "region": "Taipei", "country_name": "Taiwan",
+                    "latitude": 25.05, "longitude": 121.53, "postal": "100", "timezone": "Asia/Taipei"}
+        else:
+            body = {"current_weather": {"temperature": 27.5, "weathercode": 2}}
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_stub(latency: float = 0.0) -> ThreadingHTTPServer:
+    """Start the ipapi/open-meteo stub on a free port and return the server; `server.faults` injects failures."""
+    faults = Faults()
+    handler = type("ExternalStub", (ExternalStubHandler,), {"latency": latency, "faults": faults})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.faults = faults
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+_INDEX_WORDS = ("rust", "python", "budget", "meeting", "exam", "travel", "fitness", "garden",
+                "recipe", "report", "offline", "benchmark", "calendar", "email", "project", "review")
+
+
+class FakeSearchIndex:
+    """
+    A web search backend over a small local index, for `SEARCH_BACKEND=offline_stubs:FakeSearchIndex`.
+
+    Pages are ranked by the query words they contain, ties broken by page number, so related
+    queries share some results (as real searches do) and every query returns `max_results` pages.
+    """
+
+    def __init__(self, latency: Optional[float] = None):
+        self.latency = _setting(latency, "OFFLINE_SEARCH_LATENCY", 0.2)
+        self.searches = 0
+        self.faults = Faults()
+        self._lock = threading.Lock()
+        self.pages = [
+            {"title": f"Guide to {first} and {second}", "href": f"https://example.com/{first}-{second}",
+             "body": f"Everything about {first} and {second}.", "words": {first, second}}
+            for first in _INDEX_WORDS for second in _INDEX_WORDS if first < second
+        ]
+
+    def text(self, query, max_results=5):
+        with self._lock:
+            self.searches += 1
+        status, retry_after, delay = self.faults.take()
+        time.sleep(self.latency + delay)
+        if status is not None:
+            from outbound import UpstreamError
+            raise UpstreamError("search", status, retry_after)
+        words = set(query.lower().split())
+        ranked = sorted(self.pages, key=lambda page: -len(page["words"] & words))
+        return [{name: page[name] for name in ("title", "href", "body")} for page in ranked[:max_results]]
+
+
+def _setting(value: Optional[Any], env: str, default: float) -> float:
+    return float(value if value is not None else os.getenv(env, default))
+
+
+def install(llm_latency: Optional[float] = None, http_latency: Optional[float] = None,
+            gmail_latency: Optional[float] = None, search_latency: Optional[float] = None,
+            gmail_messages: int = 200, data_dir: Optional[str] = None) -> dict:
+    """
+    Replace the LLM and the external services with local fakes in this process.
+
+    Call it before importing `api` or `mcp_server`: it sets the environment those
+    modules read at import time (service URLs, job/index/cache paths).
+
+    Args:
+        llm_latency: Seconds per fake LLM call (OFFLINE_LLM_LATENCY, default 0.5).
+        http_latency: Seconds per ipapi/open-meteo request (OFFLINE_HTTP_LATENCY, default 0.05).
+        gmail_latency: Seconds per Gmail round trip (OFFLINE_GMAIL_LATENCY, default 0.05).
+        search_latency: Seconds per web search (OFFLINE_SEARCH_LATENCY, default 0.2).
+        gmail_messages: Number of messages in the fake mailbox.
+        data_dir: Directory for the job database, Gmail index and plan cache (a temp dir by default).
+
+    Returns:
+        A dict with the stub server and the fake Gmail service.
+    """
+    llm_latency = _setting(llm_latency, "OFFLINE_LLM_LATENCY", 0.5)
+    http_latency = _setting(http_latency, "OFFLINE_HTTP_LATENCY", 0.05)
+    gmail_latency = _setting(gmail_latency, "OFFLINE_GMAIL_LATENCY", 0.05)
+    search_latency = _setting(search_latency, "OFFLINE_SEARCH_LATENCY", 0.2)
+    data_dir = data_dir or os.getenv("OFFLINE_DATA_DIR") or tempfile.mkdtemp(prefix="daycrafter-offline-")
+
+    # No telemetry, and a placeholder key so building the default LLM doesn't fail.
+    # CREWAI_TESTING skips the interactive first-run trace prompt, which would block and write to stdout.
+    os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+    os.environ.setdefault("CREWAI_TESTING", "true")
+    os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+    os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+    os.environ["JOB_DB_PATH"] = os.path.join(data_dir, "jobs.sqlite3")
+    os.environ["GMAIL_INDEX_PATH"] = os.path.join(data_dir, "gmail_index.sqlite3")
+    os.environ["METRICS_DUMP_PATH"] = os.path.join(data_dir, "mcp_metrics.prom")
+    os.environ.pop("PLAN_CACHE_DIR", None)
+    # Crew worker processes (CREW_WORKERS) install the same fakes before building their crew
+    os.environ["OFFLINE_DATA_DIR"] = data_dir
+    os.environ["CREW_WORKER_INIT"] = "offline_stubs:install"
+
+    server = start_http_stub(http_latency)
+    base = f"http://127.0.0.1:{server.server_port}"
+    os.environ["IPAPI_URL"] = f"{base}/json/"
+    os.environ["OPEN_METEO_URL"] = f"{base}/v1/forecast"
+
+    # load_backend reads this when the web searcher first searches, so it may be set after import
+    os.environ["SEARCH_BACKEND"] = "offline_stubs:FakeSearchIndex"
+    os.environ["OFFLINE_SEARCH_LATENCY"] = str(search_latency)
+    # The fakes have no rate limits to respect; set OUTBOUND_<NAME>_RATE to measure the limiter
+    for name in ("IPAPI", "OPEN_METEO", "SEARCH", "GMAIL"):
+        os.environ.setdefault(f"OUTBOUND_{name}_RATE", "0")
+
+    import gmail_utils
+    gmail = FakeGmailService(gmail_messages, latency=gmail_latency)
+    gmail_utils.GmailServiceCache.get = lambda self, user_id="default": gmail
+
+    from calender.crew import LLM_STREAM
+    from calender.template import CrewTemplate
+    FakeLLM = _fake_llm_class()
+
+    def _build(self):
+        template = self.crew_class().crew()
+        for agent in template.agents:
+            # The research tools are remote MCP servers; the fake LLM never calls tools
+            agent.mcps = None
+            agent.llm = FakeLLM(latency=llm_latency, stream=LLM_STREAM)
+        return template
+
+    CrewTemplate._build = _build
+    return {"http_stub": server, "gmail": gmail, "data_dir": data_dir}
@@ -0,0 +1,390 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from http_client import get_http_client
+from calender.metrics import record_circuit_state, record_outbound
+
+logger = logging.getLogger("outbound")
+
+# Cached results are served this long past their TTL while their dependency is down
+STALE_CACHE_TTL = float(os.getenv("STALE_CACHE_TTL", 6 * 3600))
+
+# First retry backs off up to this many seconds, doubling per retry up to max_backoff
+BACKOFF_SECONDS = 0.1
+
+# How often an async caller waiting for a concurrency slot looks again
+SLOT_POLL_SECONDS = 0.01
+
+CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+# Per-dependency defaults; each can be overridden with OUTBOUND_<NAME>_<SETTING>, e.g. OUTBOUND_GMAIL_RATE
+DEFAULTS: Dict[str, Dict[str, float]] = {
+    "ipapi": {"rate": 1, "burst": 5, "concurrency": 2},
+    "open_meteo": {"rate": 10, "burst": 20, "concurrency": 8},
+    "search": {"rate": 1, "burst": 3, "concurrency": 2},
+    "gmail": {"rate": 20, "burst": 40, "concurrency": 8},
+}
+SETTINGS = {
+    # Calls per second (token refill rate; 0 = no limit) and the burst allowed above it
+    "rate": 5, "burst": 10,
+    # Calls in progress at once
+    "concurrency": 8,
+    # Retries of a call that timed out or got 429/5xx, and the backoff cap in seconds
+    "retries": 2, "max_backoff": 2.0,
+    # Longest a call may wait for a rate-limit token, or honour a Retry-After, before failing fast
+    "max_wait": 2.0,
+    # Consecutive failed calls that open the circuit, and seconds before one probe call is let through
+    "failures": 5, "reset_seconds": 30,
+    # Per-request timeout of HTTP dependencies
+    "timeout": 5.0,
+}
+
+
+class UpstreamError(Exception):
+    """A dependency answered with a status worth retrying (429 or 5xx)."""
+
+    def __init__(self, dependency: str, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(f"{dependency} returned {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class DependencyUnavailable(Exception):
+    """The call was not made: the dependency's circuit is open or its rate limit would wait too long."""
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """Seconds from a Retry-After header given as seconds or as an HTTP date."""
+    if value in (None, ""):
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(str(value)).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify(error: Exception) -> Tuple[bool, Optional[float]]:
+    """
+    (retryable, retry_after) for an error from a dependency. Timeouts, connection errors, 429 and
+    5xx are retryable; anything else (a bad request, missing credentials) is the caller's problem.
+    """
+    status = getattr(error, "status_code", None)
+    retry_after = getattr(error, "retry_after", None)
+    # googleapiclient's HttpError carries the httplib2 response
+    response = getattr(error, "resp", None)
+    if status is None and response is not None:
+        status = getattr(response, "status", None)
+        retry_after = parse_retry_after(response.get("retry-after"))
+    if status is not None:
+        try:
+            status = int(status)
+        except (TypeError, ValueError):
+            return False, None
+        return status == 429 or status >= 500, retry_after
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError, TimeoutError, ConnectionError)):
+        return True, None
+    # duckduckgo_search raises these on rate limits and timeouts
+    return type(error).__name__ in ("RatelimitException", "TimeoutException"), None
+
+
+def is_outage(error: Exception) -> bool:
+    """Whether `error` means the dependency is down or overloaded, so stale data is better than none."""
+    return isinstance(error, DependencyUnavailable) or classify(error)[0]
+
+
+class TokenBucket:
+    """Allows `rate` calls per second on average and bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return the seconds until it may be used (0 = now)."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def refund(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive failed calls, so later calls fail at once instead of
+    waiting on a dependency that is down. After `reset_seconds` one probe call is let through;
+    its success closes the circuit and its failure opens it again.
+    """
+
+    def __init__(self, name: str, failures: int, reset_seconds: float):
+        self.name = name
+        self.failures = max(1, failures)
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self._count = 0
+        self._opened_until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _set(self, state: int):
+        if state != self.state:
+            logger.warning(f"Circuit for {self.name} is now {('closed', 'half-open', 'open')[state]}")
+            self.state = state
+            record_circuit_state(self.name, state)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() >= self._opened_until:
+                self._set(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self._count = 0
+            self._probing = False
+            self._set(CLOSED)
+
+    def cancel_probe(self):
+        """A probe call that was let through but never made; the next call probes instead."""
+        with self._lock:
+            self._probing = False
+
+    def failure(self, open_for: Optional[float] = None):
+        """Count a failed call; `open_for` opens the circuit at once for that long (e.g. a long Retry-After)."""
+        with self._lock:
+            self._count += 1
+            self._probing = False
+            if open_for is not None or self.state == HALF_OPEN or self._count >= self.failures:
+                self._opened_until = time.monotonic() + (self.reset_seconds if open_for is None else open_for)
+                self._set(OPEN)
+
+
+class Dependency:
+    """
+    Guards the calls to one outbound dependency, shared by every tool call of the process.
+
+    A call takes a token from the dependency's bucket (failing fast if it would wait longer than
+    `max_wait`) and one of `concurrency` slots. Timeouts, 429 and 5xx are retried up to `retries`
+    times with jittered exponential backoff, or after the server's Retry-After when it asks for one.
+    Calls that still fail count towards the circuit breaker; while it is open, calls raise
+    DependencyUnavailable without reaching the dependency, and callers serve stale cached data.
+
+    Args:
+        name: Label in metrics and logs.
+        rate: Calls per second (0 = no limit).
+        burst: Calls allowed at once above the rate.
+        concurrency: Calls in progress at once.
+        retries: Retries of a retryable failure.
+        max_backoff: Cap of the exponential backoff, in seconds.
+        max_wait: Longest wait for a token or a Retry-After before failing fast, in seconds.
+        failures: Consecutive failed calls that open the circuit.
+        reset_seconds: Seconds the circuit stays open before a probe call.
+        timeout: Per-request timeout for `get`.
+    """
+
+    def __init__(self, name: str, rate: float = SETTINGS["rate"], burst: float = SETTINGS["burst"],
+                 concurrency: int = SETTINGS["concurrency"], retries: int = SETTINGS["retries"],
+                 max_backoff: float = SETTINGS["max_backoff"], max_wait: float = SETTINGS["max_wait"],
+                 failures: int = SETTINGS["failures"], reset_seconds: float = SETTINGS["reset_seconds"],
+                 timeout: float = SETTINGS["timeout"]):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = max(1, int(concurrency))
+        self.retries = int(retries)
+        self.max_backoff = max_backoff
+        self.max_wait = max_wait
+        self.breaker = CircuitBreaker(name, int(failures), reset_seconds)
+        self.timeout = timeout
+        self._slots = threading.Condition()
+        self._active = 0
+
+    def _admit(self) -> Tuple[float, bool]:
+        """
+        Check the breaker and take a token. Returns the seconds to wait for the token and whether
+        this call is the half-open probe (only the probe is let through while half-open).
+        """
+        if not self.breaker.allow():
+            record_outbound(self.name, "rejected")
+            raise DependencyUnavailable(f"{self.name} is unavailable (circuit open)")
+        probe = self.breaker.state == HALF_OPEN
+        wait = self.bucket.reserve()
+        if wait > self.max_wait:
+            self.bucket.refund()
+            if probe:
+                self.breaker.cancel_probe()
+            record_outbound(self.name, "throttled")
+            raise DependencyUnavailable(f"{self.name} is rate limited; try again in {wait:.1f}s")
+        return wait, probe
+
+    def _abandoned(self, probe: bool, entered: bool):
+        """The call was cancelled or interrupted before `fn` finished: hand back its token and probe."""
+        if not entered:
+            self.bucket.refund()
+        if probe:
+            self.breaker.cancel_probe()
+
+    def _try_enter(self) -> bool:
+        with self._slots:
+            if self._active < self.concurrency:
+                self._active += 1
+                return True
+            return False
+
+    def _leave(self):
+        with self._slots:
+            self._active -= 1
+            self._slots.notify()
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds before retrying after `error`, or None to give up (and record the outcome)."""
+        retryable, retry_after = classify(error)
+        if not retryable:
+            # The dependency answered; the request itself was wrong
+            self.breaker.success()
+            record_outbound(self.name, "error")
+            return None
+        if retry_after is not None and retry_after > self.max_wait:
+            # Asked to stay away longer than a caller should wait: fail fast until then
+            self.breaker.failure(open_for=retry_after)
+            record_outbound(self.name, "error")
+            return None
+        # A failed probe reopens the circuit rather than retrying
+        if attempt >= self.retries or self.breaker.state == HALF_OPEN:
+            self.breaker.failure()
+            record_outbound(self.name, "error")
+            return None
+        record_outbound(self.name, "retry")
+        backoff = random.uniform(0, min(self.max_backoff, BACKOFF_SECONDS * 2 ** attempt))
+        return backoff if retry_after is None else retry_after + backoff
+
+    def _succeeded(self):
+        self.breaker.success()
+        record_outbound(self.name, "ok")
+
+    async def call(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await `fn()` under the dependency's limits, retrying it on retryable failures."""
+        attempt = 0
+        while True:
+            wait, probe = self._admit()
+            entered = False
+            try:
+                if wait:
+                    await asyncio.sleep(wait)
+                while not self._try_enter():
+                    await asyncio.sleep(SLOT_POLL_SECONDS)
+                entered = True
+                result = await fn()
+            except Exception as e:
+                error = e
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            except BaseException:
+                # The caller went away (while waiting or calling); a cancelled probe lets the next call probe
+                self._abandoned(probe, entered)
+                raise
+            else:
+                self._succeeded()
+                return result
+            finally:
+                if entered:
+                    self._leave()
+            logger.info(f"Retrying {self.name} in {delay:.2f}s after: {error}")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def call_sync(self, fn: Callable[[], Any]) -> Any:
+        """Blocking form of `call` for code already on a worker thread (e.g. the Gmail client)."""
+        attempt = 0
+        while True:
+            wait, probe = self._admit()
+            entered = False
+            try:
+                if wait:
+                    time.sleep(wait)
+                with self._slots:
+                    while self._active >= self.concurrency:
+                        self._slots.wait()
+                    self._active += 1
+                entered = True
+                result = fn()
+            except Exception as e:
+                error = e
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            except BaseException:
+                self._abandoned(probe, entered)
+                raise
+            else:
+                self._succeeded()
+                return result
+            finally:
+                if entered:
+                    self._leave()
+            logger.info(f"Retrying {self.name} in {delay:.2f}s after: {error}")
+            time.sleep(delay)
+            attempt += 1
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """GET `url` with the pooled HTTP client. 429 and 5xx are retried; other responses are returned."""
+        async def attempt():
+            response = await get_http_client().get(url, timeout=self.timeout, **kwargs)
+            if response.status_code == 429 or response.status_code >= 500:
+                raise UpstreamError(self.name, response.status_code,
+                                    parse_retry_after(response.headers.get("Retry-After")))
+            return response
+
+        return await self.call(attempt)
+
+    def served_stale(self):
+        record_outbound(self.name, "stale")
+
+
+_dependencies: Dict[str, Dependency] = {}
+_lock = threading.Lock()
+
+
+def dependency(name: str) -> Dependency:
+    """The shared guard for `name`, built on first use from DEFAULTS and OUTBOUND_<NAME>_<SETTING> variables."""
+    with _lock:
+        if name not in _dependencies:
+            settings = {**SETTINGS, **DEFAULTS.get(name, {})}
+            for setting in settings:
+                value = os.getenv(f"OUTBOUND_{name.upper()}_{setting.upper()}")
+                if value is not None:
+                    settings[setting] = float(value)
+            _dependencies[name] = Dependency(name, **settings)
+        return _dependencies[name]
+
+
+def reset():
+    """Forget every dependency's state (for tests)."""
+    with _lock:
+        _dependencies.clear()
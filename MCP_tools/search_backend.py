@@ -0,0 +1,158 @@
+import os
+import re
+import asyncio
+import logging
+import threading
+import importlib
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from http_client import TTLCache
+from outbound import STALE_CACHE_TTL, Dependency, dependency, is_outage
+
+logger = logging.getLogger("search_backend")
+
+# Agents repeat the same searches within minutes; results are reused for this long
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", 900))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", 512))
+# Most queries accepted by one web_search_many call
+SEARCH_MAX_QUERIES = int(os.getenv("SEARCH_MAX_QUERIES", 8))
+# Most results per query for web_search and web_search_many, which multiplies it across its queries
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", 5))
+
+# Kept in normalized queries: quotes, site:/filetype: operators, exclusions, versions like "3.12"
+_QUERY_NOISE = re.compile(r"[^\w\s\"':.+#-]")
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid")
+
+
+def normalize_query(query: str) -> str:
+    """Cache key of a query: case, spacing and stray punctuation ("rust  ownership?") don't matter."""
+    return " ".join(_QUERY_NOISE.sub(" ", query.casefold()).split()).strip(" .:")
+
+
+def canonical_url(url: str) -> str:
+    """The URL without fragment, tracking parameters, "www." or a trailing slash, for spotting duplicates."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    host = host[4:] if host.startswith("www.") else host
+    query = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+             if not name.lower().startswith(_TRACKING_PARAMS)]
+    return urlunsplit((parts.scheme.lower(), host, parts.path.rstrip("/"), urlencode(query), ""))
+
+
+class DuckDuckGoBackend:
+    """The default backend. A DDGS client per thread, so its HTTP session is reused across searches."""
+
+    def __init__(self):
+        # ImportError here tells the tool to suggest installing the package
+        from duckduckgo_search import DDGS
+        self._client_class = DDGS
+        self._local = threading.local()
+
+    def text(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self._client_class()
+        return client.text(query, max_results=max_results)
+
+
+def load_backend(spec: Optional[str] = None):
+    """
+    Build the search backend named by `spec` ("module:attribute"). A backend has a
+    `text(query, max_results)` method returning dicts with title, href and body.
+    When omitted, `spec` is read from SEARCH_BACKEND at call time; DuckDuckGo when empty.
+    """
+    if spec is None:
+        spec = os.getenv("SEARCH_BACKEND", "")
+    if not spec:
+        return DuckDuckGoBackend()
+    module, _, attribute = spec.partition(":")
+    return getattr(importlib.import_module(module), attribute)()
+
+
+class WebSearch:
+    """
+    Web search with a result cache keyed on the normalized query. Searches go through the
+    "search" outbound dependency (rate limit, retries, circuit breaker); while it is down,
+    recently cached results are served marked as stale.
+
+    Args:
+        backend: The search backend; loaded from SEARCH_BACKEND on first use when omitted.
+        ttl: Seconds a query's results are reused.
+        max_entries: Queries kept in the cache.
+        guard: The outbound Dependency searches go through; the shared "search" one when omitted.
+    """
+
+    def __init__(self, backend=None, ttl: float = SEARCH_CACHE_TTL, max_entries: int = SEARCH_CACHE_SIZE,
+                 guard: Optional[Dependency] = None):
+        self._backend = backend
+        self._backend_lock = threading.Lock()
+        self.cache = TTLCache(ttl=ttl, max_entries=max_entries, name="search", stale_ttl=STALE_CACHE_TTL)
+        self.guard = guard or dependency("search")
+
+    @property
+    def backend(self):
+        with self._backend_lock:
+            if self._backend is None:
+                self._backend = load_backend()
+            return self._backend
+
+    async def search(self, query: str, max_results: int = 5) -> List[Dict[str, str]]:
+        """The results for `query`, from the cache when the same normalized query ran recently."""
+        key = (normalize_query(query), max_results)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        backend = self.backend
+        try:
+            # Backends are blocking; run them on a worker thread
+            raw = await self.guard.call(lambda: asyncio.to_thread(backend.text, query, max_results=max_results))
+        except Exception as e:
+            stale = self.cache.get_stale(key) if is_outage(e) else None
+            if stale is None:
+                raise
+            self.guard.served_stale()
+            logger.warning(f"Serving stale search results for {query!r}: {e}")
+            return [dict(result, stale=True) for result in stale]
+        results = [{"title": r.get("title", "No Title"), "href": r.get("href", "#"), "body": r.get("body", "")}
+                   for r in raw or []]
+        self.cache.set(key, results)
+        return results
+
+    async def search_many(self, queries: List[str], max_results: int = 5) -> Dict[str, Any]:
+        """
+        Run `queries` concurrently and merge their results.
+
+        Near-identical queries are searched once. Results are interleaved by rank (every query's
+        first result, then every second one, ...) and a URL already listed is dropped. A failing
+        query is reported under "errors" and doesn't fail the others.
+        """
+        unique: Dict[str, str] = {}
+        for query in queries:
+            if query.strip():
+                unique.setdefault(normalize_query(query), query)
+        queries = list(unique.values())
+        outcomes = await asyncio.gather(*(self.search(query, max_results) for query in queries),
+                                        return_exceptions=True)
+
+        ranked, errors = [], []
+        for query, outcome in zip(queries, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Search failed for {query!r}: {outcome}")
+                errors.append({"query": query, "error": str(outcome)})
+            else:
+                ranked.append([dict(result, query=query) for result in outcome])
+
+        merged, seen = [], set()
+        for rank in range(max((len(results) for results in ranked), default=0)):
+            for results in ranked:
+                if rank < len(results):
+                    url = canonical_url(results[rank]["href"])
+                    if url not in seen:
+                        seen.add(url)
+                        merged.append(results[rank])
+        return {"queries": queries, "results": merged, "errors": errors}
+
+
+# Shared by every search tool call in the process
+web_searcher = WebSearch()
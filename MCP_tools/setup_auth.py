@@ -4,6 +4,8 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 
+from gmail_utils import token_file_lock, write_token_file
+
 # Configuration
 GMAIL_SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 _SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -58,9 +60,9 @@ def setup_auth(user_id="default"):
         creds = flow.run_local_server(port=0)
         print("Authentication successful.")
 
-    # Save the token
-    with open(token_path, 'w') as token_file:
-        token_file.write(creds.to_json())
+    # Save the token atomically so a running MCP server never reads a partial file
+    with token_file_lock(token_path):
+        write_token_file(token_path, creds)
     
     print(f"Token saved to: {token_path}")
     print("You can now restart your app and use Gmail features.")
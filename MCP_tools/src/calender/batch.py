@@ -0,0 +1,116 @@
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, Executor, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from calender.cancellation import CancelToken, RunCancelled
+
+# Steps after which an agent makes another LLM call (see calender.progress)
+_LLM_STEP_EVENTS = ("crew_started", "tool_called", "task_finished")
+
+
+class RateLimiter:
+    """
+    Spaces calls evenly so no more than `per_minute` happen in any minute.
+    Shared by every thread of a batch; `acquire()` blocks until the next slot.
+    """
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def run_batch(
+    topics: List[str],
+    run_topic: Callable[..., Any],
+    max_concurrency: int = 2,
+    llm_rpm: Optional[float] = None,
+    cancel: Optional[CancelToken] = None,
+    executor: Optional[Executor] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Plan many topics concurrently and yield each result as soon as it finishes.
+
+    A failing topic yields an item with status "error"; the rest of the batch
+    keeps running. After the last item, a summary dict with `"summary": True`
+    is yielded with throughput figures.
+
+    Args:
+        topics: Topics to plan.
+        run_topic: Called as `run_topic(topic, on_event=...)`, e.g. calender.main.run_cached.
+        max_concurrency: Crew runs allowed at the same time.
+        llm_rpm: Optional limit on LLM calls per minute across the whole batch.
+            Each agent step is one LLM call, so the limiter is applied before the
+            first call of a run and after every step that leads to another call.
+        cancel: Optional token shared by every run of the batch; once it is cancelled,
+            runs in progress stop early and the remaining topics yield status "cancelled".
+        executor: The server's crew pool, so batch runs count against its limit alongside
+            single runs. At most `max_concurrency` of the batch's runs are queued on it at
+            a time. A private pool is used when omitted.
+    """
+    limiter = RateLimiter(llm_rpm) if llm_rpm else None
+
+    def on_event(event):
+        if limiter is not None and event["event"] in _LLM_STEP_EVENTS:
+            limiter.acquire()
+
+    def plan(index: int, topic: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        item: Dict[str, Any] = {"index": index, "topic": topic}
+        kwargs = {"on_event": on_event} if cancel is None else {"on_event": on_event, "cancel": cancel}
+        try:
+            item["result"] = str(run_topic(topic, **kwargs))
+            item["status"] = "success"
+        except RunCancelled as e:
+            item["error"] = str(e)
+            item["status"] = "cancelled"
+        except Exception as e:
+            item["error"] = str(e)
+            item["status"] = "error"
+        item["duration"] = round(time.perf_counter() - start, 3)
+        return item
+
+    start = time.perf_counter()
+    busy_seconds = 0.0
+    failed = 0
+    limit = max(1, max_concurrency)
+    private = executor is None
+    if private:
+        executor = ThreadPoolExecutor(max_workers=limit, thread_name_prefix="batch")
+    todo = list(enumerate(topics))[::-1]
+    pending = set()
+    try:
+        while todo or pending:
+            while todo and len(pending) < limit:
+                pending.add(executor.submit(plan, *todo.pop()))
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = future.result()
+                busy_seconds += item["duration"]
+                failed += item["status"] != "success"
+                yield item
+    finally:
+        if private:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - start
+    yield {
+        "summary": True,
+        "total": len(topics),
+        "succeeded": len(topics) - failed,
+        "failed": failed,
+        "elapsed": round(elapsed, 3),
+        "topics_per_minute": round(len(topics) * 60 / elapsed, 2) if elapsed else None,
+        # Time the same runs would have taken back to back
+        "sequential_estimate": round(busy_seconds, 3),
+        "speedup": round(busy_seconds / elapsed, 2) if elapsed else None,
+    }
@@ -0,0 +1,140 @@
+import os
+import time
+import threading
+from typing import Dict, Optional
+
+from calender.metrics import record_cancelled_call, record_cancelled_run
+
+# Default deadline for a crew run in seconds; 0 means runs have no deadline
+PLAN_DEADLINE_SECONDS = float(os.getenv("PLAN_DEADLINE_SECONDS", 0)) or None
+
+CANCELLED = "cancelled"
+DEADLINE = "deadline"
+
+
+class RunCancelled(TimeoutError):
+    """
+    Raised when a crew run stops because its caller went away or its deadline passed.
+
+    A TimeoutError, so CrewAI's agents give up at once instead of retrying the task.
+    """
+
+    def __init__(self, reason: str, detail: str = ""):
+        super().__init__(detail or f"Crew run stopped: {reason}")
+        self.reason = reason
+
+
+class CancelToken:
+    """
+    Cancellation flag and optional deadline for one request, shared between the
+    request handler (which cancels) and the crew's worker thread (which checks).
+
+    Args:
+        timeout: Seconds from now until the deadline, or None for no deadline.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self._reason: Optional[str] = None
+        self._detail = ""
+
+    def cancel(self, detail: str = "cancelled by the client"):
+        if self._reason is None:
+            self._reason = CANCELLED
+            self._detail = detail
+
+    @property
+    def reason(self) -> Optional[str]:
+        """CANCELLED, DEADLINE, or None while the run may continue."""
+        if self._reason is None and self.deadline is not None and time.monotonic() >= self.deadline:
+            self._reason = DEADLINE
+            self._detail = f"deadline of {self.timeout:g}s exceeded"
+        return self._reason
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def error(self) -> RunCancelled:
+        return RunCancelled(self.reason or CANCELLED, f"Crew run stopped: {self._detail}")
+
+    def check(self):
+        """Raise RunCancelled if the run should stop."""
+        if self.cancelled:
+            raise self.error()
+
+
+# Tokens of running crews by task id, read by the CrewAI hooks below
+_lock = threading.Lock()
+_tokens: Dict[str, CancelToken] = {}
+_hooks_registered = False
+
+
+def _token_for(context) -> Optional[CancelToken]:
+    task = getattr(context, "task", None)
+    return _tokens.get(str(task.id)) if task is not None else None
+
+
+def _before_llm_call(context):
+    token = _token_for(context)
+    if token is not None and token.cancelled:
+        record_cancelled_call("llm")
+        # CrewAI turns a blocked call into an error that ends the task
+        return False
+    return None
+
+
+def _before_tool_call(context):
+    token = _token_for(context)
+    if token is not None and token.cancelled:
+        record_cancelled_call("tool")
+        return False
+    return None
+
+
+def _register_hooks():
+    # Registered once per process, before the first crew that needs them is executed
+    global _hooks_registered
+    with _lock:
+        if _hooks_registered:
+            return
+        from crewai.hooks import register_before_llm_call_hook, register_before_tool_call_hook
+        register_before_llm_call_hook(_before_llm_call)
+        register_before_tool_call_hook(_before_tool_call)
+        _hooks_registered = True
+
+
+class CancelGuard:
+    """Links a crew's tasks to a token for the length of one run; `close()` unlinks them."""
+
+    def __init__(self, crew, token: CancelToken):
+        self.token = token
+        self.task_ids = [str(task.id) for task in crew.tasks]
+        _register_hooks()
+        with _lock:
+            for task_id in self.task_ids:
+                _tokens[task_id] = token
+
+    def close(self):
+        with _lock:
+            for task_id in self.task_ids:
+                _tokens.pop(task_id, None)
+        self.task_ids = []
+
+
+def attach_cancellation(crew, token: Optional[CancelToken]) -> Optional[CancelGuard]:
+    """
+    Stop `crew` at its next LLM or tool call once `token` is cancelled or its deadline passes.
+    A call already in progress finishes first. Returns the guard (call `close()` once the
+    run ends), or None without a token.
+    """
+    if token is None:
+        return None
+    return CancelGuard(crew, token)
+
+
+def stopped(token: CancelToken, phase: str) -> RunCancelled:
+    """Record a run stopped by `token` during `phase` ("queued" or "running") and return its error."""
+    record_cancelled_run(token.reason or CANCELLED, phase)
+    return token.error()
@@ -2,10 +2,24 @@ import mcp
 from crewai import Agent, Crew, Process, Task, LLM
 from crewai.project import CrewBase, agent, crew, task
 from crewai.agents.agent_builder.base_agent import BaseAgent
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 import os
 
+from calender.paths import PREFERENCE_PATH
+from calender.plan_model import Roadmap, LocalRepairConverter
+from calender.prompts import PROMPT_COMPACT, compact_agent_config, compact_preferences
+
+# Stream LLM replies so roadmap items reach progress listeners before the reply ends
+LLM_STREAM = os.getenv("LLM_STREAM", "0") == "1"
+
+
+def streaming_llm():
+    """The LLM an agent gets by default (MODEL, MODEL_NAME, OPENAI_MODEL_NAME or CrewAI's default model), streaming."""
+    from crewai.utilities.llm_utils import create_llm
+    llm = create_llm()
+    llm.stream = True
+    return llm
 
 
 @CrewBase
@@ -15,29 +29,42 @@ class Calender():
     agents: List[BaseAgent]
     tasks: List[Task]
 
+    def __init__(self, compact_prompts: Optional[bool] = None):
+        # Overrides PROMPT_COMPACT, e.g. to profile both prompt forms in one process
+        self.compact_prompts = PROMPT_COMPACT if compact_prompts is None else compact_prompts
+
     @agent
     def calendar_manager(self) -> Agent:
         # Load preferences
-        pref_path = 'knowledge/user_preference.txt'
+        pref_path = PREFERENCE_PATH
         preferences = ""
         if os.path.exists(pref_path):
              with open(pref_path, 'r', encoding='utf-8') as f:
                  preferences = f.read()
 
+        config = self.agents_config['calendar_manager']
+        if self.compact_prompts:
+            config = compact_agent_config(config)
+            preferences = compact_preferences(preferences)
+
         return Agent(
-            config=self.agents_config['calendar_manager'], 
-            backstory=self.agents_config['calendar_manager']['backstory'] + f"\n\nUSER PREFERENCES:\n{preferences}",
+            config=config,
+            backstory=config['backstory'] + f"\n\nUSER PREFERENCES:\n{preferences}",
             mcps = [
                 "crewai-amp:research-tools"
             ],
             cache=True,
-            verbose=False
+            verbose=False,
+            llm=streaming_llm() if LLM_STREAM else None,
         )
 
     @task
     def execution_task(self) -> Task:
         return Task(
             config=self.tasks_config['execution_task'], 
+            output_pydantic=Roadmap,
+            # Repairs near-valid JSON locally instead of paying for an LLM reformatting call
+            converter_cls=LocalRepairConverter,
         )
 
     @crew
@@ -0,0 +1,188 @@
+import os
+import re
+import json
+from email.utils import parseaddr
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from calender.batch import run_batch
+from calender.cancellation import CancelToken
+from calender.plan_parser import repair_json
+from calender.prompts import count_tokens
+from calender.scheduler import schedule_plan
+
+# Token budget for the emails of one planner run
+DIGEST_BATCH_TOKENS = int(os.getenv("DIGEST_BATCH_TOKENS", 1500))
+# The roadmap holds 7 items or fewer, so a batch never has more emails than that
+DIGEST_BATCH_EMAILS = int(os.getenv("DIGEST_BATCH_EMAILS", 7))
+
+# Snippets are previews already; longer ones only add tokens
+SNIPPET_CHARS = 300
+
+_BULK_SENDER = re.compile(
+    r"^(no-?reply|do-?not-?reply|newsletters?|news|marketing|promo(tions)?|digest|deals|offers|mailer-daemon)\b",
+    re.IGNORECASE,
+)
+_BULK_SUBJECT = re.compile(
+    r"\b(newsletter|digest|weekly (roundup|recap)|webinar|unsubscribe|\d+% off|sale ends|promo code|deal of the)\b",
+    re.IGNORECASE,
+)
+_BULK_SNIPPET = re.compile(
+    r"\b(unsubscribe|view (this email )?in (your )?browser|manage (your )?(email )?preferences)\b",
+    re.IGNORECASE,
+)
+_REPLY_PREFIX = re.compile(r"^\s*((re|fwd?|aw|wg)\s*:\s*)+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+TOPIC_HEADER = (
+    "Turn these emails into calendar tasks. Create at most one task per email that asks for an action; "
+    "skip emails that need none. Set \"source_id\" of each task to the id in brackets of its email."
+)
+
+
+def newsletter_reason(email: Dict[str, Any]) -> Optional[str]:
+    """Why `email` looks like bulk mail (by sender, subject or snippet), or None if it doesn't."""
+    address = parseaddr(email.get("from", ""))[1]
+    if _BULK_SENDER.match(address.split("@")[0]):
+        return "bulk sender"
+    if _BULK_SUBJECT.search(email.get("subject", "")):
+        return "bulk subject"
+    if _BULK_SNIPPET.search(email.get("snippet", "")):
+        return "unsubscribe footer"
+    return None
+
+
+def dedupe_key(email: Dict[str, Any]) -> Tuple[str, str]:
+    """Sender address and subject without Re:/Fwd: prefixes, so a thread's replies share a key."""
+    address = parseaddr(email.get("from", ""))[1].lower()
+    subject = _WHITESPACE.sub(" ", _REPLY_PREFIX.sub("", email.get("subject", ""))).strip().lower()
+    return address, subject
+
+
+def filter_emails(emails: Iterable[Dict[str, Any]], skipped: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the emails worth planning, newest first as Gmail lists them.
+    Newsletters and repeats of an earlier email's sender and subject are appended to `skipped`.
+    """
+    seen = set()
+    for email in emails:
+        reason = newsletter_reason(email)
+        if reason is None:
+            key = dedupe_key(email)
+            if key in seen:
+                reason = "duplicate"
+            seen.add(key)
+        if reason is not None:
+            skipped.append({"id": email.get("id"), "subject": email.get("subject", ""), "reason": reason})
+            continue
+        yield email
+
+
+def render_email(email: Dict[str, Any]) -> str:
+    snippet = _WHITESPACE.sub(" ", email.get("snippet", "")).strip()[:SNIPPET_CHARS]
+    return (f"[{email['id']}] From: {email.get('from', '')} | Subject: {email.get('subject', '')} "
+            f"| Date: {email.get('date', '')}\n{snippet}")
+
+
+def pack_batches(emails: Iterable[Dict[str, Any]], max_tokens: int = DIGEST_BATCH_TOKENS,
+                 max_emails: int = DIGEST_BATCH_EMAILS) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Group emails in order into batches of at most `max_tokens` rendered tokens and `max_emails` emails.
+    An email larger than the budget gets a batch of its own.
+    """
+    batch, tokens = [], 0
+    for email in emails:
+        size = count_tokens(render_email(email))
+        if batch and (tokens + size > max_tokens or len(batch) >= max_emails):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(email)
+        tokens += size
+    if batch:
+        yield batch
+
+
+def batch_topic(batch: List[Dict[str, Any]]) -> str:
+    return TOPIC_HEADER + "\n\n" + "\n\n".join(render_email(email) for email in batch)
+
+
+def tag_items(plan: str, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    The roadmap items of one batch's plan, each with the `source_id` and `source_subject` of its email.
+    A missing or unknown id is kept empty unless the batch has a single email.
+    """
+    items = repair_json(plan)
+    if not isinstance(items, list):
+        raise ValueError("The planner did not return a list of tasks")
+    by_id = {email["id"]: email for email in batch}
+    tagged = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        source = str(item.get("source_id") or "").strip("[] ")
+        if source not in by_id:
+            source = batch[0]["id"] if len(batch) == 1 else ""
+        item = dict(item, source_id=source)
+        item["source_subject"] = by_id[source].get("subject", "") if source else ""
+        tagged.append(item)
+    return tagged
+
+
+def plan_emails(
+    emails: Iterable[Dict[str, Any]],
+    plan_topic: Callable[..., str],
+    max_tokens: int = DIGEST_BATCH_TOKENS,
+    max_emails: int = DIGEST_BATCH_EMAILS,
+    max_concurrency: int = 2,
+    busy=(),
+    cancel: Optional[CancelToken] = None,
+    on_batch: Optional[Callable[[Dict[str, Any]], None]] = None,
+    executor: Optional[Executor] = None,
+) -> Dict[str, Any]:
+    """
+    Plan calendar tasks for many emails with one planner run per batch instead of one per email.
+
+    Args:
+        emails: Emails in check_gmail's shape (id, from, subject, date, snippet).
+        plan_topic: Returns the unscheduled roadmap JSON for a topic, e.g. calender.main.plan_cached.
+        max_tokens: Token budget for the emails of one batch.
+        max_emails: Most emails in one batch.
+        max_concurrency: Batches planned at the same time.
+        busy: Existing (start, end) events the scheduler keeps free.
+        cancel: Optional token that stops the remaining runs.
+        on_batch: Called with each finished batch item (see calender.batch.run_batch).
+        executor: The server's crew pool to plan the batches on (see calender.batch.run_batch).
+
+    Returns:
+        The scheduled tasks of every batch, tagged with their source message, and counts
+        of emails, skipped emails and batches (one planner run each).
+    """
+    skipped: List[Dict[str, Any]] = []
+    batches = list(pack_batches(filter_emails(emails, skipped), max_tokens, max_emails))
+    topics = [batch_topic(batch) for batch in batches]
+
+    items, errors = [], []
+    for result in run_batch(topics, plan_topic, max_concurrency=max_concurrency, cancel=cancel, executor=executor):
+        if result.pop("summary", False):
+            continue
+        batch = batches[result["index"]]
+        if result["status"] == "success":
+            try:
+                items.extend(tag_items(result["result"], batch))
+            except ValueError as e:
+                result.update(status="error", error=str(e))
+        if result["status"] != "success":
+            errors.append({"emails": [email["id"] for email in batch], "error": result["error"]})
+        if on_batch is not None:
+            on_batch(result)
+
+    tasks = json.loads(schedule_plan(json.dumps(items), busy)) if items else []
+    planned = sum(len(batch) for batch in batches)
+    return {
+        "tasks": tasks,
+        "emails": planned + len(skipped),
+        "planned_emails": planned,
+        "skipped": skipped,
+        "batches": len(batches),
+        "errors": errors,
+    }
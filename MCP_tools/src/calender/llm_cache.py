@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from calender.metrics import record_cache
+
+logger = logging.getLogger("llm_cache")
+
+MODES = ("off", "record", "replay")
+
+# Under the user's cache directory rather than the working directory, so recorded prompts never land in a checkout
+DEFAULT_CACHE_DIR = os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "daycrafter", "llm_cache")
+
+# LLM settings that change the completion; anything else (API keys, timeouts) is left out of the key
+_KEY_PARAMS = (
+    "temperature", "top_p", "n", "max_tokens", "max_completion_tokens", "presence_penalty",
+    "frequency_penalty", "seed", "stop", "response_format", "reasoning_effort",
+)
+
+
+def call_key(llm, messages, tools=None, response_model=None) -> str:
+    """Content hash of everything that determines an LLM completion."""
+    params = {name: getattr(llm, name, None) for name in _KEY_PARAMS}
+    params = {name: value for name, value in params.items() if value not in (None, [], {})}
+    extra = getattr(llm, "additional_params", None) or {}
+    payload = {
+        "model": getattr(llm, "model", None),
+        "provider": getattr(llm, "provider", None),
+        "messages": messages,
+        "tools": tools,
+        "response_model": response_model.model_json_schema() if response_model is not None else None,
+        "params": {**{k: v for k, v in extra.items() if k != "callbacks"}, **params},
+    }
+    raw = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCallCache:
+    """
+    Content-addressed on-disk store of LLM completions.
+
+    Each completion is one JSON file named by its key. The store is bounded by
+    `max_bytes`; when a write pushes it over, the least recently used files
+    (by mtime, refreshed on every hit) are removed.
+
+    Modes:
+        off: Calls go straight to the LLM.
+        record: Serve stored completions and store new ones.
+        replay: Serve stored completions only; a miss raises LookupError, so
+            crew runs are deterministic and never reach the network.
+
+    Args:
+        directory: Directory holding the completions.
+        mode: One of "off", "record" or "replay".
+        max_bytes: Size bound for the directory.
+    """
+
+    def __init__(self, directory: str, mode: str = "off", max_bytes: int = 200 * 1024 * 1024):
+        if mode not in MODES:
+            raise ValueError(f"LLM_CACHE_MODE must be one of {', '.join(MODES)}, not {mode!r}")
+        self.directory = directory
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry["response"]
+
+    def put(self, key: str, response: str, model: Optional[str] = None):
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"model": model, "response": response, "stored_at": time.time()}, f, ensure_ascii=False)
+            written = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write LLM cache entry: {e}")
+            return
+        with self._lock:
+            self._stats["writes"] += 1
+            if self._size is None:
+                self._size = self._disk_usage()
+            else:
+                self._size += written
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield st.st_mtime, st.st_size, path
+
+    def _disk_usage(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        # Trim to 90% so a full store doesn't rescan the directory on every write
+        target = int(self.max_bytes * 0.9)
+        entries = sorted(self._entries())
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+            self._stats["evictions"] += 1
+
+    def call(self, llm, call_llm, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        """Serve `llm`'s completion for these arguments from the store, or run `call_llm` (record mode)."""
+        key = call_key(llm, messages, tools, response_model)
+        response = self.get(key)
+        if response is not None:
+            with self._lock:
+                self._stats["hits"] += 1
+            record_cache("llm", hit=True)
+            if getattr(llm, "stream", False):
+                # Progress listeners still get the reply, as a single chunk
+                llm._emit_stream_chunk_event(response, from_task=from_task, from_agent=from_agent)
+            return response
+
+        with self._lock:
+            self._stats["misses"] += 1
+        record_cache("llm", hit=False)
+        if self.mode == "replay":
+            raise LookupError(
+                f"LLM_CACHE_MODE=replay: no recorded completion for {getattr(llm, 'model', 'the LLM')} "
+                f"(key {key[:12]}). Run once with LLM_CACHE_MODE=record to record it."
+            )
+        response = call_llm(messages, tools=tools, callbacks=callbacks, available_functions=available_functions,
+                            from_task=from_task, from_agent=from_agent, response_model=response_model)
+        # Tool calls and structured objects aren't replayable text
+        if isinstance(response, str) and response:
+            self.put(key, response, getattr(llm, "model", None))
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["mode"] = self.mode
+        return stats
+
+
+_cached_classes: Dict[type, type] = {}
+
+
+def _cached_class(cls: type) -> type:
+    """A subclass of the LLM class `cls` whose `call` goes through the instance's LLMCallCache."""
+    if cls not in _cached_classes:
+        # Subclassing `cls` directly (not via a mixin) keeps the instance layout, so __class__ can be swapped
+        class Cached(cls):
+            def call(self, messages, tools=None, callbacks=None, available_functions=None,
+                     from_task=None, from_agent=None, response_model=None):
+                return self._llm_cache.call(
+                    self, super().call, messages, tools=tools, callbacks=callbacks,
+                    available_functions=available_functions, from_task=from_task,
+                    from_agent=from_agent, response_model=response_model,
+                )
+
+            def __copy__(self):
+                # Agent.copy() shallow-copies the LLM; crewai's LLM rebuilds itself on copy,
+                # so the clone is wrapped again instead of relying on the class surviving.
+                base = super()
+                if hasattr(base, "__copy__"):
+                    return cached_llm(base.__copy__(), self._llm_cache)
+                clone = object.__new__(type(self))
+                clone.__dict__.update(self.__dict__)
+                return clone
+
+        Cached.__name__ = Cached.__qualname__ = f"Cached{cls.__name__}"
+        _cached_classes[cls] = Cached
+    return _cached_classes[cls]
+
+
+def cached_llm(llm, cache: LLMCallCache):
+    """Route `llm.call` through `cache`, keeping the LLM's own class and attributes."""
+    if llm is None or isinstance(llm, str) or not cache.enabled:
+        return llm
+    if type(llm) not in _cached_classes.values():
+        llm.__class__ = _cached_class(type(llm))
+    llm._llm_cache = cache
+    return llm
+
+
+def attach_llm_cache(crew, cache: Optional["LLMCallCache"] = None):
+    """Put the LLM of every agent in `crew` behind the LLM call cache (no-op when LLM_CACHE_MODE=off)."""
+    cache = cache or llm_cache
+    if cache.enabled:
+        for agent in crew.agents:
+            agent.llm = cached_llm(agent.llm, cache)
+    return crew
+
+
+llm_cache = LLMCallCache(
+    os.getenv("LLM_CACHE_DIR") or DEFAULT_CACHE_DIR,
+    mode=os.getenv("LLM_CACHE_MODE", "off").lower(),
+    max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", 200)) * 1024 * 1024),
+)
@@ -3,24 +3,105 @@ import sys
 import warnings
 import time
 
-from calender.crew import Calender
+from calender.crew import Calender, LLM_STREAM
+from calender.template import crew_template
+from calender.llm_cache import attach_llm_cache
+from calender.plan_cache import plan_cache
+from calender.progress import attach_progress
+from calender.cancellation import attach_cancellation, stopped
+from calender.scheduler import schedule_plan
+from calender.plan_model import plan_to_json
+from calender.workers import crew_workers
+from calender.metrics import (
+    CREW_PHASE, CREW_RUNS_IN_FLIGHT, in_flight, instrument_crew, record_usage, timer,
+)
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
 
-def run(input_task):
+def run(input_task, on_event=None, cancel=None):
     """
     Run the crew.
+
+    Args:
+        input_task: The task description used as the crew's topic.
+        on_event: Optional callable that receives progress events (see calender.progress).
+        cancel: Optional CancelToken; once it is cancelled or its deadline passes, the run
+            stops at the next LLM or tool call and raises RunCancelled.
     """
     inputs = {
         'topic': input_task,
     }
+    return _kickoff(inputs, input_task, on_event, cancel, "running the crew")
+
 
+def run_trigger(trigger_payload, on_event=None, cancel=None):
+    """
+    Run the crew once for a trigger payload, on a copy of the warm crew template.
+    Arguments other than the payload are as for `run`.
+    """
+    inputs = {
+        "crewai_trigger_payload": trigger_payload,
+        "topic": ""
+    }
+    return _kickoff(inputs, "", on_event, cancel, "running the crew with trigger")
+
+
+def _kickoff(inputs, topic, on_event, cancel, action):
+    # Cancelled while waiting for a worker: skip the run entirely
+    if cancel is not None and cancel.cancelled:
+        raise stopped(cancel, "queued")
+
+    reporter = None
+    guard = None
     try:
-        return Calender().crew().kickoff(inputs=inputs)
+        with in_flight(CREW_RUNS_IN_FLIGHT):
+            with timer(CREW_PHASE, phase="construction"):
+                crew = crew_template.crew()
+            reporter = attach_progress(crew, on_event, topic, stream=LLM_STREAM)
+            guard = attach_cancellation(crew, cancel)
+            instrument_crew(crew)
+            with timer(CREW_PHASE, phase="kickoff"):
+                result = crew.kickoff(inputs=inputs)
+            record_usage(getattr(result, "token_usage", None))
+            return result
 
     except Exception as e:
-        raise Exception(f"An error occurred while running the crew: {e}")
+        # Blocked calls surface as CrewAI errors; report them as the cancellation they are
+        if cancel is not None and cancel.cancelled:
+            raise stopped(cancel, "running") from e
+        raise Exception(f"An error occurred while {action}: {e}")
+    finally:
+        if reporter is not None:
+            reporter.close()
+        if guard is not None:
+            guard.close()
+
+
+def run_cached(input_task, on_event=None, busy=(), cancel=None):
+    """
+    Run the crew through the plan cache and return the plan as a string.
+    Identical topics (after normalization) on the same day reuse the stored plan,
+    and concurrent identical requests share a single crew run.
+    Progress events are only sent when this call starts the crew run itself;
+    cache hits and coalesced requests return without any.
+
+    The cache holds the crew's ranked roadmap; dates and times are assigned by
+    the local scheduler on every call, around the caller's `busy` (start, end) intervals.
+
+    `cancel` (a CancelToken) stops this caller's crew run early; see `run`.
+    """
+    return schedule_plan(plan_cached(input_task, on_event, cancel), busy)
+
+
+def plan_cached(input_task, on_event=None, cancel=None):
+    """
+    The crew's ranked roadmap for `input_task` as JSON, through the plan cache and without dates or times.
+    With CREW_WORKERS set, cache misses run on the crew worker processes instead of this thread.
+    """
+    if crew_workers is not None:
+        return plan_cache.get_or_compute(input_task, lambda topic: crew_workers.plan(topic, on_event, cancel), cancel)
+    return plan_cache.get_or_compute(input_task, lambda topic: plan_to_json(run(topic, on_event, cancel)), cancel)
 
 
 def train(input_task):
@@ -31,7 +112,7 @@ def train(input_task):
         "topic": input_task,
     }
     try:
-        Calender().crew().train(n_iterations=int(sys.argv[1]), filename=sys.argv[2], inputs=inputs)
+        attach_llm_cache(Calender().crew()).train(n_iterations=int(sys.argv[1]), filename=sys.argv[2], inputs=inputs)
 
     except Exception as e:
         raise Exception(f"An error occurred while training the crew: {e}")
@@ -41,7 +122,7 @@ def replay():
     Replay the crew execution from a specific task.
     """
     try:
-        Calender().crew().replay(task_id=sys.argv[1])
+        attach_llm_cache(Calender().crew()).replay(task_id=sys.argv[1])
 
     except Exception as e:
         raise Exception(f"An error occurred while replaying the crew: {e}")
@@ -55,7 +136,7 @@ def test(input_task):
     }
 
     try:
-        Calender().crew().test(n_iterations=int(sys.argv[1]), eval_llm=sys.argv[2], inputs=inputs)
+        attach_llm_cache(Calender().crew()).test(n_iterations=int(sys.argv[1]), eval_llm=sys.argv[2], inputs=inputs)
 
     except Exception as e:
         raise Exception(f"An error occurred while testing the crew: {e}")
@@ -63,6 +144,7 @@ def test(input_task):
 def run_with_trigger():
     """
     Run the crew with trigger payload.
+    For many payloads use `run_triggers` (calender.triggers), which keeps one process warm.
     """
     import json
 
@@ -74,16 +156,7 @@ def run_with_trigger():
     except json.JSONDecodeError:
         raise Exception("Invalid JSON payload provided as argument")
 
-    inputs = {
-        "crewai_trigger_payload": trigger_payload,
-        "topic": ""
-    }
-
-    try:
-        result = Calender().crew().kickoff(inputs=inputs)
-        return result
-    except Exception as e:
-        raise Exception(f"An error occurred while running the crew with trigger: {e}")
+    return run_trigger(trigger_payload)
 
 
 
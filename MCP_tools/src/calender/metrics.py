@@ -0,0 +1,404 @@
+import os
+import time
+import bisect
+import asyncio
+import threading
+import functools
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Set METRICS=0 to turn instrumentation into no-ops
+METRICS_ENABLED = os.getenv("METRICS", "1") != "0"
+
+# Seconds; crew runs take minutes, tool calls milliseconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in key) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        """(sample name, label key, value) for every series, in exposition order."""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        self.inc_key(_key(labels), amount)
+
+    def inc_key(self, key: LabelKey, amount: float = 1.0):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_key(labels)] = value
+
+    @contextmanager
+    def track(self, **labels):
+        """Count the block as in flight while it runs."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [bucket counts..., sum, count]
+        self._values: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        self.observe_key(_key(labels), value)
+
+    def observe_key(self, key: LabelKey, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(_key(labels))
+        return entry[-1] if entry else 0
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            items = [(key, list(entry)) for key, entry in self._values.items()]
+        for key, entry in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", key + (("le", repr(bound)),), cumulative))
+            samples.append((f"{self.name}_bucket", key + (("le", "+Inf"),), entry[-1]))
+            samples.append((f"{self.name}_sum", key, entry[-2]))
+            samples.append((f"{self.name}_count", key, entry[-1]))
+        return samples
+
+
+class Registry:
+    """Process-wide set of metrics rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help_text: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._get(Gauge, name, help_text)
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def snapshot(self) -> Dict[str, Dict[LabelKey, object]]:
+        """Current values of every counter and histogram (gauges are per-process state and left out)."""
+        with self._lock:
+            metrics = [metric for metric in self._metrics.values() if metric.kind in ("counter", "histogram")]
+        snapshot = {}
+        for metric in metrics:
+            with metric._lock:
+                snapshot[metric.name] = {key: list(value) if isinstance(value, list) else value
+                                         for key, value in metric._values.items()}
+        return snapshot
+
+    def delta_since(self, snapshot: Dict[str, Dict[LabelKey, object]]) -> List[tuple]:
+        """
+        What counters and histograms recorded since `snapshot`, as picklable
+        (kind, name, help, buckets, {label key: increment}) tuples for `merge`.
+        """
+        delta = []
+        with self._lock:
+            metrics = {metric.name: metric for metric in self._metrics.values()}
+        for name, values in self.snapshot().items():
+            metric, before = metrics[name], snapshot.get(name, {})
+            changes = {}
+            for key, value in values.items():
+                previous = before.get(key)
+                if isinstance(value, list):
+                    change = [now - then for now, then in zip(value, previous)] if previous else value
+                    if change[-1]:
+                        changes[key] = change
+                elif value != (previous or 0.0):
+                    changes[key] = value - (previous or 0.0)
+            if changes:
+                delta.append((metric.kind, name, metric.help, getattr(metric, "buckets", None), changes))
+        return delta
+
+    def merge(self, delta: List[tuple]):
+        """Add a `delta_since` from another process (e.g. a crew worker) to this registry's metrics."""
+        for kind, name, help_text, buckets, changes in delta:
+            if kind == "histogram":
+                metric = self.histogram(name, help_text, buckets)
+                with metric._lock:
+                    for key, change in changes.items():
+                        entry = metric._values.setdefault(key, [0] * len(metric.buckets) + [0.0, 0])
+                        for index, amount in enumerate(change):
+                            entry[index] += amount
+            else:
+                metric = self.counter(name, help_text)
+                for key, change in changes.items():
+                    metric.inc_key(key, change)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str):
+        """Write the current metrics to `path` atomically (for the stdio MCP server, which has no HTTP port)."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+registry = Registry()
+
+TOOL_LATENCY = registry.histogram("daycrafter_tool_latency_seconds", "Tool call latency by tool.")
+TOOL_CALLS = registry.counter("daycrafter_tool_calls_total", "Tool calls by tool and outcome.")
+REQUESTS_IN_FLIGHT = registry.gauge("daycrafter_requests_in_flight", "Requests currently being handled.")
+REQUEST_LATENCY = registry.histogram("daycrafter_request_latency_seconds", "API request latency by route.")
+CREW_PHASE = registry.histogram("daycrafter_crew_phase_seconds", "Crew run time by phase (construction, kickoff, task).")
+CREW_RUNS_IN_FLIGHT = registry.gauge("daycrafter_crew_runs_in_flight", "Crew runs currently executing.")
+LLM_CALLS = registry.counter("daycrafter_llm_calls_total", "Successful LLM requests made by crew runs.")
+LLM_TOKENS = registry.counter("daycrafter_llm_tokens_total", "LLM tokens used by crew runs, by kind.")
+HTTP_CALLS = registry.counter("daycrafter_http_requests_total", "Outbound HTTP requests by host and status code.")
+HTTP_LATENCY = registry.histogram("daycrafter_http_request_seconds", "Outbound HTTP request latency by host.")
+CACHE_REQUESTS = registry.counter("daycrafter_cache_requests_total", "Cache lookups by cache and result (hit/miss).")
+CREW_RUNS_CANCELLED = registry.counter(
+    "daycrafter_crew_runs_cancelled_total", "Crew runs stopped early, by reason (cancelled/deadline) and phase (queued/running).")
+CANCELLED_CALLS = registry.counter(
+    "daycrafter_cancelled_calls_total", "LLM and tool calls skipped because their crew run was stopped, by kind.")
+WORKER_RESTARTS = registry.counter(
+    "daycrafter_worker_restarts_total", "Crew worker processes replaced, by reason (max_jobs/rss/crashed).")
+OUTBOUND_CALLS = registry.counter(
+    "daycrafter_outbound_calls_total",
+    "Calls to outbound dependencies by outcome (ok/error/retry/rejected/throttled/stale).")
+CIRCUIT_STATE = registry.gauge(
+    "daycrafter_circuit_state", "Circuit breaker state per outbound dependency (0 closed, 1 half-open, 2 open).")
+
+
+@contextmanager
+def _noop():
+    yield
+
+
+def timer(histogram: Histogram, **labels):
+    """Context manager timing a block into `histogram`; a shared no-op when metrics are disabled."""
+    if not METRICS_ENABLED:
+        return _noop()
+    return histogram.time(**labels)
+
+
+def in_flight(gauge: Gauge, **labels):
+    """Context manager counting the block in `gauge` while it runs; a no-op when metrics are disabled."""
+    if not METRICS_ENABLED:
+        return _noop()
+    return gauge.track(**labels)
+
+
+def instrument_tool(name: Optional[str] = None):
+    """
+    Decorator recording latency, outcome and in-flight count of a tool (sync or async).
+    Returns the function unchanged when metrics are disabled.
+    """
+    def decorate(fn):
+        if not METRICS_ENABLED:
+            return fn
+        tool = name or fn.__name__
+        # Label keys are built once so a call only pays for the clock and three locked updates
+        tool_key = _key({"tool": tool})
+        ok_key = _key({"tool": tool, "status": "ok"})
+        error_key = _key({"tool": tool, "status": "error"})
+        server_key = _key({"server": "mcp"})
+
+        def record(start, status_key):
+            REQUESTS_IN_FLIGHT.inc_key(server_key, -1)
+            TOOL_LATENCY.observe_key(tool_key, time.perf_counter() - start)
+            TOOL_CALLS.inc_key(status_key)
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                REQUESTS_IN_FLIGHT.inc_key(server_key)
+                try:
+                    result = await fn(*args, **kwargs)
+                except BaseException:
+                    record(start, error_key)
+                    raise
+                record(start, ok_key)
+                return result
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                REQUESTS_IN_FLIGHT.inc_key(server_key)
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException:
+                    record(start, error_key)
+                    raise
+                record(start, ok_key)
+                return result
+        return wrapper
+    return decorate
+
+
+def record_cache(cache: str, hit: bool):
+    if METRICS_ENABLED:
+        CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_cancelled_run(reason: str, phase: str):
+    if METRICS_ENABLED:
+        CREW_RUNS_CANCELLED.inc(reason=reason, phase=phase)
+
+
+def record_cancelled_call(kind: str):
+    if METRICS_ENABLED:
+        CANCELLED_CALLS.inc(kind=kind)
+
+
+def record_worker_restart(reason: str):
+    if METRICS_ENABLED:
+        WORKER_RESTARTS.inc(reason=reason)
+
+
+def record_outbound(dependency: str, outcome: str):
+    if METRICS_ENABLED:
+        OUTBOUND_CALLS.inc(dependency=dependency, outcome=outcome)
+
+
+def record_circuit_state(dependency: str, state: int):
+    if METRICS_ENABLED:
+        CIRCUIT_STATE.set(state, dependency=dependency)
+
+
+def record_usage(token_usage):
+    """Add a crew run's UsageMetrics (CrewOutput.token_usage) to the LLM counters."""
+    if not METRICS_ENABLED or token_usage is None:
+        return
+    LLM_CALLS.inc(getattr(token_usage, "successful_requests", 0) or 0)
+    for kind in ("prompt", "completion", "cached_prompt"):
+        tokens = getattr(token_usage, f"{kind}_tokens", 0) or 0
+        if tokens:
+            LLM_TOKENS.inc(tokens, kind=kind)
+
+
+def instrument_crew(crew):
+    """
+    Time each task of `crew` into the crew phase histogram. Wraps any task
+    callback already set (e.g. the progress reporter's); call it after that.
+    """
+    if not METRICS_ENABLED:
+        return crew
+    previous = crew.task_callback
+    state = {"last": time.perf_counter()}
+
+    def task_callback(output):
+        now = time.perf_counter()
+        CREW_PHASE.observe(now - state["last"], phase=f"task:{getattr(output, 'name', None) or 'unnamed'}")
+        state["last"] = now
+        if previous is not None:
+            previous(output)
+
+    crew.task_callback = task_callback
+    return crew
+
+
+def start_dump_thread(path: str, interval: float) -> threading.Thread:
+    """Periodically write the metrics to `path` from a daemon thread."""
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                registry.dump(path)
+            except OSError:
+                pass
+
+    thread = threading.Thread(target=loop, name="metrics-dump", daemon=True)
+    thread.start()
+    return thread
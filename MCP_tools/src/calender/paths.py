@@ -0,0 +1,5 @@
+# Kept free of crewai imports so lightweight modules (e.g. the plan cache) can use them
+# without loading the crew.
+
+# Relative to the working directory the crew is launched from
+PREFERENCE_PATH = 'knowledge/user_preference.txt'
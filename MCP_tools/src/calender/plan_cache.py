@@ -0,0 +1,252 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, wait
+from datetime import date
+from typing import Callable, Optional, Dict
+
+from calender.paths import PREFERENCE_PATH
+from calender.metrics import record_cache
+from calender.cancellation import CancelToken, RunCancelled, stopped
+
+logger = logging.getLogger("plan_cache")
+
+_WHITESPACE = re.compile(r"\s+")
+
+# How often a caller waiting on another caller's run looks at its own cancel token
+WAIT_POLL_SECONDS = 0.1
+
+
+def normalize_topic(topic: str) -> str:
+    """Collapse whitespace and case so retries and re-pasted text share a cache entry."""
+    return _WHITESPACE.sub(" ", topic).strip().lower()
+
+
+def is_roadmap_json(value: str) -> bool:
+    """True for the roadmap JSON list that plan_to_json produces, False for a reply it could not parse."""
+    try:
+        items = json.loads(value)
+    except (TypeError, ValueError):
+        return False
+    return isinstance(items, list) and bool(items) and all(isinstance(item, dict) for item in items)
+
+
+class PlanCache:
+    """
+    LRU + TTL cache for finished plans, with an optional on-disk tier and
+    single-flight de-duplication of concurrent identical requests.
+
+    Keys combine the normalized topic, a hash of the preference file and the
+    current date, so a plan is never reused after preferences change or on the
+    next day (relative dates like "tomorrow" would be wrong).
+
+    Args:
+        max_entries: Maximum number of plans held in memory.
+        ttl: Seconds a plan stays fresh.
+        disk_dir: Directory for the on-disk tier, or None to keep plans in memory only.
+        preference_path: Preference file whose contents are part of the key.
+        cacheable: Optional check on a computed plan; plans it rejects (e.g. a reply that
+            isn't a roadmap) are returned to their callers but not stored.
+    """
+
+    def __init__(self, max_entries: int = 128, ttl: float = 3600.0,
+                 disk_dir: Optional[str] = None, preference_path: str = PREFERENCE_PATH,
+                 cacheable: Optional[Callable[[str], bool]] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.preference_path = preference_path
+        self.cacheable = cacheable
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._pref_signature = None
+        self._pref_hash = ""
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "errors": 0,
+                       "not_cached": 0}
+
+    def _preference_hash(self) -> str:
+        try:
+            st = os.stat(self.preference_path)
+            signature = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return ""
+        with self._lock:
+            if signature == self._pref_signature:
+                return self._pref_hash
+        with open(self.preference_path, 'rb') as f:
+            pref_hash = hashlib.sha256(f.read()).hexdigest()
+        # Signature and hash are updated together, so no caller pairs a new signature with an old hash
+        with self._lock:
+            self._pref_signature, self._pref_hash = signature, pref_hash
+        return pref_hash
+
+    def make_key(self, topic: str) -> str:
+        raw = "\0".join((normalize_topic(topic), self._preference_hash(), date.today().isoformat()))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        if time.time() - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _put_memory(self, key: str, value: str, stored_at: float):
+        self._entries[key] = (value, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _get_disk(self, key: str) -> Optional[tuple]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry["stored_at"] > self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry["value"], entry["stored_at"]
+
+    def _put_disk(self, key: str, value: str, stored_at: float):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"value": value, "stored_at": stored_at}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write plan cache entry to disk: {e}")
+
+    def get(self, topic: str) -> Optional[str]:
+        """Return a cached plan for `topic` without computing one."""
+        key = self.make_key(topic)
+        with self._lock:
+            value = self._get_memory(key)
+            if value is not None:
+                return value
+        entry = self._get_disk(key)
+        if entry is not None:
+            with self._lock:
+                self._put_memory(key, *entry)
+            return entry[0]
+        return None
+
+    def get_or_compute(self, topic: str, compute: Callable[[str], str],
+                       cancel: Optional[CancelToken] = None) -> str:
+        """
+        Return the cached plan for `topic`, or run `compute(topic)` once.
+
+        Concurrent callers with the same key wait on the first caller's run and
+        receive its result (or its exception) instead of starting their own.
+        If the first caller's run is cancelled, the waiting callers start over.
+        A waiting caller whose own `cancel` token fires stops waiting and raises RunCancelled.
+        """
+        key = self.make_key(topic)
+        with self._lock:
+            value = self._get_memory(key)
+            if value is not None:
+                self._stats["hits"] += 1
+                record_cache("plan", hit=True)
+                return value
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                record_cache("plan", hit=True)
+                leader = False
+            else:
+                future = Future()
+                self._in_flight[key] = future
+                leader = True
+
+        if not leader:
+            while cancel is not None and not future.done():
+                if cancel.cancelled:
+                    raise stopped(cancel, "queued")
+                wait((future,), timeout=WAIT_POLL_SECONDS)
+            try:
+                return future.result()
+            except RunCancelled:
+                # Cancelled by the leader's own client, not by this caller
+                return self.get_or_compute(topic, compute, cancel)
+
+        try:
+            entry = self._get_disk(key)
+            if entry is not None:
+                value = entry[0]
+                with self._lock:
+                    self._stats["disk_hits"] += 1
+                    self._put_memory(key, *entry)
+                record_cache("plan", hit=True)
+            else:
+                with self._lock:
+                    self._stats["misses"] += 1
+                record_cache("plan", hit=False)
+                value = compute(topic)
+                if self.cacheable is None or self.cacheable(value):
+                    stored_at = time.time()
+                    with self._lock:
+                        self._put_memory(key, value, stored_at)
+                    self._put_disk(key, value, stored_at)
+                else:
+                    # Shared with callers already waiting on this run, but the next request tries again
+                    logger.warning(f"Not caching the plan for {topic[:60]!r}: the crew's reply is not a roadmap")
+                    with self._lock:
+                        self._stats["not_cached"] += 1
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            with self._lock:
+                self._stats["errors"] += 1
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+            stats["in_flight"] = len(self._in_flight)
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_ratio"] = (lookups - stats["misses"]) / lookups if lookups else 0.0
+        stats["ttl"] = self.ttl
+        return stats
+
+
+plan_cache = PlanCache(
+    max_entries=int(os.getenv("PLAN_CACHE_SIZE", 128)),
+    ttl=float(os.getenv("PLAN_CACHE_TTL", 3600)),
+    disk_dir=os.getenv("PLAN_CACHE_DIR") or None,
+    cacheable=is_roadmap_json,
+)
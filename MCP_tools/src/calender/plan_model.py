@@ -0,0 +1,96 @@
+import json
+import logging
+from typing import List, Optional, Union
+
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, ValidationError, field_validator
+from crewai.utilities.converter import Converter
+
+from calender.plan_parser import repair_json
+
+logger = logging.getLogger("plan_model")
+
+
+class RoadmapItem(BaseModel):
+    """One entry of the roadmap, in the shape the Flutter app reads."""
+
+    model_config = ConfigDict(extra="allow")
+
+    dateOnCalendar: str = ""
+    DueDate: str = ""
+    start_time: str = ""
+    end_time: str = ""
+    task: str
+    priority: Optional[int] = None
+    links: Union[str, List[str]] = ""
+    Description: str = Field(default="", validation_alias=AliasChoices("Description", "Discription", "description"))
+    duration_minutes: Optional[int] = None
+
+    @field_validator("priority", "duration_minutes", mode="before")
+    @classmethod
+    def _lenient_int(cls, value):
+        # "2", 2.0 and "30 min" are fine; anything else is dropped rather than failing the plan
+        if value is None or isinstance(value, int):
+            return value
+        try:
+            return int(float(str(value).split()[0]))
+        except (ValueError, IndexError):
+            return None
+
+
+# The list is wrapped in an object because CrewAI's task-output log only serializes
+# models that dump to a dict. Docstrings here become schema descriptions in the prompt.
+class Roadmap(BaseModel):
+    """The execution task's structured output: a prioritized list of roadmap items."""
+
+    items: List[RoadmapItem]
+
+
+def parse_roadmap(text: str) -> Roadmap:
+    """Parse a roadmap reply locally, repairing near-valid JSON. Raises ValueError if it can't."""
+    value = repair_json(text)
+    if isinstance(value, dict):
+        # A single item, or the list wrapped in an object
+        lists = [v for v in value.values() if isinstance(v, list)]
+        value = lists[0] if len(lists) == 1 and "task" not in value else [value]
+    return Roadmap(items=value)
+
+
+class LocalRepairConverter(Converter):
+    """
+    Task converter that repairs the reply locally and only asks the LLM to
+    reformat it (CrewAI's default behavior) when local repair fails.
+    """
+
+    def to_pydantic(self, current_attempt: int = 1) -> BaseModel:
+        if self.model is Roadmap:
+            try:
+                return parse_roadmap(self.text)
+            except (ValueError, ValidationError) as e:
+                logger.warning(f"Could not repair the roadmap locally, asking the LLM to reformat it: {e}")
+        return super().to_pydantic(current_attempt)
+
+    def to_json(self, current_attempt: int = 1):
+        if self.model is Roadmap:
+            try:
+                return parse_roadmap(self.text).model_dump(mode="json")["items"]
+            except (ValueError, ValidationError) as e:
+                logger.warning(f"Could not repair the roadmap locally, asking the LLM to reformat it: {e}")
+        return super().to_json(current_attempt)
+
+
+def plan_to_json(output) -> str:
+    """
+    Serialize a crew result as the roadmap JSON list.
+
+    Uses the validated model when the task produced one, and otherwise tries a
+    local repair of the raw reply; text that isn't a roadmap is returned as is.
+    """
+    roadmap = getattr(output, "pydantic", None)
+    if not isinstance(roadmap, Roadmap):
+        raw = getattr(output, "raw", None)
+        raw = str(output) if raw is None else raw
+        try:
+            roadmap = parse_roadmap(raw)
+        except (ValueError, ValidationError):
+            return raw
+    return json.dumps(roadmap.model_dump(mode="json")["items"], ensure_ascii=False, indent=2)
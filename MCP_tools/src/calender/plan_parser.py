@@ -0,0 +1,168 @@
+import re
+import json
+from typing import Any, List, Optional
+
+_FENCE = re.compile(r"```[a-zA-Z]*\s*\n?(.*?)(?:```|$)", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",(\s*[\]}])")
+
+_CLOSERS = {"[": "]", "{": "}"}
+
+
+def _scan(text: str):
+    """
+    Walk the first JSON value in `text`, skipping anything before it.
+
+    Returns (start, end, stack, last_safe): the value's start index, the index
+    just past its end (None if it never closes), the brackets still open at
+    the end of the text, and the index just past the last complete element
+    of the outermost container.
+    """
+    start = None
+    stack: List[str] = []
+    in_string = escape = False
+    last_safe = None
+    for index, ch in enumerate(text):
+        if start is None:
+            if ch in "[{":
+                start = index
+                stack.append(ch)
+            continue
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "[{":
+            stack.append(ch)
+        elif ch in "]}":
+            if stack:
+                stack.pop()
+            if not stack:
+                return start, index + 1, [], last_safe
+            if len(stack) == 1:
+                last_safe = index + 1
+    return start, None, stack, last_safe
+
+
+def _remove_trailing_commas(text: str) -> str:
+    # Only touch commas outside strings
+    parts = re.split(r'("(?:\\.|[^"\\])*")', text)
+    return "".join(part if i % 2 else _TRAILING_COMMA.sub(r"\1", part) for i, part in enumerate(parts))
+
+
+def repair_json(text: str) -> Any:
+    """
+    Parse near-valid JSON from an LLM reply without another LLM round trip.
+
+    Handles code fences, prose before or after the value, trailing commas,
+    raw newlines inside strings, and replies cut off mid-list (the incomplete
+    last element is dropped). Raises ValueError if nothing usable is found.
+    """
+    if text is None:
+        raise ValueError("No JSON value found")
+    try:
+        return json.loads(text, strict=False)
+    except ValueError:
+        pass
+
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+
+    start, end, stack, last_safe = _scan(text)
+    if start is None:
+        raise ValueError("No JSON value found")
+    if end is not None:
+        candidate = text[start:end]
+    elif last_safe is not None:
+        # Truncated: keep the complete elements and close the outer container
+        candidate = text[start:last_safe] + _CLOSERS[stack[0]]
+    else:
+        candidate = text[start:] + "".join(_CLOSERS[ch] for ch in reversed(stack))
+    return json.loads(_remove_trailing_commas(candidate), strict=False)
+
+
+class RoadmapStreamParser:
+    """
+    Incremental parser for a streamed roadmap (a JSON list of objects).
+
+    `feed()` takes each chunk as it arrives and returns the items completed by
+    it, so callers can show roadmap items before the reply has finished.
+    Text before the list is ignored; with `marker` set (e.g. "Final Answer:"),
+    everything before the marker is ignored too, so JSON in tool calls is skipped.
+    """
+
+    def __init__(self, marker: Optional[str] = None):
+        self.marker = marker
+        self.items: List[dict] = []
+        self._buffer = ""
+        self._position = 0
+        self._started = marker is None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._item_start: Optional[int] = None
+        self._done = False
+
+    def feed(self, chunk: str) -> List[dict]:
+        self._buffer += chunk
+        if not self._started:
+            found = self._buffer.find(self.marker)
+            if found < 0:
+                return []
+            self._started = True
+            self._position = found + len(self.marker)
+
+        completed = []
+        buffer = self._buffer
+        while self._position < len(buffer) and not self._done:
+            ch = buffer[self._position]
+            if self._depth == 0:
+                if ch == "[":
+                    self._depth = 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                if self._depth == 1 and ch == "{":
+                    self._item_start = self._position
+                self._depth += 1
+            elif ch in "]}":
+                self._depth -= 1
+                if self._depth == 1 and self._item_start is not None:
+                    try:
+                        item = repair_json(buffer[self._item_start:self._position + 1])
+                    except ValueError:
+                        item = None
+                    if isinstance(item, dict):
+                        self.items.append(item)
+                        completed.append(item)
+                    self._item_start = None
+                elif self._depth == 0:
+                    self._done = True
+            self._position += 1
+        return completed
+
+    def close(self) -> List[dict]:
+        """Return every item, parsing the whole reply if the stream ended early or oddly."""
+        if self._done:
+            return self.items
+        text = self._buffer
+        if self.marker and self.marker in text:
+            text = text.split(self.marker, 1)[1]
+        try:
+            value = repair_json(text)
+        except ValueError:
+            return self.items
+        return [item for item in value if isinstance(item, dict)] if isinstance(value, list) else self.items
@@ -0,0 +1,157 @@
+import json
+import time
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from calender.plan_parser import RoadmapStreamParser
+
+# Events sent to clients while a crew runs:
+#   crew_started, agent_started, tool_called, partial_output, roadmap_item, task_finished
+# The caller adds crew_finished (or error) once kickoff() returns.
+ProgressEmitter = Callable[[Dict[str, Any]], None]
+
+# The roadmap follows this marker in the agent's final reply
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+# Streamed replies are routed to the reporter of the run that owns the task
+_stream_lock = threading.Lock()
+_stream_parsers: Dict[str, tuple] = {}
+_stream_handler_registered = False
+
+
+def _on_stream_chunk(source, event):
+    if getattr(event, "call_type", None) is not None and event.call_type.value == "tool_call":
+        return
+    entry = _stream_parsers.get(getattr(event, "task_id", None))
+    if entry is None:
+        return
+    parser, reporter = entry
+    for item in parser.feed(event.chunk):
+        reporter.event("roadmap_item", item=item, index=len(parser.items) - 1)
+
+
+def _register_stream_handler():
+    # Registered once per process; crewai is already loaded when a crew runs
+    global _stream_handler_registered
+    with _stream_lock:
+        if _stream_handler_registered:
+            return
+        from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+        crewai_event_bus.register_handler(LLMStreamChunkEvent, _on_stream_chunk)
+        _stream_handler_registered = True
+
+# Tool results and agent answers can be long; progress events only carry a preview
+PREVIEW_CHARS = 500
+
+
+def _preview(text: Any, limit: int = PREVIEW_CHARS) -> str:
+    text = "" if text is None else str(text)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+class ProgressReporter:
+    """
+    Turns CrewAI step/task callbacks into progress events for a single crew run.
+
+    Args:
+        emit: Called with each event dict. It runs on the crew's worker thread,
+            so it must be thread-safe and must not block.
+        topic: The run's topic, used to fill `{topic}` in agent roles.
+    """
+
+    def __init__(self, emit: ProgressEmitter, topic: str = ""):
+        self.emit = emit
+        self.topic = _preview(" ".join(topic.split()), 60)
+        self.tasks = []
+        self._stream_task_ids = []
+        self.completed = 0
+        self.started_at = time.time()
+
+    def event(self, kind: str, **data):
+        self.emit({"event": kind, "elapsed": round(time.time() - self.started_at, 3), **data})
+
+    def _agent_started(self, index: int):
+        if index >= len(self.tasks):
+            return
+        task = self.tasks[index]
+        role = (task.agent.role if task.agent else "").replace("{topic}", self.topic)
+        self.event("agent_started", agent=" ".join(role.split()), task=task.name, index=index, total=len(self.tasks))
+
+    def step_callback(self, step):
+        # AgentAction: the agent called a tool (result is filled in by then)
+        if getattr(step, "tool", None):
+            self.event(
+                "tool_called",
+                tool=step.tool,
+                tool_input=_preview(step.tool_input),
+                thought=_preview(step.thought),
+                result=_preview(step.result),
+            )
+        # AgentFinish: the agent's answer for the current task
+        elif hasattr(step, "output"):
+            self.event("partial_output", output=_preview(step.output), thought=_preview(step.thought))
+
+    def task_callback(self, output):
+        self.event("task_finished", task=getattr(output, "name", None), output=_preview(getattr(output, "raw", output)))
+        self.completed += 1
+        self._agent_started(self.completed)
+
+    def stream_roadmap(self):
+        """Emit `roadmap_item` events as each item of a streamed reply completes (needs a streaming LLM)."""
+        _register_stream_handler()
+        with _stream_lock:
+            for task in self.tasks:
+                task_id = str(task.id)
+                _stream_parsers[task_id] = (RoadmapStreamParser(FINAL_ANSWER_MARKER), self)
+                self._stream_task_ids.append(task_id)
+
+    def attach(self, crew):
+        """Register the callbacks on `crew` and emit the opening events."""
+        crew.step_callback = self.step_callback
+        crew.task_callback = self.task_callback
+        self.tasks = list(crew.tasks)
+        self.event("crew_started", tasks=len(self.tasks))
+        self._agent_started(0)
+        return crew
+
+    def close(self):
+        with _stream_lock:
+            for task_id in self._stream_task_ids:
+                _stream_parsers.pop(task_id, None)
+        self._stream_task_ids = []
+
+
+def attach_progress(crew, emit: Optional[ProgressEmitter], topic: str = "",
+                    stream: bool = False) -> Optional[ProgressReporter]:
+    """
+    Wire progress events into `crew` when an emitter is given.
+    Returns the reporter (call `close()` once the run ends), or None without an emitter.
+    """
+    if emit is None:
+        return None
+    reporter = ProgressReporter(emit, topic)
+    reporter.attach(crew)
+    if stream:
+        reporter.stream_roadmap()
+    return reporter
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Encode an event as a Server-Sent Events message."""
+    return f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+def describe_event(event: Dict[str, Any]) -> str:
+    """One-line, human-readable summary of an event, used for MCP progress messages."""
+    kind = event["event"]
+    if kind == "agent_started":
+        return f"Agent started: {event['agent']}"
+    if kind == "tool_called":
+        return f"Tool called: {event['tool']}"
+    if kind == "task_finished":
+        return f"Task finished: {event['task']}"
+    if kind == "roadmap_item":
+        return f"Roadmap item: {event['item'].get('task', '')}"
+    if kind == "partial_output":
+        return f"Partial output: {_preview(event['output'], 200)}"
+    return kind.replace("_", " ").capitalize()
@@ -0,0 +1,90 @@
+import os
+from typing import Dict, List, Optional
+
+from crewai.llms.base_llm import BaseLLM
+
+from calender.crew import Calender
+from calender.prompts import count_tokens, token_encoding
+
+
+class _CapturingLLM(BaseLLM):
+    """Records the first prompt the agent sends and answers immediately with an empty roadmap."""
+
+    def __init__(self, model: str):
+        super().__init__(model=model)
+        self.messages: List[Dict[str, str]] = []
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None) -> str:
+        if not self.messages:
+            self.messages = [{"role": "user", "content": messages}] if isinstance(messages, str) else list(messages)
+        return "Thought: I now know the final answer\nFinal Answer: []"
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def get_context_window_size(self) -> int:
+        return 128000
+
+
+def capture_prompt(topic: str, compact: bool = False, model: Optional[str] = None) -> Dict[str, object]:
+    """
+    Build the crew for `topic` and return the messages of its first LLM call together with the
+    interpolated agent and task fields. Runs no network calls; the remote research tools are left
+    out, so their descriptions are not part of the captured prompt.
+    """
+    model = model or os.getenv("MODEL") or "gpt-4o-mini"
+    crew = Calender(compact_prompts=compact).crew()
+    llm = _CapturingLLM(model)
+    for agent in crew.agents:
+        agent.mcps = None
+        agent.llm = llm
+    crew.kickoff(inputs={"topic": topic})
+    agent, task = crew.agents[0], crew.tasks[0]
+    return {"messages": llm.messages, "agent": agent, "task": task, "model": model}
+
+
+def profile_prompt(topic: str, compact: bool = False, model: Optional[str] = None) -> Dict[str, object]:
+    """
+    Token count of each segment of the agent's first prompt for `topic`.
+
+    Segments are the agent's role, goal, backstory and preferences, the task's
+    description and expected output, and CrewAI's own instructions (the rest).
+    """
+    captured = capture_prompt(topic, compact, model)
+    model = captured["model"]
+    agent, task = captured["agent"], captured["task"]
+    prompt = "\n".join(str(m.get("content", "")) for m in captured["messages"])
+
+    backstory, _, preferences = agent.backstory.partition("\n\nUSER PREFERENCES:\n")
+    segments = {
+        "role": agent.role,
+        "goal": agent.goal,
+        "backstory": backstory,
+        "preferences": preferences,
+        "task_description": task.description,
+        "expected_output": task.expected_output,
+    }
+    tokens = {name: count_tokens(text, model) for name, text in segments.items()}
+    total = count_tokens(prompt, model)
+    tokens["crewai_framework"] = max(0, total - sum(tokens.values()))
+    return {
+        "model": model,
+        "compact": compact,
+        "exact": token_encoding(model) is not None,
+        "segments": tokens,
+        "total_tokens": total,
+        "topic_tokens": count_tokens(topic, model),
+        "topic_occurrences": prompt.count(topic.strip()),
+    }
+
+
+def format_profile(profile: Dict[str, object]) -> str:
+    unit = "tokens" if profile["exact"] else "tokens (estimated, install tiktoken for exact counts)"
+    lines = [f"{'compact' if profile['compact'] else 'default'} prompt for {profile['model']}, in {unit}:"]
+    total = profile["total_tokens"] or 1
+    for name, tokens in profile["segments"].items():
+        lines.append(f"  {name:<18} {tokens:>7} {tokens / total:>6.1%}")
+    lines.append(f"  {'total':<18} {profile['total_tokens']:>7}")
+    lines.append(f"  topic: {profile['topic_tokens']} tokens, sent {profile['topic_occurrences']} time(s)")
+    return "\n".join(lines)
@@ -0,0 +1,60 @@
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from calender.scheduler import format_constraints, parse_preferences
+
+# Compact prompts: the topic is sent once (in the task) and preferences as a short structured block
+PROMPT_COMPACT = os.getenv("PROMPT_COMPACT", "0") == "1"
+
+# Replaces {topic} in the agent's role and goal when prompts are compact
+TOPIC_REFERENCE = "the topic in the task"
+
+# Lines about these are covered by format_constraints; everything else is kept as a free-text rule
+_SCHEDULING_WORDS = ("work start", "work end", "break", "default task duration", "buffer",
+                     "deep work", "meeting", "call", "weekend", "friday")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=8)
+def token_encoding(model: Optional[str]):
+    # tiktoken is optional; without it token counts are estimated at four characters per token
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model or "gpt-4o-mini")
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    encoding = token_encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+def compact_preferences(text: str) -> str:
+    """
+    Normalize the free-text preference file into a short block: one line of
+    scheduling constraints, then any other rules verbatim without markdown.
+    """
+    lines = ["Scheduling: " + format_constraints(parse_preferences(text))]
+    for line in text.splitlines():
+        rule = line.strip().lstrip("-*").strip()
+        if not rule or line.lstrip().startswith("#"):
+            continue
+        if not any(word in rule.lower() for word in _SCHEDULING_WORDS):
+            lines.append(f"- {rule}")
+    return "\n".join(lines)
+
+
+def compact_agent_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Agent config with {topic} dropped from the role and replaced by a short reference in the goal."""
+    compact = dict(config)
+    compact["role"] = _WHITESPACE.sub(" ", config["role"].replace("{topic}", "")).strip()
+    compact["goal"] = config["goal"].replace("{topic}", TOPIC_REFERENCE)
+    return compact
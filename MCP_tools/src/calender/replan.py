@@ -0,0 +1,239 @@
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from calender.cancellation import CancelToken, stopped
+from calender.plan_model import RoadmapItem
+from calender.plan_parser import repair_json
+from calender.prompts import count_tokens
+from calender.scheduler import SCHEDULE_HORIZON_DAYS, SlotScheduler, _parse_date, load_preferences
+
+logger = logging.getLogger("replan")
+
+# Delta operations; "add" and "revise" with a free-text "request" are the only ones that need the LLM
+OPS = ("update", "remove", "add", "revise")
+
+# The topic is only context for the patch prompt; the plan already carries the research
+TOPIC_CHARS = 300
+
+PATCH_INSTRUCTIONS = (
+    "You are updating an existing project roadmap. Apply only the numbered changes below; the other "
+    "items stay as they are. Reply with only a JSON list of the new or revised items, each with \"change\" "
+    "set to the number of the change it answers and the fields task, Description, priority, DueDate "
+    "(YYYY-MM-DD or empty), duration_minutes and links. Keep task names under 15 words. "
+    "Do not pick dates or times."
+)
+
+
+def _find(items: List[Dict[str, Any]], ref) -> int:
+    """Index of the item `ref` names: a 1-based position or a task name (case-insensitive)."""
+    if isinstance(ref, int) or (isinstance(ref, str) and ref.isdigit()):
+        position = int(ref) - 1
+        if 0 <= position < len(items):
+            return position
+    elif isinstance(ref, str):
+        for index, item in enumerate(items):
+            if item.get("task", "").strip().lower() == ref.strip().lower():
+                return index
+    raise ValueError(f"No roadmap item matches {ref!r}")
+
+
+def _slot(item: Dict[str, Any]) -> Optional[Tuple[datetime, datetime]]:
+    try:
+        day = item["dateOnCalendar"]
+        return (datetime.fromisoformat(f"{day}T{item['start_time']}"),
+                datetime.fromisoformat(f"{day}T{item['end_time']}"))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _keeps_slot(item: Dict[str, Any], now: datetime, occupied: List[Tuple[datetime, datetime]]) -> bool:
+    """
+    An unchanged item keeps its slot while the slot is still ahead, before the item's due date
+    and clear of `occupied` (busy events and the slots already kept).
+    """
+    slot = _slot(item)
+    if slot is None or slot[0] < now:
+        return False
+    if any(slot[0] < end and start < slot[1] for start, end in occupied):
+        return False
+    due = _parse_date(item.get("DueDate"))
+    return due is None or slot[0].date() <= due
+
+
+def patch_prompt(items: List[Dict[str, Any]], changes: List[Tuple[Optional[int], str]],
+                 topic: str = "") -> List[Dict[str, str]]:
+    """Messages for the one LLM call of a re-plan: the item names as context and only the changed items in full."""
+    lines = []
+    if topic:
+        lines.append(f"Project: {' '.join(topic.split())[:TOPIC_CHARS]}")
+    lines.append("Current roadmap:")
+    lines += [f"{position + 1}. {item.get('task', '')} (priority {item.get('priority', '-')})"
+              for position, item in enumerate(items)]
+    lines.append("\nChanges:")
+    for number, (position, request) in enumerate(changes, start=1):
+        if position is None:
+            lines.append(f"{number}. Add: {request}")
+        else:
+            current = {name: items[position].get(name, "") for name in
+                       ("task", "Description", "priority", "DueDate", "duration_minutes", "links")}
+            lines.append(f"{number}. Revise item {position + 1}: {request}\n   Current: "
+                         f"{json.dumps(current, ensure_ascii=False)}")
+    return [{"role": "system", "content": PATCH_INSTRUCTIONS}, {"role": "user", "content": "\n".join(lines)}]
+
+
+def _patched_items(reply: str, count: int) -> Dict[int, List[Dict[str, Any]]]:
+    """The reply's items grouped by change number; with a single change, unnumbered items belong to it."""
+    value = repair_json(reply)
+    if isinstance(value, dict):
+        value = [value]
+    if not isinstance(value, list):
+        raise ValueError("The patch reply is not a list of roadmap items")
+    groups: Dict[int, List[Dict[str, Any]]] = {}
+    for raw in value:
+        if not isinstance(raw, dict):
+            continue
+        try:
+            number = int(raw.pop("change", 1 if count == 1 else 0))
+        except (TypeError, ValueError):
+            number = 0
+        if not 1 <= number <= count:
+            logger.warning(f"Dropping a patch item that answers no change: {raw.get('task')!r}")
+            continue
+        item = RoadmapItem.model_validate(raw).model_dump(mode="json")
+        groups.setdefault(number, []).append(item)
+    return groups
+
+
+def replan(
+    plan: List[Dict[str, Any]],
+    delta: List[Dict[str, Any]],
+    call_llm=None,
+    busy: Iterable[Tuple[datetime, datetime]] = (),
+    topic: str = "",
+    start: Optional[datetime] = None,
+    cancel: Optional[CancelToken] = None,
+) -> Dict[str, Any]:
+    """
+    Apply `delta` to a previous roadmap without planning it again.
+
+    Edits with explicit values are applied locally. Free-text requests (a new subtask, a
+    revised item) are answered together by one short patch prompt that carries only the
+    changed items, not the research and analysis of a full crew run. Unchanged items keep
+    their calendar slots unless those now clash with `busy`; changed and new items are slotted
+    around the kept ones and `busy`.
+
+    Args:
+        plan: The previous roadmap items (scheduled or not), e.g. a result of /run.
+        delta: Operations, applied in order:
+            {"op": "update", "task": <name or position>, "set": {<field>: <value>, ...}},
+            {"op": "remove", "task": ...},
+            {"op": "add", "item": {<roadmap item>}} or {"op": "add", "request": "<what to add>"},
+            {"op": "revise", "task": ..., "request": "<how to change it>"}.
+        call_llm: Called with the patch messages and returns the reply text; needed only for requests.
+        busy: Existing (start, end) events to keep free.
+        topic: The original topic, sent as context with requests.
+        start: Earliest time for new slots; defaults to now.
+        cancel: Optional token checked before the LLM call.
+
+    Returns:
+        The re-planned items in calendar order (unscheduled ones last), plus which items were
+        re-slotted, how many kept their slot, the LLM calls and prompt tokens used, and the
+        requests the patch reply left unanswered (their items are unchanged).
+    """
+    items = [dict(item) for item in plan]
+    changed = [False] * len(items)
+    changes: List[Tuple[Optional[int], str]] = []
+    # Revised items are replaced once the patch reply arrives
+    targets: List[Optional[Dict[str, Any]]] = []
+
+    for operation in delta:
+        op = operation.get("op")
+        if op not in OPS:
+            raise ValueError(f"Delta op must be one of {', '.join(OPS)}, not {op!r}")
+        if op == "add" and "item" in operation:
+            items.append(RoadmapItem.model_validate(operation["item"]).model_dump(mode="json"))
+            changed.append(True)
+        elif op in ("add", "revise"):
+            request = str(operation.get("request") or "").strip()
+            if not request:
+                raise ValueError(f"A {op} without an item needs a request")
+            position = _find(items, operation.get("task")) if op == "revise" else None
+            changes.append((position, request))
+            targets.append(items[position] if position is not None else None)
+        elif op == "update":
+            position = _find(items, operation.get("task"))
+            fields = operation.get("set") or {}
+            if not isinstance(fields, dict) or not fields:
+                raise ValueError("An update needs a non-empty \"set\" object")
+            updated = RoadmapItem.model_validate({**items[position], **fields}).model_dump(mode="json")
+            # In place, so a revise request for the same item still finds it
+            items[position].clear()
+            items[position].update(updated)
+            changed[position] = True
+        else:
+            position = _find(items, operation.get("task"))
+            del items[position]
+            del changed[position]
+
+    llm_calls = prompt_tokens = 0
+    unanswered: List[Dict[str, Any]] = []
+    if changes:
+        if call_llm is None:
+            raise ValueError("Free-text requests need an LLM")
+        if cancel is not None and cancel.cancelled:
+            raise stopped(cancel, "queued")
+        # Positions may have shifted after removals; find the revised items by identity
+        positions = {id(item): index for index, item in enumerate(items)}
+        changes = [(None if target is None else positions.get(id(target)), request)
+                   for (_, request), target in zip(changes, targets)
+                   # A revised item that a later op removed needs no patch
+                   if target is None or id(target) in positions]
+    if changes:
+        messages = patch_prompt(items, changes, topic)
+        prompt_tokens = sum(count_tokens(message["content"]) for message in messages)
+        groups = _patched_items(call_llm(messages), len(changes))
+        llm_calls = 1
+        # A change the reply skipped leaves its item as it was; the caller is told which ones
+        unanswered = [{"task": None if position is None else items[position].get("task", ""), "request": request}
+                      for number, (position, request) in enumerate(changes, start=1) if not groups.get(number)]
+        # Replace from the back so earlier positions stay valid
+        replaced = sorted(((position, groups.get(number, [])) for number, (position, _) in
+                           enumerate(changes, start=1) if position is not None), key=lambda pair: pair[0], reverse=True)
+        for position, new_items in replaced:
+            if new_items:
+                items[position:position + 1] = new_items
+                changed[position:position + 1] = [True] * len(new_items)
+        for number, (position, _) in enumerate(changes, start=1):
+            if position is None:
+                items += groups.get(number, [])
+                changed += [True] * len(groups.get(number, []))
+
+    now = start or datetime.now()
+    kept, to_slot = [], []
+    occupied = list(busy)
+    for item, is_changed in zip(items, changed):
+        if not is_changed and _keeps_slot(item, now, occupied):
+            kept.append(item)
+            occupied.append(_slot(item))
+        else:
+            to_slot.append(item)
+    scheduler = SlotScheduler(load_preferences(), occupied, now, SCHEDULE_HORIZON_DAYS)
+    scheduled, unscheduled = scheduler.schedule(to_slot)
+    result = sorted(kept + scheduled, key=lambda item: (item["dateOnCalendar"], item["start_time"])) + unscheduled
+    return {
+        "plan": result,
+        "rescheduled": [item.get("task", "") for item in scheduled + unscheduled],
+        "kept": len(kept),
+        "llm_calls": llm_calls,
+        "prompt_tokens": prompt_tokens,
+        "unanswered": unanswered,
+    }
+
+
+def planner_llm_call(messages: List[Dict[str, str]]) -> str:
+    """Send the patch prompt to the planner agent's LLM (with its call cache), outside any crew."""
+    from calender.template import crew_template
+    llm = crew_template.template().agents[0].llm
+    return str(llm.call(messages))
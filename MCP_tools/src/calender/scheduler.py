@@ -0,0 +1,341 @@
+import os
+import re
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from calender.paths import PREFERENCE_PATH
+from calender.plan_parser import repair_json
+
+logger = logging.getLogger("scheduler")
+
+# Minutes since midnight; every interval below is [start, end)
+Interval = Tuple[int, int]
+
+AFTERNOON_START = 12 * 60
+
+# Days ahead of today that schedule_plan may use
+SCHEDULE_HORIZON_DAYS = int(os.getenv("SCHEDULE_HORIZON_DAYS", 28))
+
+_TIME = r"(\d{1,2}:\d{2})"
+_RANGE = re.compile(_TIME + r"\s*-\s*" + _TIME)
+_DEEP_WORK_WORDS = ("deep work", "coding", "code", "program", "writing", "write", "essay", "research",
+                    "study", "read", "analy", "design", "exercise", "practice")
+_MEETING_WORDS = ("meeting", "meet ", "call", "sync", "interview", "1:1", "standup", "office hours", "discussion")
+
+
+def _minutes(value: str) -> int:
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _format_minutes(value: int) -> str:
+    return f"{value // 60:02d}:{value % 60:02d}"
+
+
+@dataclass
+class SchedulingConstraints:
+    """Structured form of the rules in knowledge/user_preference.txt (times in minutes since midnight)."""
+
+    work_start: int = 9 * 60
+    work_end: int = 18 * 60
+    breaks: List[Interval] = field(default_factory=lambda: [(12 * 60, 13 * 60)])
+    default_duration: int = 60
+    buffer: int = 10
+    weekends: bool = False
+    deep_work_window: Optional[Interval] = (9 * 60, 12 * 60)
+    meeting_window: Optional[Interval] = (14 * 60, 17 * 60)
+    keep_friday_afternoon_free: bool = True
+
+
+def parse_preferences(text: str) -> SchedulingConstraints:
+    """
+    Parse the free-text preference file into constraints.
+    Rules that are missing from the text keep their defaults.
+    """
+    constraints = SchedulingConstraints()
+    breaks = []
+    for line in text.splitlines():
+        lowered = line.lower()
+        times = re.findall(_TIME, line)
+        time_range = _RANGE.search(line)
+        if "work start" in lowered and times:
+            constraints.work_start = _minutes(times[0])
+        elif "work end" in lowered and times:
+            constraints.work_end = _minutes(times[0])
+        elif "break" in lowered and time_range and "buffer" not in lowered:
+            breaks.append((_minutes(time_range.group(1)), _minutes(time_range.group(2))))
+        elif "default task duration" in lowered and re.search(r"\d+", line):
+            constraints.default_duration = int(re.search(r"(\d+)", line).group(1))
+        elif "buffer" in lowered and re.search(r"\d+", line):
+            constraints.buffer = int(re.search(r"(\d+)", line).group(1))
+        elif "deep work" in lowered and time_range:
+            constraints.deep_work_window = (_minutes(time_range.group(1)), _minutes(time_range.group(2)))
+        elif ("meeting" in lowered or "call" in lowered) and time_range:
+            constraints.meeting_window = (_minutes(time_range.group(1)), _minutes(time_range.group(2)))
+        elif "weekend" in lowered:
+            constraints.weekends = not re.search(r"\b(do not|don't|never|no)\b", lowered)
+        elif "friday" in lowered and "afternoon" in lowered:
+            constraints.keep_friday_afternoon_free = "free" in lowered
+    if any("break" in line.lower() for line in text.splitlines()):
+        constraints.breaks = sorted(breaks)
+    return constraints
+
+
+def load_preferences(path: str = PREFERENCE_PATH) -> SchedulingConstraints:
+    if not os.path.exists(path):
+        return SchedulingConstraints()
+    with open(path, 'r', encoding='utf-8') as f:
+        return parse_preferences(f.read())
+
+
+def format_constraints(constraints: SchedulingConstraints) -> str:
+    """One-line summary of the constraints, e.g. for a compact prompt."""
+    def window(interval: Interval) -> str:
+        return f"{_format_minutes(interval[0])}-{_format_minutes(interval[1])}"
+
+    parts = [f"work {window((constraints.work_start, constraints.work_end))}"]
+    if constraints.breaks:
+        parts.append("breaks " + ", ".join(window(b) for b in constraints.breaks))
+    parts.append(f"default {constraints.default_duration} min")
+    parts.append(f"buffer {constraints.buffer} min")
+    parts.append("weekends ok" if constraints.weekends else "no weekends")
+    if constraints.deep_work_window:
+        parts.append(f"deep work {window(constraints.deep_work_window)}")
+    if constraints.meeting_window:
+        parts.append(f"meetings {window(constraints.meeting_window)}")
+    if constraints.keep_friday_afternoon_free:
+        parts.append("Friday afternoons free")
+    return "; ".join(parts)
+
+
+def classify_task(item: dict) -> str:
+    """Return "deep_work", "meeting" or "other" from the task's name and description."""
+    text = f" {item.get('task', '')} {item.get('Description', '')} ".lower()
+    if any(word in text for word in _MEETING_WORDS):
+        return "meeting"
+    if any(word in text for word in _DEEP_WORK_WORDS):
+        return "deep_work"
+    return "other"
+
+
+def _subtract(intervals: List[Interval], block: Interval) -> List[Interval]:
+    start, end = block
+    result = []
+    for s, e in intervals:
+        if e <= start or s >= end:
+            result.append((s, e))
+            continue
+        if s < start:
+            result.append((s, start))
+        if e > end:
+            result.append((end, e))
+    return result
+
+
+def _parse_date(value) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(str(value).strip()[:10])
+    except ValueError:
+        return None
+
+
+def _duration(item: dict, default: int) -> int:
+    for key in ("duration_minutes", "duration"):
+        try:
+            minutes = int(float(item.get(key)))
+        except (TypeError, ValueError):
+            continue
+        if minutes > 0:
+            return minutes
+    return default
+
+
+class SlotScheduler:
+    """
+    Places prioritized tasks into free time, deterministically.
+
+    Free time per day is the work window minus breaks and busy intervals (busy
+    intervals are padded by the buffer). Days are built lazily and kept as short
+    sorted interval lists, so placing a task is a first-fit scan that stops at
+    the first day with room. Tasks are placed in priority order (1 first), then
+    by due date. Each task is tried in up to three passes, from strictest to
+    loosest:
+      1. its preferred window (deep work in the morning, meetings in the afternoon),
+      2. anywhere except Friday afternoon,
+      3. anywhere in working hours.
+    Urgent tasks skip the first pass. Tasks that do not fit before their due
+    date or the horizon are reported as unscheduled.
+
+    Args:
+        constraints: Parsed preferences.
+        busy: Existing (start, end) datetimes to keep free.
+        start: Earliest start; defaults to now.
+        horizon_days: Days after `start` that may be used.
+    """
+
+    def __init__(self, constraints: SchedulingConstraints, busy: Iterable[Tuple[datetime, datetime]] = (),
+                 start: Optional[datetime] = None, horizon_days: int = 28):
+        self.constraints = constraints
+        start = start or datetime.now()
+        # Round up to the next 5 minutes
+        minute = start.hour * 60 + start.minute + (1 if start.second or start.microsecond else 0)
+        self.start_day = start.date()
+        self.start_minute = -(-minute // 5) * 5
+        self.horizon_days = horizon_days
+        self._busy: Dict[date, List[Interval]] = {}
+        for busy_start, busy_end in busy:
+            self._add_busy(busy_start, busy_end)
+        self._free: Dict[date, List[Interval]] = {}
+        # Longest free interval per day index, so full days are skipped without a scan
+        self._longest: List[int] = []
+        # Days before this index have no free time left
+        self._first_open = 0
+
+    def _add_busy(self, busy_start: datetime, busy_end: datetime):
+        day = busy_start.date()
+        while day <= busy_end.date():
+            s = busy_start.hour * 60 + busy_start.minute if day == busy_start.date() else 0
+            e = busy_end.hour * 60 + busy_end.minute + bool(busy_end.second) if day == busy_end.date() else 24 * 60
+            if e > s:
+                self._busy.setdefault(day, []).append((s, e))
+            day += timedelta(days=1)
+
+    def _day(self, index: int) -> date:
+        return self.start_day + timedelta(days=index)
+
+    def _free_time(self, day: date) -> List[Interval]:
+        free = self._free.get(day)
+        if free is None:
+            c = self.constraints
+            free = [] if (day.weekday() >= 5 and not c.weekends) else [(c.work_start, c.work_end)]
+            for block in c.breaks:
+                free = _subtract(free, block)
+            for s, e in self._busy.get(day, []):
+                free = _subtract(free, (s - c.buffer, e + c.buffer))
+            if day == self.start_day:
+                free = _subtract(free, (0, self.start_minute))
+            self._free[day] = free
+        return free
+
+    def _limits(self, day: date, category: str, pass_number: int, urgent: bool) -> Interval:
+        c = self.constraints
+        low, high = 0, 24 * 60
+        if pass_number == 1 and not urgent:
+            window = {"deep_work": c.deep_work_window, "meeting": c.meeting_window}.get(category)
+            if window:
+                low, high = window
+        if pass_number <= 2 and c.keep_friday_afternoon_free and day.weekday() == 4:
+            high = min(high, AFTERNOON_START)
+        return low, high
+
+    def _longest_free(self, index: int) -> int:
+        while len(self._longest) <= index:
+            free = self._free_time(self._day(len(self._longest)))
+            self._longest.append(max((e - s for s, e in free), default=0))
+        return self._longest[index]
+
+    def _find(self, duration: int, last_day: int, category: str, pass_number: int, urgent: bool):
+        for index in range(self._first_open, last_day + 1):
+            if self._longest_free(index) < duration:
+                continue
+            day = self._day(index)
+            low, high = self._limits(day, category, pass_number, urgent)
+            for position, (s, e) in enumerate(self._free_time(day)):
+                begin = max(s, low)
+                if begin + duration <= min(e, high):
+                    return index, position, begin
+        return None
+
+    def _reserve(self, index: int, position: int, begin: int, duration: int):
+        day = self._day(index)
+        free = self._free[day]
+        s, e = free[position]
+        buffer = self.constraints.buffer
+        pieces = []
+        if begin - buffer > s:
+            pieces.append((s, begin - buffer))
+        if begin + duration + buffer < e:
+            pieces.append((begin + duration + buffer, e))
+        free[position:position + 1] = pieces
+        self._longest[index] = max((e - s for s, e in free), default=0)
+        while self._first_open < self.horizon_days and self._longest_free(self._first_open) == 0:
+            self._first_open += 1
+
+    def schedule(self, items: List[dict]) -> Tuple[List[dict], List[dict]]:
+        """
+        Assign `dateOnCalendar`, `start_time` and `end_time` to each item.
+
+        Returns (scheduled, unscheduled). Scheduled items are in calendar order;
+        unscheduled items carry an `unscheduled` reason.
+        """
+        def order(pair):
+            position, item = pair
+            try:
+                priority = int(item.get("priority"))
+            except (TypeError, ValueError):
+                priority = 1_000_000
+            due = _parse_date(item.get("DueDate")) or date.max
+            return priority, due, position
+
+        scheduled, unscheduled = [], []
+        for _, item in sorted(enumerate(items), key=order):
+            item = dict(item)
+            duration = _duration(item, self.constraints.default_duration)
+            due = _parse_date(item.get("DueDate"))
+            last_day = self.horizon_days - 1
+            if due is not None:
+                last_day = min(last_day, (due - self.start_day).days)
+            text = f"{item.get('task', '')} {item.get('Description', '')}".lower()
+            urgent = "urgent" in text or "asap" in text
+            category = classify_task(item)
+
+            slot = None
+            if last_day >= 0 and duration <= self.constraints.work_end - self.constraints.work_start:
+                for pass_number in (1, 2, 3):
+                    slot = self._find(duration, last_day, category, pass_number, urgent)
+                    if slot is not None:
+                        break
+            if slot is None:
+                item.update({"dateOnCalendar": "", "start_time": "", "end_time": ""})
+                item["unscheduled"] = "no free slot before the due date" if due else "no free slot in the planning horizon"
+                unscheduled.append(item)
+                continue
+
+            index, position, begin = slot
+            self._reserve(index, position, begin, duration)
+            item.update({
+                "dateOnCalendar": self._day(index).isoformat(),
+                "start_time": _format_minutes(begin),
+                "end_time": _format_minutes(begin + duration),
+            })
+            scheduled.append(item)
+
+        scheduled.sort(key=lambda item: (item["dateOnCalendar"], item["start_time"]))
+        return scheduled, unscheduled
+
+
+def schedule_plan(plan: str, busy: Iterable[Tuple[datetime, datetime]] = (), start: Optional[datetime] = None,
+                  constraints: Optional[SchedulingConstraints] = None,
+                  horizon_days: int = SCHEDULE_HORIZON_DAYS) -> str:
+    """
+    Place the crew's ranked roadmap on the calendar and return it as JSON.
+
+    The plan is returned unchanged if it isn't a JSON list of tasks. Unscheduled
+    tasks are appended after the scheduled ones with empty times.
+    """
+    try:
+        items = repair_json(plan)
+    except ValueError:
+        logger.warning("Plan is not valid JSON; returning it without scheduling")
+        return plan
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return plan
+
+    scheduler = SlotScheduler(constraints or load_preferences(), busy, start, horizon_days)
+    scheduled, unscheduled = scheduler.schedule(items)
+    return json.dumps(scheduled + unscheduled, ensure_ascii=False, indent=2)
@@ -0,0 +1,71 @@
+import os
+import threading
+from typing import Optional, Tuple
+
+from crewai import Crew
+
+from calender.crew import Calender, PREFERENCE_PATH
+from calender.llm_cache import attach_llm_cache
+
+
+class CrewTemplate:
+    """
+    Builds the Calender crew once per process and hands out cheap per-request copies.
+
+    Building a crew re-parses the YAML configs, re-reads the preference file and
+    resolves the agent's MCP references. The template does that work once and is
+    rebuilt only when one of the watched files changes (by mtime). Each request
+    gets a `Crew.copy()` whose `{topic}` placeholders are bound at kickoff.
+    """
+
+    def __init__(self, crew_class=Calender, preference_path: str = PREFERENCE_PATH):
+        self.crew_class = crew_class
+        base_dir = crew_class.base_directory
+        self.watched_paths = (
+            str(base_dir / crew_class.original_agents_config_path),
+            str(base_dir / crew_class.original_tasks_config_path),
+            preference_path,
+        )
+        self._lock = threading.Lock()
+        self._template: Optional[Crew] = None
+        self._signature: Optional[Tuple] = None
+
+    def _current_signature(self) -> Tuple:
+        signature = []
+        for path in self.watched_paths:
+            try:
+                signature.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _build(self) -> Crew:
+        template = self.crew_class().crew()
+        for agent in template.agents:
+            # Agent.copy() drops `mcps`, so resolve them once into plain tools
+            # that every copy shares.
+            if agent.mcps:
+                agent.tools = list(agent.tools or []) + agent.get_mcp_tools(agent.mcps)
+                agent.mcps = None
+        return template
+
+    def template(self) -> Crew:
+        """Return the shared template crew, rebuilding it if a watched file changed."""
+        signature = self._current_signature()
+        with self._lock:
+            if self._template is None or signature != self._signature:
+                self._template = attach_llm_cache(self._build())
+                self._signature = signature
+            return self._template
+
+    def crew(self) -> Crew:
+        """Return a fresh crew for a single request."""
+        return self.template().copy()
+
+    def invalidate(self):
+        with self._lock:
+            self._template = None
+            self._signature = None
+
+
+crew_template = CrewTemplate()
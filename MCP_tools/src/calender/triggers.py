@@ -0,0 +1,245 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, Optional, Tuple
+
+from calender.cancellation import CancelToken, RunCancelled
+
+# Output orders: "input" writes results in the order of the payloads, "id" as soon as each finishes
+ORDERS = ("input", "id")
+
+# Payloads read ahead of the runs in progress, per unit of concurrency; bounds memory on large feeds
+READ_AHEAD = 4
+
+
+def read_payloads(lines: Iterable[str]) -> Iterator[Tuple[int, Any, Optional[str]]]:
+    """Yield (index, payload, error) for each non-blank JSONL line; `error` is set when a line isn't JSON."""
+    index = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield index, json.loads(line), None
+        except json.JSONDecodeError as e:
+            yield index, None, f"Invalid JSON payload: {e}"
+        index += 1
+
+
+def trigger_key(index: int, payload: Any, id_field: str = "id") -> str:
+    """The payload's own id when it has one, otherwise its position in the input."""
+    if isinstance(payload, dict) and payload.get(id_field) not in (None, ""):
+        return str(payload[id_field])
+    return f"#{index + 1}"
+
+
+def payload_digest(payload: Any) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+class Checkpoint:
+    """
+    Append-only JSONL journal of the payloads that finished successfully.
+
+    Runs finishing at the same time add to it from their own threads. Each result is flushed as soon as its run ends, so after a crash a rerun with the same
+    checkpoint skips those payloads and only runs the rest. A journaled result is reused only
+    if the payload with that key is unchanged (by digest). Failed payloads are not journaled
+    and run again on the next attempt.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line cut short by the crash
+                        continue
+                    self.done[record["id"]] = record
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def get(self, key: str, digest: str) -> Optional[Dict[str, Any]]:
+        record = self.done.get(key)
+        return record if record is not None and record.get("digest") == digest else None
+
+    def add(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self, remove: bool = False):
+        with self._lock:
+            self._file.close()
+        if remove:
+            os.remove(self.path)
+
+
+def run_triggers(
+    lines: Iterable[str],
+    run_payload: Callable[..., str],
+    output: IO[str],
+    max_concurrency: int = 2,
+    order: str = "input",
+    id_field: str = "id",
+    checkpoint: Optional[Checkpoint] = None,
+    cancel: Optional[CancelToken] = None,
+) -> Dict[str, Any]:
+    """
+    Run the crew for every JSONL trigger payload in `lines` and write one JSONL result per payload.
+
+    Payloads are read lazily and run `max_concurrency` at a time, so a feed of any size needs
+    memory only for the runs in progress and the results waiting for their turn. Reading pauses
+    while those reach the read-ahead window, so one slow payload in "input" order cannot make
+    the results held behind it grow without bound.
+
+    Args:
+        lines: JSONL trigger payloads, e.g. an open file or sys.stdin.
+        run_payload: Called as `run_payload(payload, cancel=...)`; returns the result text.
+        output: Where results are written, one JSON object per line with the payload's
+            `id` and `index`, its `status` ("success", "error" or "cancelled"), and `result` or `error`.
+        max_concurrency: Crew runs allowed at the same time.
+        order: "input" writes results in payload order; "id" writes each as soon as it finishes.
+        id_field: Payload field that identifies it; payloads without one are keyed by position.
+        checkpoint: Optional journal; payloads it already holds are written from it without a run.
+        cancel: Optional token; once cancelled, runs stop early and the rest are not started.
+
+    Returns:
+        Counts of payloads, successes, failures and payloads resumed from the checkpoint.
+    """
+    if order not in ORDERS:
+        raise ValueError(f"order must be one of {', '.join(ORDERS)}, not {order!r}")
+    start = time.perf_counter()
+    counts = {"total": 0, "succeeded": 0, "failed": 0, "resumed": 0}
+    held: Dict[int, Dict[str, Any]] = {}
+    next_index = 0
+
+    def write(record):
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        output.flush()
+
+    def deliver(record):
+        nonlocal next_index
+        counts["succeeded" if record["status"] == "success" else "failed"] += 1
+        if order == "id":
+            write(record)
+            return
+        # Results that finish early wait here until every payload before them is written
+        held[record["index"]] = record
+        while next_index in held:
+            write(held.pop(next_index))
+            next_index += 1
+
+    def execute(index, key, digest, payload):
+        started = time.perf_counter()
+        record: Dict[str, Any] = {"id": key, "index": index}
+        try:
+            record["result"] = run_payload(payload, cancel=cancel)
+            record["status"] = "success"
+        except RunCancelled as e:
+            record.update(status="cancelled", error=str(e))
+        except Exception as e:
+            record.update(status="error", error=str(e))
+        record["duration"] = round(time.perf_counter() - started, 3)
+        if record["status"] == "success" and checkpoint is not None:
+            checkpoint.add(dict(record, digest=digest))
+        return record
+
+    window = max(1, max_concurrency) * READ_AHEAD
+    pending = set()
+
+    def settle(limit):
+        # Results held for "input" order count too: they wait on a run that is still pending
+        nonlocal pending
+        while pending and len(pending) + len(held) >= limit:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                deliver(future.result())
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="trigger") as executor:
+        try:
+            for index, payload, error in read_payloads(lines):
+                settle(window)
+                counts["total"] += 1
+                key = trigger_key(index, payload, id_field)
+                if error is not None:
+                    deliver({"id": key, "index": index, "status": "error", "error": error})
+                    continue
+                digest = payload_digest(payload)
+                done = checkpoint.get(key, digest) if checkpoint is not None else None
+                if done is not None:
+                    counts["resumed"] += 1
+                    record = {name: value for name, value in done.items() if name != "digest"}
+                    deliver(dict(record, index=index))
+                    continue
+                pending.add(executor.submit(execute, index, key, digest, payload))
+            settle(1)
+        except BaseException:
+            # Interrupted: stop the runs in progress; what finished is already in the checkpoint
+            if cancel is not None:
+                cancel.cancel("interrupted")
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    counts["elapsed"] = round(time.perf_counter() - start, 3)
+    return counts
+
+
+def _run_payload(payload, cancel=None) -> str:
+    from calender.main import run_trigger
+    from calender.plan_model import plan_to_json
+    return plan_to_json(run_trigger(payload, cancel=cancel))
+
+
+def main(argv=None):
+    """Entry point of `run_triggers`: stream JSONL trigger payloads through one warm crew."""
+    parser = argparse.ArgumentParser(
+        description="Run the crew for every JSONL trigger payload, writing one JSONL result per payload.")
+    parser.add_argument("input", nargs="?", default="-", help="JSONL file of trigger payloads ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL results file ('-' for stdout)")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("TRIGGER_CONCURRENCY", 2)))
+    parser.add_argument("--order", choices=ORDERS, default="input",
+                        help="'input' keeps payload order; 'id' writes each result as soon as it finishes")
+    parser.add_argument("--id-field", default="id", help="Payload field identifying it (default 'id')")
+    parser.add_argument("--checkpoint", default=None,
+                        help="Journal of finished payloads (default <output>.checkpoint when writing to a file)")
+    args = parser.parse_args(argv)
+
+    checkpoint_path = args.checkpoint or (f"{args.output}.checkpoint" if args.output != "-" else None)
+    checkpoint = Checkpoint(checkpoint_path) if checkpoint_path else None
+    if checkpoint is not None and checkpoint.done:
+        print(f"Resuming: {len(checkpoint.done)} payload(s) already finished in {checkpoint_path}", file=sys.stderr)
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    # Crews print their progress; keep stdout for the results
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    real_stdout, sys.stdout = sys.stdout, sys.stderr
+    summary = None
+    try:
+        summary = run_triggers(source, _run_payload, output, args.concurrency, args.order, args.id_field,
+                               checkpoint, CancelToken())
+    finally:
+        sys.stdout = real_stdout
+        if source is not sys.stdin:
+            source.close()
+        if output is not real_stdout:
+            output.close()
+        if checkpoint is not None:
+            # Kept while any payload failed, so a rerun only retries those
+            checkpoint.close(remove=summary is not None and summary["failed"] == 0)
+
+    print(json.dumps(summary), file=sys.stderr)
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
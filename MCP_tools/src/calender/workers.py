@@ -0,0 +1,295 @@
+import os
+import sys
+import time
+import queue
+import atexit
+import logging
+import threading
+import importlib
+import multiprocessing
+from typing import Callable, List, Optional
+
+from calender.cancellation import CancelToken, RunCancelled, stopped
+from calender.metrics import METRICS_ENABLED, record_worker_restart, registry
+
+logger = logging.getLogger("calender.workers")
+
+# Crew worker processes; 0 runs crews on threads of the calling process
+CREW_WORKERS = int(os.getenv("CREW_WORKERS", 0))
+# A worker is replaced after this many crew runs (0 = never) ...
+WORKER_MAX_JOBS = int(os.getenv("WORKER_MAX_JOBS", 100))
+# ... or once its resident memory exceeds this many MB after a run (0 = no limit)
+WORKER_MAX_RSS_MB = float(os.getenv("WORKER_MAX_RSS_MB", 1024))
+# "module:function" called in each worker before the crew template is built, e.g. to install test fakes
+WORKER_INIT = os.getenv("CREW_WORKER_INIT", "")
+
+# How often a caller waiting on a worker looks at its cancel token
+CANCEL_POLL_SECONDS = 0.1
+
+
+def _rss_mb() -> Optional[float]:
+    """Current resident set size of this process (Linux), or its peak elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+class _EventToken(CancelToken):
+    """Worker-side token, cancelled by the parent through a shared event."""
+
+    def __init__(self, event):
+        super().__init__()
+        self._event = event
+
+    @property
+    def reason(self) -> Optional[str]:
+        if self._reason is None and self._event.is_set():
+            self.cancel("cancelled by the caller")
+        return self._reason
+
+
+def _worker_main(conn, cancel_event, init: str):
+    """Entry point of a worker process: warm up once, then plan topics until told to stop."""
+    # Crews print; keep the parent's stdout (the MCP JSON-RPC stream in stdio mode) clean
+    sys.stdout = sys.stderr
+    if init:
+        module, _, function = init.partition(":")
+        getattr(importlib.import_module(module), function)()
+
+    from calender.main import run
+    from calender.plan_model import plan_to_json
+    from calender.template import crew_template
+
+    crew_template.template()
+    conn.send(("ready", os.getpid()))
+
+    while (request := conn.recv()) is not None:
+        topic, wants_events = request
+        token = _EventToken(cancel_event)
+        before = registry.snapshot() if METRICS_ENABLED else None
+
+        def on_event(event):
+            conn.send(("event", event))
+            # The parent handles the event (e.g. waits on a batch's LLM rate limit) before the run goes on
+            conn.recv()
+
+        try:
+            message = ("done", plan_to_json(run(topic, on_event if wants_events else None, token)))
+        except RunCancelled as e:
+            message = ("cancelled", str(e))
+        except Exception as e:
+            message = ("error", str(e))
+        # What this run recorded (LLM calls and tokens, crew phases, cache lookups), merged by the parent
+        metrics = registry.delta_since(before) if METRICS_ENABLED else []
+        conn.send(message + (metrics, _rss_mb()))
+    conn.close()
+
+
+class _Worker:
+    def __init__(self, context, init: str):
+        self.conn, child_conn = context.Pipe()
+        self.cancel_event = context.Event()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, self.cancel_event, init), name="crew-worker", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def wait_ready(self, timeout: float) -> bool:
+        try:
+            return self.conn.poll(timeout) and self.conn.recv()[0] == "ready"
+        except (EOFError, OSError):
+            return False
+
+    def stop(self, timeout: float = 5.0):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
+        self.conn.close()
+
+
+class WorkerPool:
+    """
+    Long-lived processes that import crewai and build the crew template once, then plan one topic at a time.
+
+    Crew runs hold the GIL while they assemble prompts and parse replies, so threads of one
+    process do not scale across cores. Each worker is a separate interpreter; callers block in
+    their own thread while a worker runs their topic, receive its progress events and the metrics
+    it recorded, and can stop it through a CancelToken. The worker waits for the caller's `on_event`
+    to return before going on, so a callback that blocks (a batch's LLM rate limit) paces the run.
+    A worker is replaced after `max_jobs` runs or when its memory grows past `max_rss_mb`,
+    and immediately if it dies.
+
+    Args:
+        size: Number of worker processes.
+        max_jobs: Runs before a worker is replaced (0 = never).
+        max_rss_mb: Resident memory in MB above which a worker is replaced after its run (0 = no limit).
+        init: Optional "module:function" each worker calls before building the crew template.
+        ready_timeout: Seconds a new worker may take to import crewai and build the template.
+    """
+
+    def __init__(self, size: int, max_jobs: int = WORKER_MAX_JOBS, max_rss_mb: float = WORKER_MAX_RSS_MB,
+                 init: str = WORKER_INIT, ready_timeout: float = 120.0):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.init = init
+        self.ready_timeout = ready_timeout
+        # Spawned, not forked: the parent has threads (event loop, pools) that must not be copied mid-state
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._started = False
+        self._closed = False
+        self._boot_failed = False
+        self.restarts = 0
+
+    def start(self):
+        """Spawn the workers in the background; `plan` waits for the first one to be ready."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        atexit.register(self.shutdown)
+        for _ in range(self.size):
+            self._spawn()
+
+    def _spawn(self):
+        def boot():
+            worker = _Worker(self._context, self.init)
+            with self._lock:
+                self._workers.append(worker)
+                closed = self._closed
+            if closed:
+                worker.stop()
+            elif worker.wait_ready(self.ready_timeout):
+                self._idle.put(worker)
+            else:
+                # Not respawned: a worker that cannot start would fail the same way again
+                logger.error("Crew worker failed to start")
+                with self._lock:
+                    self._workers.remove(worker)
+                    self._boot_failed = True
+                worker.stop()
+
+        threading.Thread(target=boot, name="crew-worker-boot", daemon=True).start()
+
+    def _retire(self, worker: _Worker, reason: str):
+        """Replace `worker` in the background so the caller that used it returns at once."""
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+            closed = self._closed
+        record_worker_restart(reason)
+        self.restarts += 1
+        threading.Thread(target=worker.stop, name="crew-worker-stop", daemon=True).start()
+        if not closed:
+            self._spawn()
+
+    def _acquire(self, cancel: Optional[CancelToken]) -> _Worker:
+        while True:
+            if cancel is not None and cancel.cancelled:
+                raise stopped(cancel, "queued")
+            if self._closed:
+                raise RuntimeError("The crew worker pool is shut down")
+            if self._boot_failed and not self._workers:
+                raise RuntimeError("No crew worker could be started; see the log for the worker's error")
+            try:
+                return self._idle.get(timeout=CANCEL_POLL_SECONDS)
+            except queue.Empty:
+                continue
+
+    def plan(self, topic: str, on_event: Optional[Callable] = None, cancel: Optional[CancelToken] = None) -> str:
+        """
+        Plan `topic` on the next free worker and return the roadmap JSON (see calender.main.plan_cached).
+        Blocks the calling thread; raises RunCancelled when `cancel` stops the run.
+        """
+        self.start()
+        worker = self._acquire(cancel)
+        worker.cancel_event.clear()
+        callback_error = None
+        try:
+            worker.conn.send((topic, on_event is not None))
+            while True:
+                if not worker.conn.poll(CANCEL_POLL_SECONDS):
+                    if cancel is not None and cancel.cancelled:
+                        # The worker stops at its next LLM or tool call
+                        worker.cancel_event.set()
+                    continue
+                kind, payload, *rest = worker.conn.recv()
+                if kind != "event":
+                    break
+                # The worker waits for this reply, so on_event runs before its next LLM call, as it does in-process
+                try:
+                    if callback_error is None:
+                        on_event(payload)
+                except Exception as e:
+                    # Stop the run, but let the worker finish it so it goes back to the pool
+                    callback_error = e
+                    worker.cancel_event.set()
+                finally:
+                    if cancel is not None and cancel.cancelled:
+                        worker.cancel_event.set()
+                    worker.conn.send(None)
+        except (EOFError, OSError) as e:
+            self._retire(worker, "crashed")
+            raise Exception(f"Crew worker exited during the run: {e!r}")
+
+        metrics, rss = rest
+        registry.merge(metrics)
+        worker.jobs += 1
+        if self.max_jobs and worker.jobs >= self.max_jobs:
+            self._retire(worker, "max_jobs")
+        elif self.max_rss_mb and rss is not None and rss > self.max_rss_mb:
+            self._retire(worker, "rss")
+        else:
+            self._idle.put(worker)
+
+        if callback_error is not None:
+            raise callback_error
+        if kind == "done":
+            return payload
+        if kind == "cancelled" and cancel is not None:
+            # Already counted by the worker, whose metrics were merged above
+            raise cancel.error()
+        raise Exception(payload)
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until every worker has warmed up (for benchmarks and startup probes)."""
+        self.start()
+        deadline = time.monotonic() + (timeout if timeout is not None else self.ready_timeout)
+        while self._idle.qsize() < self.size:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+            self._workers = []
+        for worker in workers:
+            worker.stop()
+
+    def pids(self) -> List[int]:
+        with self._lock:
+            return [worker.process.pid for worker in self._workers if worker.process.pid is not None]
+
+
+# Shared by the API and the MCP server; None when crews run in-process
+crew_workers: Optional[WorkerPool] = WorkerPool(CREW_WORKERS) if CREW_WORKERS > 0 else None
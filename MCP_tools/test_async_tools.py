@@ -0,0 +1,51 @@
+import time
+import asyncio
+
+from fastmcp import Client
+
+import mcp_server
+from test_http_tools import _start_stub
+
+
+def test_slow_planner_does_not_delay_fast_tools():
+    server = _start_stub()
+    original = mcp_server.run_cached
+
+    def slow_planner(topic, on_event=None, cancel=None):
+        time.sleep(1.5)
+        return f"plan for {topic}"
+
+    async def timed(coro):
+        start = time.perf_counter()
+        result = await coro
+        return result, time.perf_counter() - start
+
+    async def scenario():
+        async with Client(mcp_server.mcp) as client:
+            # Baseline latency of the fast tool on its own
+            await client.call_tool("get_weather", {"latitude": 10.0, "longitude": 10.0})
+            _, baseline = await timed(client.call_tool("get_weather", {"latitude": 10.0, "longitude": 10.0}))
+
+            planner = asyncio.create_task(timed(client.call_tool("task_and_schedule_planer", {"topic": "slow"})))
+            await asyncio.sleep(0.2)
+            _, fast_latency = await timed(client.call_tool("get_weather", {"latitude": 20.0, "longitude": 20.0}))
+            planner_result, planner_latency = await planner
+            return baseline, fast_latency, planner_result, planner_latency
+
+    mcp_server.run_cached = slow_planner
+    try:
+        baseline, fast_latency, planner_result, planner_latency = asyncio.run(scenario())
+    finally:
+        mcp_server.run_cached = original
+        server.shutdown()
+
+    assert planner_result.data == "plan for slow"
+    assert planner_latency >= 1.5
+    # The fast tool finishes while the planner is still running
+    assert fast_latency < 0.5, f"get_weather took {fast_latency:.3f}s during a crew run (baseline {baseline:.3f}s)"
+    print(f"get_weather: baseline {baseline * 1000:.1f} ms, during crew run {fast_latency * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    test_slow_planner_does_not_delay_fast_tools()
+    print("All async tool tests passed.")
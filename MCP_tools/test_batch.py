@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+from fastapi.testclient import TestClient
+from fastmcp import Client
+
+import api
+import mcp_server
+from calender.batch import RateLimiter, run_batch
+
+
+def _fake_run(topic, on_event=None, busy=(), cancel=None):
+    if on_event is not None:
+        on_event({"event": "crew_started"})
+    time.sleep(0.2)
+    if "broken" in topic:
+        raise Exception("An error occurred while running the crew: boom")
+    return f"plan for {topic}"
+
+
+def test_run_batch_reports_failures_per_item():
+    topics = [f"Module {i}" for i in range(5)] + ["broken module"]
+    items = list(run_batch(topics, _fake_run, max_concurrency=3))
+    summary = items.pop()
+
+    assert summary["summary"] and summary["total"] == 6
+    assert summary["succeeded"] == 5 and summary["failed"] == 1
+    by_topic = {item["topic"]: item for item in items}
+    assert by_topic["Module 3"]["result"] == "plan for Module 3"
+    assert by_topic["broken module"]["status"] == "error"
+    assert "boom" in by_topic["broken module"]["error"]
+    # Six 0.2 s runs, three at a time
+    assert summary["elapsed"] < 0.7
+    assert summary["speedup"] > 2
+
+
+def test_batch_on_a_shared_pool_respects_its_size():
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def run(topic, on_event=None, cancel=None):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return topic
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        # Another caller's run holds one of the two threads
+        other = pool.submit(time.sleep, 0.5)
+        items = list(run_batch([f"T{i}" for i in range(4)], run, max_concurrency=3, executor=pool))
+        other.result()
+    assert items.pop()["succeeded"] == 4
+    assert peak[0] == 1
+
+    peak[0] = 0
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(run_batch([f"T{i}" for i in range(6)], run, max_concurrency=2, executor=pool))
+    assert peak[0] == 2
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = RateLimiter(per_minute=600)  # one call every 0.1 s
+    start = time.monotonic()
+    for _ in range(4):
+        limiter.acquire()
+    assert time.monotonic() - start >= 0.3
+
+
+def test_batch_endpoint_returns_results_in_order():
+    original = api.run_cached
+    api.run_cached = _fake_run
+    try:
+        client = TestClient(api.app)
+        response = client.post("/run/batch", json={"topics": ["A", "broken B", "C"], "max_concurrency": 3})
+        with client.stream("POST", "/run/batch", json={"topics": ["A", "C"], "stream": True}) as stream:
+            body = "".join(stream.iter_text())
+    finally:
+        api.run_cached = original
+
+    data = response.json()
+    assert [item["topic"] for item in data["results"]] == ["A", "broken B", "C"]
+    assert [item["status"] for item in data["results"]] == ["success", "error", "success"]
+    assert data["summary"]["failed"] == 1
+
+    events = [line[len("event: "):] for line in body.splitlines() if line.startswith("event: ")]
+    assert events == ["accepted", "item", "item", "batch_finished"]
+
+
+def test_batch_endpoint_stops_at_its_deadline():
+    def slow_run(topic, on_event=None, busy=(), cancel=None):
+        if cancel is not None:
+            cancel.check()
+        time.sleep(0.3)
+        return f"plan for {topic}"
+
+    original = api.run_cached
+    api.run_cached = slow_run
+    try:
+        client = TestClient(api.app)
+        response = client.post("/run/batch", json={"topics": ["A", "B", "C", "D"], "max_concurrency": 1,
+                                                   "deadline_seconds": 0.5})
+    finally:
+        api.run_cached = original
+
+    data = response.json()
+    assert [item["status"] for item in data["results"]] == ["success", "success", "cancelled", "cancelled"]
+    assert data["summary"]["failed"] == 2
+
+
+def test_plan_batch_tool():
+    original = mcp_server.run_cached
+    progress = []
+
+    async def on_progress(done, total, message):
+        progress.append((done, total))
+
+    async def scenario():
+        async with Client(mcp_server.mcp) as client:
+            return await client.call_tool("plan_batch", {"topics": ["A", "broken B"]}, progress_handler=on_progress)
+
+    mcp_server.run_cached = _fake_run
+    try:
+        result = json.loads(asyncio.run(scenario()).data)
+    finally:
+        mcp_server.run_cached = original
+
+    assert [item["status"] for item in result["results"]] == ["success", "error"]
+    assert result["summary"]["total"] == 2
+    assert progress == [(1, 2), (2, 2)]
+
+
+if __name__ == "__main__":
+    test_run_batch_reports_failures_per_item()
+    test_batch_on_a_shared_pool_respects_its_size()
+    test_rate_limiter_spaces_calls()
+    test_batch_endpoint_returns_results_in_order()
+    test_plan_batch_tool()
+    print("All batch tests passed.")
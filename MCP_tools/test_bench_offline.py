@@ -0,0 +1,34 @@
+import os
+import sys
+import json
+import subprocess
+
+from bench_offline import latency_stats
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_latency_stats_uses_nearest_rank_percentiles():
+    stats = latency_stats([i / 1000 for i in range(1, 101)], errors=2, elapsed=2.0)
+    assert (stats["p50_ms"], stats["p95_ms"], stats["p99_ms"]) == (50.0, 95.0, 99.0)
+    assert stats["requests"] == 102
+    assert stats["throughput_rps"] == 50.0
+    assert latency_stats([], errors=3, elapsed=1.0)["p95_ms"] is None
+
+
+def test_asgi_scenario_runs_offline(tmp_path):
+    output = tmp_path / "bench.json"
+    # Unroutable proxy: any real network call would fail the run
+    env = {**os.environ, "OFFLINE_LLM_LATENCY": "0", "HTTPS_PROXY": "http://127.0.0.1:9", "OPENAI_API_KEY": "sk-offline"}
+    proc = subprocess.run(
+        [sys.executable, "bench_offline.py", "--scenarios", "asgi", "--requests", "4", "--concurrency", "2",
+         "--output", str(output)],
+        cwd=_SCRIPT_DIR, env=env, capture_output=True, text=True, timeout=300,
+    )
+    assert proc.returncode == 0, proc.stderr
+    report = json.loads(output.read_text())
+    workloads = report["scenarios"]["asgi"]["workloads"]
+    assert set(workloads) == {"health", "plan_cold", "plan_cached"}
+    assert all(stats["errors"] == 0 for stats in workloads.values())
+    assert report["scenarios"]["asgi"]["peak_rss_mb"] > 0
+    assert report["config"]["OFFLINE_LLM_LATENCY"] == "0"
@@ -0,0 +1,169 @@
+import os
+import sys
+import time
+import threading
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+os.environ.setdefault("CREWAI_TESTING", "true")
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+
+from calender import cancellation
+from calender.cancellation import CANCELLED, DEADLINE, CancelToken, RunCancelled, attach_cancellation
+from calender.metrics import CANCELLED_CALLS, CREW_RUNS_CANCELLED
+from calender.plan_cache import PlanCache
+from offline_stubs import _fake_llm_class
+
+
+def test_token_reports_cancel_and_deadline():
+    token = CancelToken()
+    assert not token.cancelled
+    token.cancel("client disconnected")
+    with pytest.raises(RunCancelled, match="client disconnected") as info:
+        token.check()
+    assert info.value.reason == CANCELLED
+
+    token = CancelToken(timeout=0.05)
+    assert not token.cancelled
+    time.sleep(0.06)
+    assert token.reason == DEADLINE
+    # CrewAI does not retry TimeoutErrors
+    assert isinstance(token.error(), TimeoutError)
+
+
+def _crew(llm):
+    from crewai import Agent, Crew, Task
+
+    agent = Agent(role="Planner", goal="Plan {topic}", backstory="Plans things.", llm=llm)
+    task = Task(description="Plan {topic}", expected_output="A roadmap", agent=agent)
+    return Crew(agents=[agent], tasks=[task])
+
+
+def test_cancelled_crew_makes_no_llm_calls():
+    calls = []
+    FakeLLM = _fake_llm_class()
+
+    class CountingLLM(FakeLLM):
+        def call(self, *args, **kwargs):
+            calls.append(1)
+            return super().call(*args, **kwargs)
+
+    crew = _crew(CountingLLM(latency=0))
+    token = CancelToken()
+    guard = attach_cancellation(crew, token)
+    token.cancel()
+    skipped = CANCELLED_CALLS.value(kind="llm")
+    try:
+        with pytest.raises(Exception):
+            crew.kickoff(inputs={"topic": "cancelled topic"})
+    finally:
+        guard.close()
+    assert calls == []
+    assert CANCELLED_CALLS.value(kind="llm") > skipped
+    assert cancellation._tokens == {}
+
+    # Without a cancelled token the same crew runs normally
+    assert "Step 1: Plan next topic" in str(_crew(CountingLLM(latency=0)).kickoff(inputs={"topic": "next topic"}))
+    assert calls == [1]
+
+
+def test_queued_run_is_skipped():
+    from calender.main import run
+
+    token = CancelToken()
+    token.cancel()
+    before = CREW_RUNS_CANCELLED.value(reason=CANCELLED, phase="queued")
+    with pytest.raises(RunCancelled):
+        run("never planned", cancel=token)
+    assert CREW_RUNS_CANCELLED.value(reason=CANCELLED, phase="queued") == before + 1
+
+
+def test_waiters_retry_when_the_leader_is_cancelled(tmp_path):
+    cache = PlanCache(preference_path=str(tmp_path / "missing.md"))
+    started = threading.Event()
+    release = threading.Event()
+
+    def cancelled_run(topic):
+        started.set()
+        release.wait(5)
+        raise RunCancelled(CANCELLED)
+
+    def leader():
+        with pytest.raises(RunCancelled):
+            cache.get_or_compute("topic", cancelled_run)
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    started.wait(5)
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(cache.get_or_compute("topic", lambda topic: "plan")))
+    waiter.start()
+    time.sleep(0.1)
+    release.set()
+    thread.join(5)
+    waiter.join(5)
+    assert results == ["plan"]
+
+
+def test_waiter_stops_at_its_own_deadline(tmp_path):
+    cache = PlanCache(preference_path=str(tmp_path / "missing.md"))
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_run(topic):
+        started.set()
+        release.wait(5)
+        return "plan"
+
+    leader = threading.Thread(target=cache.get_or_compute, args=("topic", slow_run))
+    leader.start()
+    started.wait(5)
+    before = CREW_RUNS_CANCELLED.value(reason=DEADLINE, phase="queued")
+    start = time.perf_counter()
+    try:
+        with pytest.raises(RunCancelled) as info:
+            cache.get_or_compute("topic", slow_run, CancelToken(0.2))
+        # Not held until the leader finishes
+        assert info.value.reason == DEADLINE and time.perf_counter() - start < 1
+        assert CREW_RUNS_CANCELLED.value(reason=DEADLINE, phase="queued") == before + 1
+    finally:
+        release.set()
+        leader.join(5)
+
+
+def test_mcp_cancel_notification_cancels_the_run():
+    import asyncio
+    import mcp.types as mt
+    from fastmcp import Client
+    import mcp_server
+
+    seen = {}
+
+    def slow_planner(topic, on_event=None, cancel=None):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if cancel.cancelled:
+                seen["reason"] = cancel.reason
+                return "stopped"
+            time.sleep(0.05)
+        return "finished"
+
+    async def scenario():
+        async with Client(mcp_server.mcp) as client:
+            call = asyncio.create_task(client.call_tool("task_and_schedule_planer", {"topic": "cancel me"}))
+            await asyncio.sleep(0.3)
+            # The call is the session's first request after initialize
+            await client.session.send_notification(mt.ClientNotification(mt.CancelledNotification(
+                method="notifications/cancelled", params=mt.CancelledNotificationParams(requestId=1))))
+            await asyncio.sleep(0.5)
+            call.cancel()
+
+    original = mcp_server.run_cached
+    mcp_server.run_cached = slow_planner
+    try:
+        asyncio.run(scenario())
+    finally:
+        mcp_server.run_cached = original
+    assert seen == {"reason": CANCELLED}
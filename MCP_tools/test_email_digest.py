@@ -0,0 +1,106 @@
+import os
+import sys
+import json
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+from calender.email_digest import filter_emails, pack_batches, plan_emails, tag_items
+
+
+def _email(id, sender="Alice <alice@example.com>", subject="Review the Q3 budget", snippet="Please review by Friday."):
+    return {"id": id, "from": sender, "subject": subject, "date": "Mon, 6 Oct 2025 09:00:00 +0000",
+            "snippet": snippet}
+
+
+def test_newsletters_and_duplicates_are_skipped():
+    emails = [
+        _email("1"),
+        _email("2", sender="Deals <deals@shop.example>", subject="New arrivals"),
+        _email("3", sender="Bob <bob@example.com>", subject="Our weekly roundup"),
+        _email("4", sender="Carol <carol@example.com>", subject="Lunch?", snippet="Click to unsubscribe"),
+        _email("5", subject="RE: Fwd: review the Q3  budget"),
+        _email("6", sender="Bob <bob@example.com>", subject="Sign the contract"),
+    ]
+    skipped = []
+    kept = list(filter_emails(emails, skipped))
+    assert [email["id"] for email in kept] == ["1", "6"]
+    assert [(item["id"], item["reason"]) for item in skipped] == [
+        ("2", "bulk sender"), ("3", "bulk subject"), ("4", "unsubscribe footer"), ("5", "duplicate")]
+
+
+def test_batches_respect_token_and_email_limits():
+    emails = [_email(str(i), subject=f"Task {i}") for i in range(10)]
+    assert [len(batch) for batch in pack_batches(emails, max_tokens=10_000, max_emails=4)] == [4, 4, 2]
+    assert [len(batch) for batch in pack_batches(emails, max_tokens=1, max_emails=7)] == [1] * 10
+
+
+def test_items_are_tagged_with_their_source_email():
+    batch = [_email("a1"), _email("b2", subject="Sign the contract")]
+    plan = json.dumps([{"title": "Review budget", "source_id": "[a1]"},
+                       {"title": "Sign contract", "source_id": "b2"},
+                       {"title": "Unknown", "source_id": "zz"}])
+    items = tag_items(plan, batch)
+    assert [(item["source_id"], item["source_subject"]) for item in items] == [
+        ("a1", "Review the Q3 budget"), ("b2", "Sign the contract"), ("", "")]
+    # A single-email batch needs no id from the planner
+    assert tag_items(json.dumps([{"title": "Review budget"}]), batch[:1])[0]["source_id"] == "a1"
+
+
+def test_many_emails_take_one_planner_run_per_batch():
+    emails = [_email(str(i), subject=f"Task {i}") for i in range(12)] + [
+        _email("news", sender="newsletter@example.com", subject="October news")]
+    topics = []
+    lock = threading.Lock()
+
+    def plan_topic(topic, on_event=None, cancel=None):
+        with lock:
+            topics.append(topic)
+        ids = [line[1:line.index("]")] for line in topic.splitlines() if line.startswith("[")]
+        return json.dumps([{"title": f"Reply to {id}", "description": "", "duration": 30, "source_id": id}
+                           for id in ids])
+
+    finished = []
+    digest = plan_emails(emails, plan_topic, max_emails=5, on_batch=finished.append)
+    assert len(topics) == digest["batches"] == len(finished) == 3
+    assert digest["emails"] == 13 and digest["planned_emails"] == 12
+    assert [item["id"] for item in digest["skipped"]] == ["news"]
+    assert digest["errors"] == []
+    assert sorted(task["source_id"] for task in digest["tasks"]) == sorted(str(i) for i in range(12))
+    assert all(task["dateOnCalendar"] for task in digest["tasks"])
+
+
+def test_plan_from_emails_tool():
+    import asyncio
+    from fastmcp import Client
+    import mcp_server
+
+    emails = [_email(str(i), subject=f"Task {i}") for i in range(3)]
+    progress = []
+
+    async def on_progress(done, total, message):
+        progress.append(message)
+
+    async def scenario():
+        async with Client(mcp_server.mcp) as client:
+            return await client.call_tool("plan_from_emails", {"max_results": 3}, progress_handler=on_progress)
+
+    threads = []
+
+    def plan_topic(topic, on_event=None, cancel=None):
+        threads.append(threading.current_thread().name)
+        return json.dumps([{"title": "Reply", "description": "", "duration": 30, "source_id": "1"}])
+
+    original = mcp_server._search_emails, mcp_server.plan_topic
+    mcp_server._search_emails = lambda query, max_results, user_id: emails
+    mcp_server.plan_topic = plan_topic
+    try:
+        digest = json.loads(asyncio.run(scenario()).data)
+    finally:
+        mcp_server._search_emails, mcp_server.plan_topic = original
+
+    assert digest["batches"] == 1 and digest["planned_emails"] == 3
+    assert [task["source_id"] for task in digest["tasks"]] == ["1"]
+    assert progress == ["Planned email batch 1"]
+    # Batches run on the planner pool, so PLANNER_CONCURRENCY caps them with every other crew run
+    assert threads and all(name.startswith("planner") for name in threads)
@@ -0,0 +1,51 @@
+import json
+import time
+import asyncio
+
+import mcp_server
+from gmail_utils import fetch_message_metadata
+from offline_stubs import FakeGmailService
+
+
+def test_fetch_preserves_order_and_chunks():
+    service = FakeGmailService(120, latency=0)
+    ids = list(reversed(list(service.store)))
+    result = fetch_message_metadata(service, ids)
+    assert [m["id"] for m in result] == ids
+    assert service.batch_sizes == [50, 50, 20]
+
+
+def test_check_gmail_shape_and_latency():
+    service = FakeGmailService(50, latency=0.02)
+    original = mcp_server._get_gmail_service, mcp_server.gmail_index
+    mcp_server._get_gmail_service = lambda user_id="default": service
+    mcp_server.gmail_index = None
+    try:
+        check_gmail = getattr(mcp_server.check_gmail, "fn", mcp_server.check_gmail)
+        start = time.perf_counter()
+        data = json.loads(asyncio.run(check_gmail(query="is:inbox", max_results=50)))
+        elapsed = time.perf_counter() - start
+    finally:
+        mcp_server._get_gmail_service, mcp_server.gmail_index = original
+
+    assert data["total"] == 50
+    assert data["query"] == "is:inbox"
+    assert [e["id"] for e in data["emails"]] == list(service.store)
+    assert data["emails"][1] == {
+        "id": "m1",
+        "subject": "Subject 1",
+        "from": "sender1@example.com",
+        "to": "me@example.com",
+        "date": "Mon, 1 Jan 2024 09:00:00 +0000",
+        "snippet": "snippet 1",
+        "is_unread": True,
+    }
+    # One list call plus one batch, instead of 1 + 50 sequential round trips
+    assert service.round_trips == 2
+    print(f"check_gmail for 50 emails: {elapsed * 1000:.0f} ms, {service.round_trips} round trips")
+
+
+if __name__ == "__main__":
+    test_fetch_preserves_order_and_chunks()
+    test_check_gmail_shape_and_latency()
+    print("All Gmail batch tests passed.")
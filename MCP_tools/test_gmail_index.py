@@ -0,0 +1,76 @@
+import pytest
+
+from gmail_index import GmailIndex, parse_query
+from offline_stubs import FakeGmailService
+
+
+def test_parse_query():
+    assert parse_query("is:unread") == [("label", "UNREAD", True)]
+    assert parse_query('in:inbox from:"Prof Chen"') == [("label", "INBOX", True), ("contains", "sender", "prof chen")]
+    assert parse_query("from:me") is None
+    assert parse_query("subject:exam") is None
+
+
+def test_incremental_sync_answers_from_index():
+    service = FakeGmailService(30, latency=0)
+    index = GmailIndex(":memory:", depth=20, freshness=0)
+
+    emails = index.search(service, "u1", "is:unread", 5)
+    assert [e["id"] for e in emails] == ["m1", "m3", "m5", "m7", "m9"]
+    assert all(e["is_unread"] for e in emails)
+
+    # Not enough matches inside a partial index: must fall back to Gmail
+    assert index.search(service, "u1", "from:sender25@example.com", 5) is None
+
+    service.add_message("new1")
+    service.mark_read("m1")
+    service.delete_message("m3")
+    round_trips = service.round_trips
+    emails = index.search(service, "u1", "is:unread", 3)
+    assert [e["id"] for e in emails] == ["new1", "m5", "m7"]
+    # One history.list plus one metadata batch, no full resync
+    assert service.round_trips - round_trips == 2
+
+
+def test_expired_history_triggers_full_resync():
+    service = FakeGmailService(10, latency=0)
+    index = GmailIndex(":memory:", depth=50, freshness=0)
+    assert len(index.search(service, "u1", "is:inbox", 50)) == 10
+
+    service.add_message("new1")
+    service.oldest_history_id = service.history_id
+    emails = index.search(service, "u1", "is:inbox", 50)
+    assert emails[0]["id"] == "new1" and len(emails) == 11
+
+
+
+def test_like_wildcards_in_a_query_are_literal():
+    service = FakeGmailService(12, latency=0)
+    index = GmailIndex(":memory:", depth=50, freshness=0)
+    assert sorted(e["from"] for e in index.search(service, "u1", "from:sender1", 50)) == [
+        "sender10@example.com", "sender11@example.com", "sender1@example.com"]
+    # Unescaped, "_" and "%" would match any sender
+    assert index.search(service, "u1", "from:sender_", 50) == []
+    assert index.search(service, "u1", "from:%example", 50) == []
+
+
+def test_failed_full_sync_leaves_the_index_as_it_was():
+    service = FakeGmailService(10, latency=0)
+    index = GmailIndex(":memory:", depth=50, freshness=0)
+    before = index.search(service, "u1", "is:inbox", 50)
+
+    def broken_row(user_id, msg):
+        raise ValueError("bad message")
+
+    index._row = broken_row
+    with pytest.raises(ValueError):
+        index.full_sync(service, "u1")
+    assert index.search_local("u1", "is:inbox", 50) == before
+
+if __name__ == "__main__":
+    test_parse_query()
+    test_incremental_sync_answers_from_index()
+    test_expired_history_triggers_full_resync()
+    test_like_wildcards_in_a_query_are_literal()
+    test_failed_full_sync_leaves_the_index_as_it_was()
+    print("All Gmail index tests passed.")
@@ -0,0 +1,211 @@
+import gc
+import os
+import json
+import time
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import gmail_utils
+from gmail_utils import GmailServiceCache, token_file_lock, write_token_file
+
+
+class FakeCredentials:
+    """Stands in for google.oauth2.credentials.Credentials, read from and written to the token file."""
+
+    refreshes = 0
+
+    def __init__(self, token, expiry, refresh_token="refresh"):
+        self.token = token
+        self.expiry = expiry
+        self.refresh_token = refresh_token
+
+    @property
+    def expired(self):
+        return self.expiry is not None and self.expiry <= datetime.utcnow()
+
+    @property
+    def valid(self):
+        return bool(self.token) and not self.expired
+
+    def refresh(self, request):
+        FakeCredentials.refreshes += 1
+        self.token = f"{self.token}+"
+        self.expiry = datetime.utcnow() + timedelta(hours=1)
+
+    def to_json(self):
+        return json.dumps({"token": self.token, "expiry": self.expiry.isoformat(), "refresh_token": self.refresh_token})
+
+    @classmethod
+    def from_authorized_user_file(cls, path, scopes):
+        with open(path) as token_file:
+            data = json.load(token_file)
+        return cls(data["token"], datetime.fromisoformat(data["expiry"]), data["refresh_token"])
+
+
+def _write_token(path, token, expires_in=3600):
+    expiry = datetime.utcnow() + timedelta(seconds=expires_in)
+    write_token_file(str(path), FakeCredentials(token, expiry))
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    from google.oauth2 import credentials
+    from googleapiclient import discovery
+
+    builds = []
+
+    def build(name, version, credentials=None, cache_discovery=True):
+        builds.append(credentials)
+        return {"credentials": credentials}
+
+    monkeypatch.setattr(credentials, "Credentials", FakeCredentials)
+    monkeypatch.setattr(discovery, "build", build)
+    FakeCredentials.refreshes = 0
+    services = GmailServiceCache(lambda user_id: str(tmp_path / f"{user_id}.json"), ["gmail.readonly"],
+                                 max_entries=2, refresh_margin=300, check_interval=3600)
+    services.builds = builds
+    yield services
+    services.stop()
+
+
+def test_services_are_reused_and_evicted_least_recently_used(cache, tmp_path):
+    for user in ("a", "b", "c"):
+        _write_token(tmp_path / f"{user}.json", f"token-{user}")
+
+    service_a = cache.get("a")
+    assert cache.get("a") is service_a and len(cache.builds) == 1
+    cache.get("b")
+    cache.get("a")
+    # "b" is the least recently used of the two cached users
+    cache.get("c")
+    assert list(cache._entries) == ["a", "c"]
+    assert cache.get("a") is service_a
+    cache.get("b")
+    assert len(cache.builds) == 4
+
+    # A token rewritten on disk (e.g. by setup_auth.py) is picked up
+    time.sleep(0.01)
+    _write_token(tmp_path / "b.json", "token-b2")
+    assert cache.get("b")["credentials"].token == "token-b2"
+
+
+def test_tokens_are_refreshed_ahead_of_expiry(cache, tmp_path):
+    _write_token(tmp_path / "soon.json", "old", expires_in=60)
+    _write_token(tmp_path / "later.json", "fresh", expires_in=3600)
+    soon, later = cache.get("soon"), cache.get("later")
+
+    cache.refresh_expiring()
+    assert FakeCredentials.refreshes == 1
+    assert soon["credentials"].token == "old+" and later["credentials"].token == "fresh"
+    with open(tmp_path / "soon.json") as token_file:
+        assert json.load(token_file)["token"] == "old+"
+    # The refreshed token file is not mistaken for an outside change
+    assert cache.get("soon") is soon and len(cache.builds) == 2
+
+
+def test_an_expired_token_is_refreshed_on_load(cache, tmp_path):
+    _write_token(tmp_path / "expired.json", "old", expires_in=-60)
+    assert cache.get("expired")["credentials"].token == "old+"
+    with open(tmp_path / "expired.json") as token_file:
+        assert json.load(token_file)["token"] == "old+"
+
+
+def test_token_write_is_atomic(tmp_path):
+    path = tmp_path / "user.json"
+    _write_token(path, "first")
+
+    class Broken(FakeCredentials):
+        def to_json(self):
+            raise ValueError("cannot serialize")
+
+    with pytest.raises(ValueError):
+        write_token_file(str(path), Broken("second", datetime.utcnow()))
+    # A failed write leaves the old token in place and no temp file behind
+    with open(path) as token_file:
+        assert json.load(token_file)["token"] == "first"
+    assert os.listdir(tmp_path) == ["user.json"]
+    _write_token(path, "third")
+    assert os.listdir(tmp_path) == ["user.json"]
+
+
+@pytest.mark.skipif(gmail_utils.fcntl is None, reason="file locks need fcntl")
+def test_token_file_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / "tokens" / "user.json")
+    order = []
+    held = threading.Event()
+
+    def other():
+        held.wait(5)
+        with token_file_lock(path):
+            order.append("other")
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    with token_file_lock(path):
+        held.set()
+        time.sleep(0.1)
+        order.append("first")
+    thread.join(5)
+    assert order == ["first", "other"]
+
+
+def test_switching_account_evicts_the_cached_service(cache, tmp_path, monkeypatch):
+    import mcp_server
+
+    _write_token(tmp_path / "switcher.json", "old", expires_in=60)
+    monkeypatch.setattr(mcp_server, "gmail_services", cache)
+    monkeypatch.setattr(mcp_server, "gmail_index", None)
+    monkeypatch.setattr(mcp_server, "_get_token_path", lambda user_id: str(tmp_path / f"{user_id}.json"))
+    cache.get("switcher")
+
+    result = json.loads(mcp_server._switch_gmail_account("switcher"))
+    assert result["status"] == "success" and "disconnected" in result["message"]
+    assert "switcher" not in cache._entries
+    assert not os.path.exists(tmp_path / "switcher.json")
+    # A background refresh after the switch doesn't write the old account's token back
+    cache.refresh_expiring()
+    assert FakeCredentials.refreshes == 0 and not os.path.exists(tmp_path / "switcher.json")
+    with pytest.raises(Exception, match="authentication required"):
+        cache.get("switcher")
+
+
+def test_user_locks_are_dropped_with_their_service(cache, tmp_path):
+    for user in ("a", "b", "c"):
+        _write_token(tmp_path / f"{user}.json", f"token-{user}")
+        cache.get(user)
+    lock = cache.lock_for("c")
+    assert cache.lock_for("c") is lock
+    # max_entries is 2, so "a" was evicted and nothing holds its lock
+    gc.collect()
+    assert sorted(cache._user_locks) == ["b", "c"]
+    cache.evict("b")
+    cache.evict("c")
+    gc.collect()
+    # "c"'s lock is still held here, so it stays the same lock
+    assert list(cache._user_locks) == ["c"] and cache.lock_for("c") is lock
+
+
+def test_switching_account_waits_for_the_users_lock(cache, tmp_path, monkeypatch):
+    import mcp_server
+
+    _write_token(tmp_path / "busy.json", "old")
+    monkeypatch.setattr(mcp_server, "gmail_services", cache)
+    monkeypatch.setattr(mcp_server, "gmail_index", None)
+    monkeypatch.setattr(mcp_server, "_get_token_path", lambda user_id: str(tmp_path / f"{user_id}.json"))
+    cache.get("busy")
+    switched = threading.Event()
+
+    def switch():
+        mcp_server._switch_gmail_account("busy")
+        switched.set()
+
+    with cache.lock_for("busy"):
+        thread = threading.Thread(target=switch)
+        thread.start()
+        # A refresh-ahead or search holding the lock finishes with the old service first
+        assert not switched.wait(0.2)
+        assert "busy" in cache._entries and os.path.exists(tmp_path / "busy.json")
+    thread.join(5)
+    assert switched.is_set() and "busy" not in cache._entries
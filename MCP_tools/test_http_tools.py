@@ -0,0 +1,112 @@
+import json
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import mcp_server
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves canned ipapi.co and open-meteo responses and records every request."""
+
+    protocol_version = "HTTP/1.1"
+    requests = []
+    connections = set()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        StubHandler.requests.append((url.path, parse_qs(url.query)))
+        StubHandler.connections.add(self.client_address)
+        if url.path == "/json/":
+            body = {"city": "Taipei", "region": "Taipei", "country_name": "Taiwan",
+                    "latitude": 25.05, "longitude": 121.53, "postal": "100", "timezone": "Asia/Taipei"}
+        else:
+            body = {"current_weather": {"temperature": 27.5, "weathercode": 2}}
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _start_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    mcp_server.IPAPI_URL = f"{base}/json/"
+    mcp_server.OPEN_METEO_URL = f"{base}/v1/forecast"
+    mcp_server._location_cache.clear()
+    mcp_server._weather_cache.clear()
+    StubHandler.requests.clear()
+    StubHandler.connections.clear()
+    return server
+
+
+def _tool(name):
+    tool = getattr(mcp_server, name)
+    return getattr(tool, "fn", tool)
+
+
+def test_location_and_weather_are_cached_and_pooled():
+    server = _start_stub()
+    get_location, get_weather = _tool("get_location"), _tool("get_weather")
+
+    async def scenario():
+        location = json.loads(await get_location())
+        assert location["city"] == "Taipei"
+        assert json.loads(await get_location()) == location
+
+        weather = json.loads(await get_weather(25.0712, 121.5301))
+        assert weather == {"temperature": 27.5, "unit": "°C", "status": "Partly cloudy", "weather_code": 2}
+        # Same grid cell: served from cache
+        assert json.loads(await get_weather(25.0689, 121.5344)) == weather
+        # Different cell: new request over the same pooled connection
+        await get_weather(24.15, 120.67)
+
+    try:
+        asyncio.run(scenario())
+        paths = [path for path, _ in StubHandler.requests]
+        assert paths == ["/json/", "/v1/forecast", "/v1/forecast"]
+        assert StubHandler.requests[1][1]["latitude"] == ["25.1"]
+        assert len(StubHandler.connections) == 1
+    finally:
+        server.shutdown()
+
+
+def test_each_event_loop_gets_its_own_client_and_drops_it_with_the_loop():
+    import gc
+    import http_client
+
+    async def clients():
+        first = http_client.get_http_client()
+        assert http_client.get_http_client() is first
+        return first
+
+    seen = []
+    for _ in range(3):
+        loop = asyncio.new_event_loop()
+        seen.append(loop.run_until_complete(clients()))
+        loop.close()
+    assert len({id(client) for client in seen}) == 3
+    del loop
+    gc.collect()
+    assert all(client not in http_client._clients.values() for client in seen)
+
+    async def closed():
+        client = http_client.get_http_client()
+        await http_client.close_http_client()
+        assert client.is_closed and http_client.get_http_client() is not client
+        await http_client.close_http_client()
+
+    asyncio.run(closed())
+
+
+if __name__ == "__main__":
+    test_location_and_weather_are_cached_and_pooled()
+    test_each_event_loop_gets_its_own_client_and_drops_it_with_the_loop()
+    print("All HTTP tool tests passed.")
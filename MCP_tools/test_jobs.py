@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+import threading
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+os.environ.setdefault("CREWAI_TESTING", "true")
+
+from fastapi.testclient import TestClient
+
+import api
+from jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, JobManager, JobStore
+
+
+@pytest.fixture
+def jobs(tmp_path, monkeypatch):
+    """Swap the API's job manager for one with a fake runner; `release` lets held jobs finish."""
+    release = threading.Event()
+
+    def runner(input_task):
+        if "hold" in input_task:
+            release.wait(5)
+        if "broken" in input_task:
+            raise Exception("boom")
+        return f"plan for {input_task}"
+
+    manager = JobManager(JobStore(str(tmp_path / "jobs.db")), runner)
+    monkeypatch.setattr(api, "job_manager", manager)
+    yield manager, release
+    release.set()
+    manager.shutdown(wait=True)
+
+
+def test_submitted_jobs_finish_and_report_their_result(jobs):
+    client = TestClient(api.app)
+    response = client.post("/jobs", json={"input_task": "Learn Rust"})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    job = client.get(f"/jobs/{job_id}/wait", params={"timeout": 5}).json()
+    assert job["status"] == SUCCEEDED and job["result"] == "plan for Learn Rust"
+    assert client.get(f"/jobs/{job_id}").json() == job
+
+    failed_id = client.post("/jobs", json={"input_task": "broken task"}).json()["job_id"]
+    failed = client.get(f"/jobs/{failed_id}/wait", params={"timeout": 5}).json()
+    assert failed["status"] == FAILED and failed["error"] == "boom"
+
+
+def test_wait_returns_the_current_state_after_the_timeout(jobs):
+    manager, release = jobs
+    client = TestClient(api.app)
+    job_id = client.post("/jobs", json={"input_task": "hold on"}).json()["job_id"]
+
+    start = time.perf_counter()
+    job = client.get(f"/jobs/{job_id}/wait", params={"timeout": 0.2}).json()
+    assert job["status"] in (QUEUED, RUNNING)
+    assert 0.2 <= time.perf_counter() - start < 2
+
+    # A waiter is woken as soon as the job finishes, not at its timeout
+    threading.Timer(0.2, release.set).start()
+    start = time.perf_counter()
+    job = client.get(f"/jobs/{job_id}/wait", params={"timeout": 30}).json()
+    assert job["status"] == SUCCEEDED and time.perf_counter() - start < 5
+    assert manager._waiters == {}
+
+
+def test_options_a_job_would_drop_are_rejected(jobs):
+    client = TestClient(api.app)
+    for extra in ({"busy": [{"start": "2026-01-05T09:00:00", "end": "2026-01-05T10:00:00"}]},
+                  {"deadline_seconds": 30}):
+        response = client.post("/jobs", json={"input_task": "Learn Rust", **extra})
+        assert response.status_code == 422
+
+
+def test_unknown_job_is_404(jobs):
+    client = TestClient(api.app)
+    assert client.get("/jobs/missing").status_code == 404
+    assert client.get("/jobs/missing/wait", params={"timeout": 0.1}).status_code == 404
+
+
+def test_unfinished_jobs_resume_after_a_restart(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    # A previous process accepted one job and started another, then stopped
+    store = JobStore(db_path)
+    queued = store.create("Plan the week")
+    running = store.create("Plan the month")
+    store.mark_running(running)
+    store.close()
+
+    manager = JobManager(JobStore(db_path), lambda input_task: f"plan for {input_task}")
+    manager.start()
+    try:
+        for job_id, task in ((queued, "Plan the week"), (running, "Plan the month")):
+            deadline = time.monotonic() + 5
+            while manager.get(job_id)["status"] != SUCCEEDED and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert manager.get(job_id)["result"] == f"plan for {task}"
+    finally:
+        manager.shutdown(wait=True)
+    assert manager.store.unfinished() == []
@@ -0,0 +1,80 @@
+import os
+import sys
+import copy
+import time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+from crewai.llms.base_llm import BaseLLM
+
+from calender.llm_cache import LLMCallCache, cached_llm
+
+
+class CountingLLM(BaseLLM):
+    def __init__(self, temperature=None):
+        super().__init__(model="counting", temperature=temperature)
+        self.calls = 0
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        self.calls += 1
+        return f"reply {self.calls} to {messages[-1]['content']}"
+
+
+def _messages(text):
+    return [{"role": "system", "content": "You plan calendars."}, {"role": "user", "content": text}]
+
+
+def test_record_then_replay(tmp_path):
+    llm = cached_llm(CountingLLM(), LLMCallCache(str(tmp_path), mode="record"))
+    first = llm.call(_messages("plan ggplot2"))
+    assert llm.call(_messages("plan ggplot2")) == first
+    llm.call(_messages("plan rust"))
+    assert llm.calls == 2
+
+    replay = cached_llm(CountingLLM(), LLMCallCache(str(tmp_path), mode="replay"))
+    assert replay.call(_messages("plan ggplot2")) == first
+    assert replay.calls == 0
+    with pytest.raises(LookupError, match="LLM_CACHE_MODE=record"):
+        replay.call(_messages("plan go"))
+
+
+def test_parameters_are_part_of_the_key(tmp_path):
+    cache = LLMCallCache(str(tmp_path), mode="record")
+    cold = cached_llm(CountingLLM(temperature=0.0), cache)
+    warm = cached_llm(CountingLLM(temperature=0.7), cache)
+    cold.call(_messages("plan ggplot2"))
+    warm.call(_messages("plan ggplot2"))
+    assert (cold.calls, warm.calls) == (1, 1)
+
+
+def test_agent_copies_stay_cached(tmp_path):
+    llm = cached_llm(CountingLLM(), LLMCallCache(str(tmp_path), mode="record"))
+    llm.call(_messages("plan ggplot2"))
+    clone = copy.copy(llm)
+    assert isinstance(clone, CountingLLM)
+    clone.call(_messages("plan ggplot2"))
+    assert clone.calls == 1
+
+
+def test_off_mode_leaves_the_llm_alone(tmp_path):
+    llm = CountingLLM()
+    assert type(cached_llm(llm, LLMCallCache(str(tmp_path), mode="off"))) is CountingLLM
+
+
+def test_store_evicts_least_recently_used(tmp_path):
+    cache = LLMCallCache(str(tmp_path), mode="record", max_bytes=2000)
+    for i in range(4):
+        cache.put(f"{i:02d}" + "0" * 62, "x" * 300)
+        time.sleep(0.01)
+    # Reading an old entry refreshes it
+    assert cache.get("00" + "0" * 62) is not None
+    for i in range(4, 7):
+        cache.put(f"{i:02d}" + "0" * 62, "x" * 300)
+        time.sleep(0.01)
+    assert cache.stats()["evictions"] > 0
+    assert cache.get("00" + "0" * 62) is not None
+    assert cache.get("01" + "0" * 62) is None
+    assert cache.get("06" + "0" * 62) is not None
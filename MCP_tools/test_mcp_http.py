@@ -0,0 +1,78 @@
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import subprocess
+
+import httpx
+import pytest
+from fastmcp import Client
+from fastmcp.client.transports import StreamableHttpTransport
+from fastmcp.exceptions import ToolError
+
+from bench_offline import MCP_HTTP_BOOT, _free_port
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture
+def server(tmp_path):
+    port = _free_port()
+    env = {**os.environ, "OFFLINE_LLM_LATENCY": "2", "OPENAI_API_KEY": "sk-offline", "MCP_REQUIRE_USER": "1",
+           "PLAN_CACHE_DIR": str(tmp_path / "plans"), "LLM_CACHE_MODE": "off"}
+    proc = subprocess.Popen([sys.executable, "-c", MCP_HTTP_BOOT.format(port=port)], cwd=_SCRIPT_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while True:
+        assert proc.poll() is None and time.monotonic() < deadline, "MCP server did not start"
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health").raise_for_status()
+            break
+        except httpx.TransportError:
+            time.sleep(0.1)
+    yield proc, f"http://127.0.0.1:{port}/mcp"
+    if proc.poll() is None:
+        proc.kill()
+        proc.wait()
+
+
+def _client(url, user=None):
+    headers = {"X-DayCrafter-User": user} if user else {}
+    return Client(StreamableHttpTransport(url, headers=headers))
+
+
+def test_header_pins_the_user(server):
+    _, url = server
+
+    async def main():
+        async with _client(url, "alice") as alice, _client(url) as anonymous:
+            result = await alice.call_tool("check_gmail", {"max_results": 2})
+            assert "emails" in result.content[0].text
+            with pytest.raises(ToolError, match="does not match"):
+                await alice.call_tool("check_gmail", {"max_results": 2, "user_id": "bob"})
+            with pytest.raises(ToolError, match="requires an X-DayCrafter-User"):
+                await anonymous.call_tool("check_gmail", {"user_id": "bob"})
+            # Tools without a user_id are open to every client
+            await anonymous.call_tool("get_weather", {"latitude": 25.0, "longitude": 121.5})
+
+    asyncio.run(main())
+
+
+def test_sigterm_drains_crew_runs_in_progress(server):
+    proc, url = server
+
+    async def main():
+        async with _client(url, "alice") as client:
+            # The client validates results against the tool list; fetch it while the server still accepts connections
+            await client.list_tools()
+            call = asyncio.create_task(client.call_tool("task_and_schedule_planer", {"topic": "Drain test topic"}))
+            await asyncio.sleep(0.5)
+            proc.send_signal(signal.SIGTERM)
+            return await call
+
+    result = asyncio.run(main())
+    assert json.loads(result.content[0].text)
+    # uvicorn re-raises the signal once it has shut down
+    assert proc.wait(timeout=30) in (0, -signal.SIGTERM)
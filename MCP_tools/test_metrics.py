@@ -0,0 +1,91 @@
+import os
+import sys
+import asyncio
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+from fastapi.testclient import TestClient
+from fastmcp import Client
+
+import api
+import mcp_server
+from calender import metrics
+from calender.metrics import (
+    CACHE_REQUESTS, CREW_PHASE, HTTP_CALLS, TOOL_CALLS, TOOL_LATENCY, Registry, instrument_crew, instrument_tool,
+)
+from test_http_tools import _start_stub
+
+
+def test_render_prometheus_text_format():
+    registry = Registry()
+    registry.counter("jobs_total", "Jobs.").inc(2, status="ok")
+    histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    histogram.observe(0.05, tool="a")
+    histogram.observe(5.0, tool="a")
+    text = registry.render()
+    assert '# TYPE jobs_total counter\njobs_total{status="ok"} 2\n' in text
+    assert 'latency_seconds_bucket{tool="a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{tool="a",le="1.0"} 1' in text
+    assert 'latency_seconds_bucket{tool="a",le="+Inf"} 2' in text
+    assert 'latency_seconds_count{tool="a"} 2' in text
+
+
+def test_tool_calls_record_latency_http_status_and_cache_hits():
+    server = _start_stub()
+    before = TOOL_LATENCY.count(tool="get_weather")
+    hits = CACHE_REQUESTS.value(cache="weather", result="hit")
+    host = "127.0.0.1"
+    http_before = HTTP_CALLS.value(host=host, status="200")
+
+    async def scenario():
+        async with Client(mcp_server.mcp) as client:
+            await client.call_tool("get_weather", {"latitude": 1.0, "longitude": 1.0})
+            await client.call_tool("get_weather", {"latitude": 1.0, "longitude": 1.0})
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        server.shutdown()
+
+    assert TOOL_LATENCY.count(tool="get_weather") == before + 2
+    assert TOOL_CALLS.value(tool="get_weather", status="ok") >= 2
+    assert CACHE_REQUESTS.value(cache="weather", result="hit") == hits + 1
+    assert HTTP_CALLS.value(host=host, status="200") == http_before + 1
+
+
+def test_metrics_endpoint_and_crew_task_timing():
+    seen = []
+    crew = SimpleNamespace(task_callback=seen.append)
+    instrument_crew(crew)
+    crew.task_callback(SimpleNamespace(name="execution_task"))
+    assert seen and CREW_PHASE.count(phase="task:execution_task") >= 1
+
+    client = TestClient(api.app)
+    client.get("/health")
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'daycrafter_request_latency_seconds_count{route="/health"}' in response.text
+    assert "daycrafter_crew_phase_seconds_bucket" in response.text
+
+
+def test_disabled_instrumentation_returns_the_function_unchanged():
+    def tool():
+        return "ok"
+
+    metrics.METRICS_ENABLED = False
+    try:
+        assert instrument_tool()(tool) is tool
+        with metrics.timer(CREW_PHASE, phase="disabled"):
+            pass
+    finally:
+        metrics.METRICS_ENABLED = True
+    assert CREW_PHASE.count(phase="disabled") == 0
+
+
+if __name__ == "__main__":
+    test_render_prometheus_text_format()
+    test_tool_calls_record_latency_http_status_and_cache_hits()
+    test_metrics_endpoint_and_crew_task_timing()
+    test_disabled_instrumentation_returns_the_function_unchanged()
+    print("All metrics tests passed.")
@@ -0,0 +1,190 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+import outbound
+from outbound import CLOSED, HALF_OPEN, OPEN, Dependency, DependencyUnavailable, UpstreamError, parse_retry_after
+from calender.metrics import OUTBOUND_CALLS
+from offline_stubs import FakeGmailService, start_http_stub
+
+
+@pytest.fixture
+def stub():
+    server = start_http_stub()
+    yield server, f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_retry_after_is_honoured(stub):
+    server, base = stub
+    server.faults.inject(status=429, retry_after=0.3, times=1)
+    guard = Dependency("test_retry_after", rate=0)
+
+    async def scenario():
+        start = time.perf_counter()
+        response = await guard.get(f"{base}/json/")
+        return response, time.perf_counter() - start
+
+    response, elapsed = asyncio.run(scenario())
+    assert response.status_code == 200 and elapsed >= 0.3
+    assert OUTBOUND_CALLS.value(dependency="test_retry_after", outcome="retry") == 1
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_long_retry_after_fails_fast_until_it_passes(stub):
+    server, base = stub
+    server.faults.inject(status=503, retry_after=0.5)
+    guard = Dependency("test_long_retry_after", rate=0, max_wait=0.2)
+
+    async def scenario():
+        with pytest.raises(UpstreamError):
+            await guard.get(f"{base}/json/")
+        # The circuit stays open for the Retry-After instead of every call waiting on the server
+        with pytest.raises(DependencyUnavailable):
+            await guard.get(f"{base}/json/")
+        server.faults.clear()
+        await asyncio.sleep(0.5)
+        return await guard.get(f"{base}/json/")
+
+    assert asyncio.run(scenario()).status_code == 200
+    assert guard.breaker.state == CLOSED
+
+
+def test_rate_limit_and_concurrency_cap():
+    guard = Dependency("test_limits", rate=20, burst=2, concurrency=2, max_wait=0.2)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=guard.call_sync, args=(work,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Two tokens up front, then one every 50 ms
+    assert peak[0] == 2 and time.perf_counter() - start >= 0.2
+
+    slow = Dependency("test_throttled", rate=1, burst=1, max_wait=0.1)
+    slow.call_sync(lambda: None)
+    with pytest.raises(DependencyUnavailable, match="rate limited"):
+        slow.call_sync(lambda: None)
+
+
+def test_probe_cancelled_while_waiting_lets_the_next_call_probe():
+    guard = Dependency("test_cancelled_probe", rate=5, burst=1, concurrency=1, failures=1, reset_seconds=0.05)
+
+    async def fail():
+        raise TimeoutError("down")
+
+    async def ok():
+        return "ok"
+
+    async def cancel_soon(call):
+        task = asyncio.ensure_future(call)
+        await asyncio.sleep(0.03)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    async def scenario():
+        guard.retries = 0
+        with pytest.raises(TimeoutError):
+            await guard.call(fail)
+        assert guard.breaker.state == OPEN
+        await asyncio.sleep(0.06)
+        # The probe is cancelled while it waits for a rate-limit token...
+        await cancel_soon(guard.call(ok))
+        assert guard.breaker.state == HALF_OPEN
+        # ...and while it waits for a concurrency slot
+        assert guard._try_enter()
+        await cancel_soon(guard.call(ok))
+        guard._leave()
+        return await guard.call(ok)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert guard.breaker.state == CLOSED and guard._active == 0
+
+
+def test_weather_is_served_stale_while_the_circuit_is_open(stub, monkeypatch):
+    import mcp_server
+    from http_client import TTLCache
+
+    server, base = stub
+    monkeypatch.setattr(mcp_server, "OPEN_METEO_URL", f"{base}/v1/forecast")
+    monkeypatch.setattr(mcp_server, "_weather_cache", TTLCache(ttl=0, name="weather", stale_ttl=60))
+    guard = Dependency("open_meteo", rate=0, retries=1, max_backoff=0.01, failures=2, reset_seconds=0.3)
+    monkeypatch.setitem(outbound._dependencies, "open_meteo", guard)
+    get_weather = getattr(mcp_server.get_weather, "fn", mcp_server.get_weather)
+
+    async def scenario():
+        fresh = json.loads(await get_weather(25.05, 121.53))
+        server.faults.inject(status=503)
+        outage = [json.loads(await get_weather(25.05, 121.53)) for _ in range(3)]
+        rejected = OUTBOUND_CALLS.value(dependency="open_meteo", outcome="rejected")
+        server.faults.clear()
+        await asyncio.sleep(0.3)
+        recovered = json.loads(await get_weather(25.05, 121.53))
+        return fresh, outage, rejected, recovered
+
+    fresh, outage, rejected, recovered = asyncio.run(scenario())
+    assert "stale" not in fresh
+    assert all(weather == {**fresh, "stale": True} for weather in outage)
+    # Two failed calls open the circuit; the third is answered without reaching the server
+    assert rejected >= 1 and guard.breaker.state == CLOSED
+    assert recovered == fresh
+
+
+def test_gmail_outage_is_answered_from_the_index(monkeypatch):
+    import mcp_server
+    from gmail_index import GmailIndex
+
+    service = FakeGmailService(20, latency=0)
+    monkeypatch.setattr(mcp_server, "gmail_index", GmailIndex(":memory:", depth=20, freshness=0))
+    monkeypatch.setattr(mcp_server, "_get_gmail_service", lambda user_id: service)
+    monkeypatch.setitem(outbound._dependencies, "gmail", Dependency("gmail", rate=0, max_backoff=0.01))
+
+    fresh = json.loads(mcp_server._check_gmail("is:inbox", 5, "outage-user"))
+    assert fresh["total"] == 5 and "stale" not in fresh
+
+    service.faults.inject(status=503)
+    stale = json.loads(mcp_server._check_gmail("is:inbox", 5, "outage-user"))
+    assert stale["stale"] is True
+    assert [email["id"] for email in stale["emails"]] == [email["id"] for email in fresh["emails"]]
+    assert outbound.dependency("gmail").breaker.state != OPEN
+
+
+def test_local_index_errors_do_not_count_against_gmail(monkeypatch):
+    import mcp_server
+    from gmail_index import GmailIndex
+
+    service = FakeGmailService(20, latency=0)
+    index = GmailIndex(":memory:", depth=20, freshness=0)
+
+    def busy_database(user_id, messages):
+        # Looks like an outage to the guard, but it's the local index failing
+        raise TimeoutError("database is locked")
+
+    monkeypatch.setattr(index, "_upsert", busy_database)
+    monkeypatch.setattr(mcp_server, "gmail_index", index)
+    monkeypatch.setattr(mcp_server, "_get_gmail_service", lambda user_id: service)
+    guard = Dependency("gmail", rate=0, retries=0, failures=1)
+    monkeypatch.setitem(outbound._dependencies, "gmail", guard)
+
+    assert "error" in json.loads(mcp_server._check_gmail("is:inbox", 5, "index-error-user"))
+    # Every Gmail API call of the sync succeeded, so the circuit stays closed
+    assert guard.breaker.state == CLOSED
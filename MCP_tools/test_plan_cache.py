@@ -0,0 +1,145 @@
+import os
+import sys
+import time
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+from calender.plan_cache import PlanCache, is_roadmap_json
+
+
+class Planner:
+    """Counts compute calls; `delay` keeps a run in flight long enough for others to join it."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, topic):
+        with self._lock:
+            self.calls.append(topic)
+        time.sleep(self.delay)
+        if "broken" in topic:
+            raise RuntimeError("crew failed")
+        return f"plan {len(self.calls)} for {topic}"
+
+
+def test_entries_expire_after_the_ttl_and_the_least_recent_is_evicted(tmp_path):
+    planner = Planner()
+    cache = PlanCache(max_entries=2, ttl=0.1, preference_path=str(tmp_path / "missing.md"))
+
+    first = cache.get_or_compute("Learn Rust", planner)
+    # Case and spacing don't matter
+    assert cache.get_or_compute("  learn   RUST ", planner) == first and len(planner.calls) == 1
+    time.sleep(0.15)
+    assert cache.get("Learn Rust") is None
+    assert cache.get_or_compute("Learn Rust", planner) != first and len(planner.calls) == 2
+
+    cache.ttl = 60
+    cache.get_or_compute("Garden", planner)
+    cache.get_or_compute("Learn Rust", planner)
+    cache.get_or_compute("Taxes", planner)
+    # "Garden" was the least recently used of the two entries kept
+    assert cache.get("Garden") is None and cache.get("Learn Rust") is not None
+    assert cache.stats()["evictions"] == 1 and cache.stats()["size"] == 2
+
+
+def test_disk_tier_survives_a_new_process_until_the_ttl(tmp_path):
+    planner = Planner()
+    disk = str(tmp_path / "plans")
+    PlanCache(ttl=0.2, disk_dir=disk, preference_path=str(tmp_path / "missing.md")).get_or_compute("Rust", planner)
+
+    restarted = PlanCache(ttl=0.2, disk_dir=disk, preference_path=str(tmp_path / "missing.md"))
+    assert restarted.get_or_compute("Rust", planner) == "plan 1 for Rust"
+    assert restarted.stats()["disk_hits"] == 1 and len(planner.calls) == 1
+    time.sleep(0.25)
+    assert PlanCache(ttl=0.2, disk_dir=disk, preference_path=str(tmp_path / "missing.md")).get("Rust") is None
+    assert os.listdir(disk) == []
+
+
+def test_concurrent_identical_requests_run_once(tmp_path):
+    planner = Planner(delay=0.2)
+    cache = PlanCache(preference_path=str(tmp_path / "missing.md"))
+    results, errors = [], []
+
+    def request(topic):
+        try:
+            results.append(cache.get_or_compute(topic, planner))
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=request, args=("Learn Rust",)) for _ in range(5)]
+    threads += [threading.Thread(target=request, args=("broken topic",)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(planner.calls) == ["Learn Rust", "broken topic"]
+    assert results == ["plan 1 for Learn Rust"] * 5 or results == ["plan 2 for Learn Rust"] * 5
+    # The leader's failure reaches every caller that joined it, and is not cached
+    assert errors == ["crew failed"] * 3
+    stats = cache.stats()
+    assert stats["coalesced"] == 6 and stats["errors"] == 1 and stats["in_flight"] == 0
+
+
+def test_a_preference_change_invalidates_cached_plans(tmp_path):
+    preferences = tmp_path / "preference.md"
+    preferences.write_text("Mornings only")
+    planner = Planner()
+    cache = PlanCache(preference_path=str(preferences))
+
+    first = cache.get_or_compute("Learn Rust", planner)
+    assert cache.get_or_compute("Learn Rust", planner) == first
+
+    preferences.write_text("Evenings only, please")
+    stat = os.stat(preferences)
+    os.utime(preferences, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.get_or_compute("Learn Rust", planner) != first and len(planner.calls) == 2
+
+
+def test_preference_hash_settles_under_concurrent_lookups(tmp_path):
+    preferences = tmp_path / "preference.md"
+    preferences.write_text("v0")
+    cache = PlanCache(preference_path=str(preferences))
+    stop = threading.Event()
+
+    def look_up():
+        while not stop.is_set():
+            cache.make_key("topic")
+
+    readers = [threading.Thread(target=look_up) for _ in range(8)]
+    for reader in readers:
+        reader.start()
+    for version in range(1, 6):
+        time.sleep(0.02)
+        preferences.write_text(f"v{version}")
+        stat = os.stat(preferences)
+        os.utime(preferences, ns=(stat.st_atime_ns, stat.st_mtime_ns + version * 10 ** 9))
+    time.sleep(0.02)
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+    # Whatever order the readers updated in, the cached hash belongs to the file's final content
+    assert cache.make_key("topic") == PlanCache(preference_path=str(preferences)).make_key("topic")
+
+
+def test_replies_that_are_not_a_roadmap_are_not_cached(tmp_path):
+    replies = iter(["Sorry, I could not produce a plan.", '[{"task": "Read the Rust book"}]'])
+    calls = []
+
+    def compute(topic):
+        calls.append(topic)
+        return next(replies)
+
+    cache = PlanCache(disk_dir=str(tmp_path / "plans"), preference_path=str(tmp_path / "missing.md"),
+                      cacheable=is_roadmap_json)
+    assert cache.get_or_compute("Learn Rust", compute).startswith("Sorry")
+    assert cache.get("Learn Rust") is None and os.listdir(tmp_path / "plans") == []
+    # The next request runs again, and its roadmap is kept
+    assert cache.get_or_compute("Learn Rust", compute) == '[{"task": "Read the Rust book"}]'
+    assert cache.get_or_compute("Learn Rust", compute) == '[{"task": "Read the Rust book"}]'
+    assert len(calls) == 2 and cache.stats()["not_cached"] == 1
+    assert not is_roadmap_json("[]") and not is_roadmap_json('"plan"')
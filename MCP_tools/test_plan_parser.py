@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import uuid
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+
+from calender.plan_parser import RoadmapStreamParser, repair_json
+from calender.plan_model import LocalRepairConverter, Roadmap, plan_to_json
+from calender.progress import attach_progress
+
+REPLY = """Thought: I now know the final answer
+Final Answer: ```json
+[
+    {"DueDate": "2026-10-18", "task": "Read chapters 1-2 of Wickham", "priority": 1, "links": "https://ggplot2-book.org", "Description": "Cover [basics] and \\"grammar\\"",},
+    {"task": "Work through Chapter 2 exercises", "priority": "2", "Description": "Practice {aes} mappings"},
+    {"task": "Post three screenshots", "priority": 3, "Description": "Share work on the forum"},
+]
+```"""
+
+
+def test_repair_json_fixes_common_llm_mistakes():
+    items = repair_json(REPLY)
+    assert [item["task"] for item in items] == [
+        "Read chapters 1-2 of Wickham", "Work through Chapter 2 exercises", "Post three screenshots",
+    ]
+    assert items[0]["Description"] == 'Cover [basics] and "grammar"'
+    # Cut off mid-item: the incomplete item is dropped
+    truncated = REPLY[:REPLY.index('"Post three')]
+    assert [item["priority"] for item in repair_json(truncated)] == [1, "2"]
+    assert repair_json('Sure! {"task": "a"} Hope this helps.') == {"task": "a"}
+
+
+def test_stream_parser_returns_items_as_they_complete():
+    for size in (1, 7, 64):
+        parser = RoadmapStreamParser(marker="Final Answer:")
+        seen = []
+        for start in range(0, len(REPLY), size):
+            for item in parser.feed(REPLY[start:start + size]):
+                seen.append((item["task"], start + size))
+        assert [task for task, _ in seen] == [item["task"] for item in repair_json(REPLY)]
+        # The first item is available long before the reply ends
+        assert seen[0][1] < REPLY.index("Post three")
+        assert parser.close() == repair_json(REPLY)
+
+
+def test_converter_repairs_locally_without_the_llm():
+    # llm=None: falling back to CrewAI's LLM reformatting would raise
+    converter = LocalRepairConverter(text=REPLY, llm=None, model=Roadmap, instructions="")
+    roadmap = converter.to_pydantic()
+    assert roadmap.items[1].priority == 2
+    plan = json.loads(plan_to_json(SimpleNamespace(pydantic=roadmap, raw=REPLY)))
+    assert plan[0]["task"] == "Read chapters 1-2 of Wickham"
+    assert json.loads(plan_to_json(SimpleNamespace(pydantic=None, raw=REPLY))) == plan
+    assert plan_to_json(SimpleNamespace(pydantic=None, raw="no plan today")) == "no plan today"
+
+
+def test_streamed_chunks_become_roadmap_item_events():
+    task = SimpleNamespace(id=uuid.uuid4(), name="execution_task", description="", agent=None)
+    crew = SimpleNamespace(tasks=[task])
+    events = []
+    reporter = attach_progress(crew, events.append, "ggplot2", stream=True)
+    try:
+        for start in range(0, len(REPLY), 16):
+            crewai_event_bus.emit(None, LLMStreamChunkEvent(chunk=REPLY[start:start + 16], from_task=task))
+    finally:
+        reporter.close()
+    items = [event["item"]["task"] for event in events if event["event"] == "roadmap_item"]
+    assert items == [item["task"] for item in repair_json(REPLY)]
+
+
+def test_streaming_llm_falls_back_to_the_default_model(monkeypatch):
+    from calender.crew import streaming_llm
+
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-offline")
+    for name in ("MODEL", "MODEL_NAME", "OPENAI_MODEL_NAME"):
+        monkeypatch.delenv(name, raising=False)
+    llm = streaming_llm()
+    assert llm.model and llm.stream is True
+
+    monkeypatch.setenv("MODEL", "gpt-4o")
+    assert streaming_llm().model == "gpt-4o"
+
+
+if __name__ == "__main__":
+    test_repair_json_fixes_common_llm_mistakes()
+    test_stream_parser_returns_items_as_they_complete()
+    test_converter_repairs_locally_without_the_llm()
+    test_streamed_chunks_become_roadmap_item_events()
+    print("All plan parser tests passed.")
+
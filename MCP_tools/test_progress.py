@@ -0,0 +1,125 @@
+import os
+import sys
+import json
+import asyncio
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+os.environ.setdefault("CREWAI_TESTING", "true")
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+
+from crewai.agents.parser import AgentAction, AgentFinish
+from fastapi.testclient import TestClient
+from fastmcp import Client
+
+import api
+import mcp_server
+from calender.progress import ProgressReporter
+
+
+def _fake_crew():
+    agent = SimpleNamespace(role="{topic} Calendar and Operations Manager")
+    return SimpleNamespace(tasks=[SimpleNamespace(name="execution_task", agent=agent)])
+
+
+def _fake_run(topic, on_event=None, busy=(), cancel=None):
+    """Stands in for calender.main.run_cached: drives a reporter the way a real crew run does."""
+    reporter = ProgressReporter(on_event, topic)
+    crew = reporter.attach(_fake_crew())
+    crew.step_callback(AgentAction(thought="Need links", tool="search", tool_input='{"q": "ggplot2"}', text="", result="found"))
+    crew.step_callback(AgentFinish(thought="Done", output="[{\"task\": \"Read\"}]", text=""))
+    crew.task_callback(SimpleNamespace(name="execution_task", raw="[{\"task\": \"Read\"}]"))
+    return f"plan for {topic}"
+
+
+def test_reporter_maps_crew_callbacks_to_events():
+    events = []
+    _fake_run("Learn ggplot2", events.append)
+    assert [e["event"] for e in events] == [
+        "crew_started", "agent_started", "tool_called", "partial_output", "task_finished",
+    ]
+    assert events[1]["agent"] == "Learn ggplot2 Calendar and Operations Manager"
+    assert events[2]["tool"] == "search" and events[2]["result"] == "found"
+    assert events[4]["task"] == "execution_task"
+
+
+def test_real_crew_copy_fires_step_and_task_callbacks(monkeypatch):
+    from calender import main
+    from calender.template import CrewTemplate
+    from offline_stubs import _fake_llm_class
+
+    FakeLLM = _fake_llm_class()
+
+    def build(self):
+        template = self.crew_class().crew()
+        for agent in template.agents:
+            # As offline_stubs.install does: no remote research tools, and the fake LLM
+            agent.mcps = None
+            agent.llm = FakeLLM(latency=0)
+        return template
+
+    monkeypatch.setattr(CrewTemplate, "_build", build)
+    monkeypatch.setattr(main, "crew_template", CrewTemplate())
+    events = []
+    result = main.run("Learn ggplot2", on_event=events.append)
+
+    kinds = [event["event"] for event in events]
+    assert kinds[:2] == ["crew_started", "agent_started"]
+    # The agent's final answer comes through the step callback, then the task callback
+    assert "partial_output" in kinds and kinds[-1] == "task_finished"
+    assert kinds.index("partial_output") < kinds.index("task_finished")
+    assert events[1]["agent"].startswith("Learn ggplot2")
+    assert events[-1]["task"] == "execution_task"
+    assert "Step 1: " in events[kinds.index("partial_output")]["output"]
+    assert json.loads(main.plan_to_json(result))[0]["task"].startswith("Step 1")
+    # The next copy starts without this run's callbacks firing into it
+    assert main.crew_template.crew().tasks[0].output is None
+
+
+def test_run_stream_sends_sse_events():
+    original = api.run_cached
+    api.run_cached = _fake_run
+    try:
+        client = TestClient(api.app)
+        with client.stream("POST", "/run/stream", json={"input_task": "Learn ggplot2"}) as response:
+            assert response.headers["content-type"].startswith("text/event-stream")
+            body = "".join(response.iter_text())
+    finally:
+        api.run_cached = original
+
+    events = [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: ")]
+    assert [e["event"] for e in events] == [
+        "accepted", "crew_started", "agent_started", "tool_called", "partial_output", "task_finished", "crew_finished",
+    ]
+    assert events[-1]["result"] == "plan for Learn ggplot2"
+
+
+def test_planner_sends_mcp_progress_notifications():
+    original = mcp_server.run_cached
+    messages = []
+
+    async def on_progress(progress, total, message):
+        messages.append(message)
+
+    async def scenario():
+        async with Client(mcp_server.mcp) as client:
+            return await client.call_tool("task_and_schedule_planer", {"topic": "Learn ggplot2"}, progress_handler=on_progress)
+
+    mcp_server.run_cached = _fake_run
+    try:
+        result = asyncio.run(scenario())
+    finally:
+        mcp_server.run_cached = original
+
+    assert result.data == "plan for Learn ggplot2"
+    assert messages[0] == "Planning started"
+    assert "Tool called: search" in messages
+    assert messages[-1] == "Task finished: execution_task"
+
+
+if __name__ == "__main__":
+    test_reporter_maps_crew_callbacks_to_events()
+    test_run_stream_sends_sse_events()
+    test_planner_sends_mcp_progress_notifications()
+    print("All progress tests passed.")
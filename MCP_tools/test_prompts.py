@@ -0,0 +1,45 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+os.environ.setdefault("CREWAI_TESTING", "true")
+
+from calender.prompts import compact_agent_config, compact_preferences
+from calender.prompt_profile import profile_prompt
+
+PREFERENCES = """# WORK HOURS
+- Work Start Time: 08:30
+- Work End Time: 17:00
+- Lunch Break: 12:00 - 13:00
+
+# GENERAL
+- Do not schedule tasks on weekends unless explicitly requested.
+- Group similar tasks together (e.g., all emails in one block).
+"""
+
+
+def test_compact_preferences_keeps_every_rule():
+    block = compact_preferences(PREFERENCES)
+    assert block.splitlines()[0].startswith("Scheduling: work 08:30-17:00; breaks 12:00-13:00;")
+    assert "no weekends" in block
+    assert "- Group similar tasks together (e.g., all emails in one block)." in block
+    assert "#" not in block and "Work Start Time" not in block
+
+
+def test_compact_agent_config_drops_the_topic():
+    config = {"role": "{topic} Calendar Manager\n", "goal": "Plan {topic}.", "backstory": "b"}
+    compact = compact_agent_config(config)
+    assert compact["role"] == "Calendar Manager"
+    assert compact["goal"] == "Plan the topic in the task."
+    assert config["role"] == "{topic} Calendar Manager\n"
+
+
+def test_compact_prompt_sends_the_topic_once():
+    topic = "Module 2: ggplot2 exercises from chapter 2, " * 20
+    default = profile_prompt(topic, compact=False)
+    compact = profile_prompt(topic, compact=True)
+    assert default["topic_occurrences"] == 3
+    assert compact["topic_occurrences"] == 1
+    assert compact["total_tokens"] < default["total_tokens"] - 2 * default["topic_tokens"] * 0.9
+    assert compact["segments"]["preferences"] < default["segments"]["preferences"]
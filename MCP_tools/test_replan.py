@@ -0,0 +1,145 @@
+import os
+import sys
+import json
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+os.environ.setdefault("CREWAI_TESTING", "true")
+
+from calender.replan import _slot, replan
+from calender.scheduler import SlotScheduler, SchedulingConstraints
+
+# Next Monday morning, so the endpoint (which slots from now) keeps the same slots
+_today = datetime.now().replace(hour=8, minute=0, second=0, microsecond=0)
+START = _today + timedelta(days=7 - _today.weekday())
+TOPIC = "Prepare the Q4 board meeting"
+
+
+def _plan():
+    items = [
+        {"task": "Draft the agenda", "priority": 1, "duration_minutes": 60, "Description": "", "links": ""},
+        {"task": "Collect department numbers", "priority": 2, "duration_minutes": 90, "Description": "", "links": ""},
+        {"task": "Book the room", "priority": 3, "duration_minutes": 15, "Description": "", "links": ""},
+    ]
+    scheduled, _ = SlotScheduler(SchedulingConstraints(), (), START, 28).schedule(items)
+    return scheduled
+
+
+def _assert_no_overlap(plan):
+    slots = sorted(_slot(item) for item in plan)
+    assert all(earlier[1] <= later[0] for earlier, later in zip(slots, slots[1:]))
+
+
+def test_explicit_edits_need_no_llm_and_keep_other_slots():
+    plan = _plan()
+    delta = [
+        {"op": "update", "task": "collect department numbers", "set": {"duration_minutes": 120}},
+        {"op": "remove", "task": 3},
+        {"op": "add", "item": {"task": "Send the pre-read", "priority": 2, "duration_minutes": 30}},
+    ]
+    result = replan(plan, delta, start=START)
+
+    assert result["llm_calls"] == 0 and result["prompt_tokens"] == 0
+    assert result["kept"] == 1
+    assert sorted(result["rescheduled"]) == ["Collect department numbers", "Send the pre-read"]
+    by_task = {item["task"]: item for item in result["plan"]}
+    assert "Book the room" not in by_task
+    assert _slot(by_task["Draft the agenda"]) == _slot(plan[0])
+    numbers = _slot(by_task["Collect department numbers"])
+    assert (numbers[1] - numbers[0]).seconds == 120 * 60
+    _assert_no_overlap(result["plan"])
+
+
+def test_requests_are_answered_by_one_short_patch_call():
+    from calender.prompt_profile import profile_prompt
+
+    plan = _plan()
+    calls = []
+
+    def call_llm(messages):
+        calls.append(messages)
+        return json.dumps([
+            {"change": 1, "task": "Draft the agenda with the CFO", "priority": 1, "duration_minutes": 45},
+            {"change": 2, "task": "Rehearse the presentation", "priority": 2, "duration_minutes": 60},
+            {"change": 2, "task": "Print the handouts", "priority": 3, "duration_minutes": 20},
+        ])
+
+    delta = [
+        {"op": "revise", "task": 1, "request": "Do it together with the CFO"},
+        {"op": "add", "request": "Add a rehearsal and printed handouts"},
+        {"op": "remove", "task": "Book the room"},
+    ]
+    result = replan(plan, delta, call_llm, topic=TOPIC, start=START)
+
+    assert len(calls) == 1 and result["llm_calls"] == 1
+    prompt = calls[0][1]["content"]
+    # Only the revised item is sent in full; the others are listed by name
+    assert prompt.count("duration_minutes") == 1 and "2. Collect department numbers" in prompt
+    assert [item["task"] for item in result["plan"]].count("Draft the agenda") == 0
+    assert sorted(result["rescheduled"]) == [
+        "Draft the agenda with the CFO", "Print the handouts", "Rehearse the presentation"]
+    assert result["kept"] == 1
+    _assert_no_overlap(result["plan"])
+
+    full = profile_prompt(TOPIC)["total_tokens"]
+    assert result["prompt_tokens"] < full / 4
+
+
+def test_kept_slot_clashing_with_busy_moves_and_skipped_requests_are_reported():
+    plan = _plan()
+    # A meeting was booked over the first task since the plan was made
+    busy = [_slot(plan[0])]
+    delta = [
+        {"op": "revise", "task": 2, "request": "Split it per department"},
+        {"op": "add", "request": "Add a rehearsal"},
+    ]
+    reply = json.dumps([{"change": 2, "task": "Rehearse", "priority": 2, "duration_minutes": 30}])
+    result = replan(plan, delta, lambda messages: reply, busy=busy, start=START)
+
+    by_task = {item["task"]: item for item in result["plan"]}
+    assert "Draft the agenda" in result["rescheduled"]
+    assert _slot(by_task["Draft the agenda"]) != busy[0]
+    _assert_no_overlap(result["plan"] + [{"dateOnCalendar": busy[0][0].date().isoformat(),
+                                           "start_time": busy[0][0].time().isoformat(),
+                                           "end_time": busy[0][1].time().isoformat()}])
+    assert result["unanswered"] == [{"task": "Collect department numbers", "request": "Split it per department"}]
+    assert "Collect department numbers" in by_task and "Rehearse" in by_task
+
+
+def test_bad_delta_is_rejected():
+    plan = _plan()
+    with pytest.raises(ValueError, match="No roadmap item"):
+        replan(plan, [{"op": "remove", "task": "Unknown"}])
+    with pytest.raises(ValueError, match="need an LLM"):
+        replan(plan, [{"op": "add", "request": "One more thing"}])
+    with pytest.raises(ValueError, match="op must be one of"):
+        replan(plan, [{"op": "move", "task": 1}])
+
+
+def test_replan_endpoint_and_tool():
+    from fastapi.testclient import TestClient
+    from fastmcp import Client
+    import api
+    import mcp_server
+
+    delta = [{"op": "update", "task": 2, "set": {"priority": 1}}]
+    response = TestClient(api.app).post("/replan", json={"plan": _plan(), "delta": delta})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "success" and data["rescheduled"] == ["Collect department numbers"]
+
+    response = TestClient(api.app).post("/replan", json={"plan": _plan(), "delta": [{"op": "remove", "task": 9}]})
+    assert response.status_code == 400
+    # No fallback to a stored run: it could be another user's plan
+    assert TestClient(api.app).post("/replan", json={"delta": delta}).status_code == 422
+
+    async def scenario():
+        async with Client(mcp_server.mcp) as client:
+            return await client.call_tool("replan_tasks", {"plan": _plan(), "delta": delta})
+
+    result = json.loads(asyncio.run(scenario()).data)
+    assert result["llm_calls"] == 0 and len(result["plan"]) == 3
@@ -0,0 +1,130 @@
+import os
+import sys
+import json
+import time
+import random
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+from calender.scheduler import SchedulingConstraints, SlotScheduler, parse_preferences, schedule_plan
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Monday
+START = datetime(2026, 10, 12, 8, 0)
+
+
+def _minutes(value):
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _random_case(rng):
+    words = ["Write essay", "Team meeting", "Read chapter", "Email triage", "Code review call", "Urgent fix", "Errands"]
+    items = [
+        {
+            "task": rng.choice(words),
+            "priority": rng.randint(1, 7),
+            "duration_minutes": rng.choice([15, 30, 45, 60, 90, 120, 240]),
+            "DueDate": (START + timedelta(days=rng.randint(0, 20))).date().isoformat() if rng.random() < 0.3 else "",
+        }
+        for _ in range(rng.randint(1, 60))
+    ]
+    busy = []
+    for _ in range(rng.randint(0, 15)):
+        begin = START + timedelta(days=rng.randint(0, 13), minutes=rng.randint(0, 12 * 60))
+        busy.append((begin, begin + timedelta(minutes=rng.randint(15, 180))))
+    return items, busy
+
+
+def _check_invariants(constraints, items, busy, scheduled, unscheduled):
+    assert len(scheduled) + len(unscheduled) == len(items)
+    placed = []
+    for item in scheduled:
+        day = datetime.fromisoformat(item["dateOnCalendar"])
+        start, end = _minutes(item["start_time"]), _minutes(item["end_time"])
+        assert end - start == item["duration_minutes"]
+        # Working hours, no weekends, not before the start time
+        assert constraints.work_start <= start and end <= constraints.work_end
+        assert day.weekday() < 5
+        assert day.replace(hour=start // 60, minute=start % 60) >= START
+        # Breaks stay free
+        for break_start, break_end in constraints.breaks:
+            assert end <= break_start or start >= break_end
+        # Busy intervals stay free, with the buffer around them
+        begin_dt = day + timedelta(minutes=start)
+        end_dt = day + timedelta(minutes=end)
+        buffer = timedelta(minutes=constraints.buffer)
+        for busy_start, busy_end in busy:
+            assert end_dt + buffer <= busy_start or begin_dt >= busy_end + buffer
+        # Due dates are met
+        if item["DueDate"]:
+            assert item["dateOnCalendar"] <= item["DueDate"]
+        placed.append((begin_dt, end_dt))
+    # Tasks never overlap and keep the buffer between them
+    placed.sort()
+    for (_, previous_end), (next_start, _) in zip(placed, placed[1:]):
+        assert next_start - previous_end >= timedelta(minutes=constraints.buffer)
+
+
+def test_parse_preference_file():
+    with open(os.path.join(_SCRIPT_DIR, "knowledge", "user_preference.txt"), encoding="utf-8") as f:
+        constraints = parse_preferences(f.read())
+    assert constraints == SchedulingConstraints(
+        work_start=540, work_end=1080, breaks=[(720, 780)], default_duration=60, buffer=10,
+        weekends=False, deep_work_window=(540, 720), meeting_window=(840, 1020), keep_friday_afternoon_free=True,
+    )
+    assert parse_preferences("- Weekends are fine for study sessions.").weekends is True
+
+
+def test_schedule_respects_constraints_on_random_inputs():
+    constraints = SchedulingConstraints()
+    for seed in range(300):
+        rng = random.Random(seed)
+        items, busy = _random_case(rng)
+        scheduled, unscheduled = SlotScheduler(constraints, busy, START, horizon_days=21).schedule(items)
+        _check_invariants(constraints, items, busy, scheduled, unscheduled)
+
+
+def test_schedule_is_deterministic_and_prefers_windows():
+    items = [
+        {"task": "Team meeting", "priority": 2},
+        {"task": "Write essay draft", "priority": 1},
+        {"task": "Errands", "priority": 3},
+    ]
+    first = SlotScheduler(SchedulingConstraints(), start=START).schedule(items)
+    second = SlotScheduler(SchedulingConstraints(), start=START).schedule(items)
+    assert first == second
+    by_task = {item["task"]: item for item in first[0]}
+    assert by_task["Write essay draft"]["start_time"] == "09:00"
+    assert by_task["Team meeting"]["start_time"] == "14:00"
+    assert by_task["Errands"]["start_time"] == "10:10"
+
+
+def test_friday_afternoon_is_last_resort():
+    friday = datetime(2026, 10, 16, 12, 0)
+    scheduled, _ = SlotScheduler(SchedulingConstraints(), start=friday, horizon_days=4).schedule([{"task": "Errands"}])
+    # Friday afternoon is skipped for Monday; the weekend is never used
+    assert scheduled[0]["dateOnCalendar"] == "2026-10-19"
+    scheduled, _ = SlotScheduler(SchedulingConstraints(), start=friday, horizon_days=1).schedule([{"task": "Errands"}])
+    assert (scheduled[0]["dateOnCalendar"], scheduled[0]["start_time"]) == ("2026-10-16", "13:00")
+
+
+def test_schedule_plan_handles_hundreds_of_tasks_quickly():
+    items = [{"task": f"Task {i}", "priority": i % 7 + 1, "duration_minutes": 30 + i % 4 * 15} for i in range(500)]
+    start = time.perf_counter()
+    plan = json.loads(schedule_plan(json.dumps(items), start=START, constraints=SchedulingConstraints(), horizon_days=42))
+    elapsed = time.perf_counter() - start
+    assert len(plan) == 500
+    assert elapsed < 0.5, f"scheduling 500 tasks took {elapsed:.3f}s"
+    assert schedule_plan("not json") == "not json"
+
+
+if __name__ == "__main__":
+    test_parse_preference_file()
+    test_schedule_respects_constraints_on_random_inputs()
+    test_schedule_is_deterministic_and_prefers_windows()
+    test_friday_afternoon_is_last_resort()
+    test_schedule_plan_handles_hundreds_of_tasks_quickly()
+    print("All scheduler tests passed.")
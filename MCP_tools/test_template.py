@@ -0,0 +1,96 @@
+import os
+import sys
+from pathlib import Path
+
+import yaml
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+os.environ.setdefault("CREWAI_TESTING", "true")
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+
+from calender.template import CrewTemplate
+from offline_stubs import _fake_llm_class
+
+
+def _tiny_crew_class(config_dir: Path):
+    """A one-agent crew read from YAML files in `config_dir`, laid out like the Calender crew."""
+    FakeLLM = _fake_llm_class()
+
+    class TinyCrew:
+        base_directory = config_dir
+        original_agents_config_path = "agents.yaml"
+        original_tasks_config_path = "tasks.yaml"
+        builds = 0
+
+        def crew(self):
+            from crewai import Agent, Crew, Task
+
+            TinyCrew.builds += 1
+            agents = yaml.safe_load((config_dir / "agents.yaml").read_text())
+            tasks = yaml.safe_load((config_dir / "tasks.yaml").read_text())
+            agent = Agent(**agents["planner"], llm=FakeLLM(latency=0))
+            return Crew(agents=[agent], tasks=[Task(**tasks["plan"], agent=agent)])
+
+    return TinyCrew
+
+
+def _write_configs(config_dir: Path, goal: str):
+    (config_dir / "agents.yaml").write_text(yaml.safe_dump(
+        {"planner": {"role": "Planner", "goal": goal, "backstory": "Plans things."}}))
+    (config_dir / "tasks.yaml").write_text(yaml.safe_dump(
+        {"plan": {"description": "Plan {topic}", "expected_output": "A roadmap"}}))
+
+
+def _touch_later(path: Path):
+    # mtimes can tie within a filesystem tick; move the file's clearly forward
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_editing_a_watched_file_rebuilds_the_template(tmp_path):
+    _write_configs(tmp_path, "Plan {topic} well")
+    preferences = tmp_path / "preference.md"
+    preferences.write_text("Mornings only")
+    crew_class = _tiny_crew_class(tmp_path)
+    template = CrewTemplate(crew_class, preference_path=str(preferences))
+
+    first = template.template()
+    assert template.template() is first and crew_class.builds == 1
+
+    _write_configs(tmp_path, "Plan {topic} carefully")
+    _touch_later(tmp_path / "agents.yaml")
+    second = template.template()
+    assert second is not first and crew_class.builds == 2
+    assert second.agents[0].goal == "Plan {topic} carefully"
+
+    _touch_later(preferences)
+    assert template.template() is not second and crew_class.builds == 3
+    template.invalidate()
+    template.template()
+    assert crew_class.builds == 4
+
+
+def test_copies_do_not_share_task_outputs_or_callbacks(tmp_path):
+    _write_configs(tmp_path, "Plan {topic} well")
+    template = CrewTemplate(_tiny_crew_class(tmp_path), preference_path=str(tmp_path / "missing.md"))
+    first, second = template.crew(), template.crew()
+    assert first is not second and first.tasks[0] is not second.tasks[0]
+
+    finished = []
+    first.task_callback = lambda output: finished.append(("first", output.raw))
+    first.step_callback = lambda step: finished.append(("step", None))
+    assert second.task_callback is None and second.step_callback is None
+
+    first.kickoff(inputs={"topic": "Rust ownership"})
+    second.kickoff(inputs={"topic": "Garden beds"})
+
+    assert "Rust ownership" in first.tasks[0].output.raw and "Garden" not in first.tasks[0].output.raw
+    assert "Garden beds" in second.tasks[0].output.raw and "Rust" not in second.tasks[0].output.raw
+    # Only the first copy's callbacks fired, and only for its own run
+    assert [who for who, _ in finished if who == "first"] == ["first"]
+    assert all("Garden" not in (raw or "") for _, raw in finished)
+    # The template itself keeps no run state, so the next copy starts clean
+    shared = template.template()
+    assert shared.tasks[0].output is None and shared.task_callback is None
+    assert "{topic}" in template.crew().tasks[0].description
@@ -0,0 +1,116 @@
+import os
+import sys
+import io
+import json
+import time
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+from calender.triggers import Checkpoint, run_triggers
+
+PAYLOADS = [
+    '{"id": "a", "event": "slow"}',
+    '{"id": "b", "event": "fast"}',
+    'not json',
+    '',
+    '{"event": "no id"}',
+]
+
+
+def _runner(calls, fail=()):
+    lock = threading.Lock()
+
+    def run_payload(payload, cancel=None):
+        with lock:
+            calls.append(payload["event"])
+        if payload["event"] == "slow":
+            time.sleep(0.2)
+        if payload["event"] in fail:
+            raise RuntimeError(f"{payload['event']} failed")
+        return f"plan for {payload['event']}"
+    return run_payload
+
+
+def _records(output):
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_results_keep_input_order_or_follow_completion():
+    output = io.StringIO()
+    summary = run_triggers(PAYLOADS, _runner([]), output, max_concurrency=2)
+    records = _records(output)
+    assert [record["id"] for record in records] == ["a", "b", "#3", "#4"]
+    assert [record["status"] for record in records] == ["success", "success", "error", "success"]
+    assert records[0]["result"] == "plan for slow"
+    assert "Invalid JSON" in records[2]["error"]
+    assert summary["total"] == 4 and summary["failed"] == 1
+
+    output = io.StringIO()
+    run_triggers(PAYLOADS, _runner([]), output, max_concurrency=2, order="id")
+    # The slow payload finishes last
+    assert _records(output)[-1]["id"] == "a"
+
+
+def test_checkpoint_skips_finished_payloads(tmp_path):
+    path = str(tmp_path / "results.jsonl.checkpoint")
+    lines = [json.dumps({"id": str(i), "event": f"event {i}"}) for i in range(6)]
+
+    calls = []
+    checkpoint = Checkpoint(path)
+    summary = run_triggers(lines, _runner(calls, fail={"event 2", "event 4"}), io.StringIO(),
+                           checkpoint=checkpoint)
+    checkpoint.close()
+    assert summary["failed"] == 2 and len(calls) == 6
+
+    # The rerun only runs the payloads that failed, and writes every result
+    calls = []
+    checkpoint = Checkpoint(path)
+    output = io.StringIO()
+    summary = run_triggers(lines, _runner(calls), output, checkpoint=checkpoint)
+    checkpoint.close()
+    assert sorted(calls) == ["event 2", "event 4"]
+    assert summary["resumed"] == 4 and summary["failed"] == 0
+    assert [record["result"] for record in _records(output)] == [f"plan for event {i}" for i in range(6)]
+
+    # A changed payload under the same id runs again
+    calls = []
+    lines[0] = json.dumps({"id": "0", "event": "changed"})
+    checkpoint = Checkpoint(path)
+    run_triggers(lines, _runner(calls), io.StringIO(), checkpoint=checkpoint)
+    checkpoint.close(remove=True)
+    assert calls == ["changed"]
+    assert not os.path.exists(path)
+
+
+
+def test_a_slow_payload_pauses_reading_in_input_order(tmp_path):
+    from calender.triggers import READ_AHEAD
+
+    release = threading.Event()
+    read_before_release = []
+
+    def run_payload(payload, cancel=None):
+        if payload["id"] == "0":
+            release.wait(5)
+        return f"plan {payload['id']}"
+
+    def lines():
+        for i in range(100):
+            if not release.is_set():
+                read_before_release.append(i)
+            yield json.dumps({"id": str(i)})
+
+    threading.Timer(0.3, release.set).start()
+    path = str(tmp_path / "results.jsonl.checkpoint")
+    checkpoint = Checkpoint(path)
+    output = io.StringIO()
+    summary = run_triggers(lines(), run_payload, output, max_concurrency=4, checkpoint=checkpoint)
+    checkpoint.close()
+
+    # Results finished behind "0" are held, and reading stops once they fill the window
+    assert len(read_before_release) <= 4 * READ_AHEAD + 1
+    assert summary["succeeded"] == 100
+    assert [record["id"] for record in _records(output)] == [str(i) for i in range(100)]
+    # Runs finishing together journal whole lines
+    assert sorted(Checkpoint(path).done, key=int) == [str(i) for i in range(100)]
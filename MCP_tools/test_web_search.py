@@ -0,0 +1,109 @@
+import os
+import sys
+import time
+import asyncio
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+from offline_stubs import FakeSearchIndex
+from outbound import Dependency
+from search_backend import WebSearch, canonical_url, load_backend, normalize_query
+
+
+def test_near_identical_queries_share_a_cache_entry():
+    index = FakeSearchIndex(latency=0)
+    search = WebSearch(index, guard=Dependency("search", rate=0))
+
+    async def scenario():
+        first = await search.search("Rust budget")
+        again = await search.search("  rust BUDGET? ")
+        other = await search.search("rust budget", max_results=3)
+        return first, again, other
+
+    first, again, other = asyncio.run(scenario())
+    assert normalize_query('site:docs.rs "Rust  ownership"?') == 'site:docs.rs "rust ownership"'
+    assert again == first and len(other) == 3
+    assert index.searches == 2
+    assert search.cache.hits == 1
+
+
+def test_search_many_fans_out_and_drops_duplicate_urls():
+    index = FakeSearchIndex(latency=0.2)
+    search = WebSearch(index, guard=Dependency("search", rate=0))
+    queries = ["rust exam", "python exam", "Rust exam!", "exam review"]
+
+    start = time.perf_counter()
+    merged = asyncio.run(search.search_many(queries, max_results=5))
+    elapsed = time.perf_counter() - start
+
+    assert merged["queries"] == ["rust exam", "python exam", "exam review"]
+    assert index.searches == 3 and elapsed < 0.5
+    urls = [canonical_url(result["href"]) for result in merged["results"]]
+    assert len(urls) == len(set(urls)) < 15
+    # Interleaved by rank: each query's best page comes first
+    assert [result["query"] for result in merged["results"][:3]] == merged["queries"]
+    assert canonical_url("https://www.Example.com/a/?utm_source=x&id=2#top") == "https://example.com/a?id=2"
+
+
+def test_searches_are_rate_limited_and_failures_are_isolated():
+    class Flaky(FakeSearchIndex):
+        def text(self, query, max_results=5):
+            if "broken" in query:
+                raise RuntimeError("rate limited")
+            return super().text(query, max_results)
+
+    search = WebSearch(Flaky(latency=0), guard=Dependency("search", rate=10, burst=1))
+    start = time.perf_counter()
+    merged = asyncio.run(search.search_many(["rust", "python", "broken", "garden"]))
+    assert time.perf_counter() - start >= 0.3
+    assert merged["errors"] == [{"query": "broken", "error": "rate limited"}]
+    assert {result["query"] for result in merged["results"]} == {"rust", "python", "garden"}
+
+
+def test_web_search_many_tool():
+    from fastmcp import Client
+    import mcp_server
+
+    async def scenario():
+        async with Client(mcp_server.mcp) as client:
+            return await client.call_tool("web_search_many", {"queries": ["travel budget", "travel recipe"]})
+
+    original = mcp_server.web_searcher
+    mcp_server.web_searcher = WebSearch(FakeSearchIndex(latency=0), guard=Dependency("search", rate=0))
+    try:
+        text = asyncio.run(scenario()).data
+    finally:
+        mcp_server.web_searcher = original
+    assert text.startswith("Web Search Results:")
+    assert text.count("https://example.com/budget-travel") == 1
+
+
+def test_web_search_many_caps_results_per_query():
+    from fastmcp import Client
+    import mcp_server
+
+    asked = []
+
+    class RecordingIndex(FakeSearchIndex):
+        def text(self, query, max_results=5):
+            asked.append(max_results)
+            return super().text(query, max_results=max_results)
+
+    async def scenario():
+        async with Client(mcp_server.mcp) as client:
+            await client.call_tool("web_search_many", {"queries": ["rust", "garden"], "max_results": 500})
+
+    original = mcp_server.web_searcher
+    mcp_server.web_searcher = WebSearch(RecordingIndex(latency=0), guard=Dependency("search", rate=0))
+    try:
+        asyncio.run(scenario())
+    finally:
+        mcp_server.web_searcher = original
+    assert asked == [mcp_server.SEARCH_MAX_RESULTS] * 2
+
+
+def test_backend_is_read_from_the_environment_on_first_search(monkeypatch):
+    # Set after search_backend was imported, as offline_stubs.install does
+    monkeypatch.setenv("SEARCH_BACKEND", "offline_stubs:FakeSearchIndex")
+    assert isinstance(load_backend(), FakeSearchIndex)
+    assert isinstance(WebSearch(guard=Dependency("search", rate=0)).backend, FakeSearchIndex)
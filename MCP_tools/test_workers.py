@@ -0,0 +1,130 @@
+import os
+import sys
+import json
+import time
+import signal
+import threading
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
+
+from calender.cancellation import CANCELLED, CancelToken, RunCancelled
+from calender.metrics import CREW_PHASE, CREW_RUNS_CANCELLED, LLM_CALLS, WORKER_RESTARTS, Registry
+from calender.workers import WorkerPool
+
+
+@pytest.fixture
+def pool(monkeypatch, tmp_path):
+    # Workers read these when they install the offline fakes
+    monkeypatch.setenv("OFFLINE_LLM_LATENCY", "1")
+    monkeypatch.setenv("OFFLINE_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("LLM_CACHE_MODE", "off")
+    pool = WorkerPool(1, max_jobs=2, max_rss_mb=0, init="offline_stubs:install")
+    assert pool.wait_ready(), "crew worker did not start"
+    yield pool
+    pool.shutdown()
+
+
+def test_worker_plans_and_is_replaced_after_max_jobs(pool):
+    events = []
+    first_pid = pool.pids()
+    plan = json.loads(pool.plan("Learn Rust ownership", on_event=events.append))
+    assert plan[0]["task"].startswith("Step 1")
+    assert any(event["event"] == "task_finished" for event in events)
+
+    restarts = WORKER_RESTARTS.value(reason="max_jobs")
+    pool.plan("Learn Rust lifetimes")
+    assert WORKER_RESTARTS.value(reason="max_jobs") == restarts + 1
+    assert pool.wait_ready()
+    assert pool.pids() != first_pid
+
+
+def test_worker_metrics_are_merged_into_the_parent(pool):
+    calls, kickoffs = LLM_CALLS.value(), CREW_PHASE.count(phase="kickoff")
+    pool.plan("Learn Rust traits")
+    # Recorded in the worker process, shipped back with the result
+    assert LLM_CALLS.value() > calls
+    assert CREW_PHASE.count(phase="kickoff") == kickoffs + 1
+
+
+def test_registry_delta_round_trip():
+    worker, parent = Registry(), Registry()
+    worker.counter("runs_total", "Runs.").inc(2, kind="a")
+    before = worker.snapshot()
+    worker.counter("runs_total", "Runs.").inc(3, kind="a")
+    worker.counter("runs_total", "Runs.").inc(kind="b")
+    worker.gauge("busy", "Busy.").set(5)
+    worker.histogram("run_seconds", "Run time.", buckets=(1.0, 10.0)).observe(4)
+
+    parent.counter("runs_total", "Runs.").inc(10, kind="a")
+    parent.merge(worker.delta_since(before))
+    assert parent.counter("runs_total", "Runs.").value(kind="a") == 13
+    assert parent.counter("runs_total", "Runs.").value(kind="b") == 1
+    assert parent.histogram("run_seconds", "Run time.").count() == 1
+    assert "busy" not in parent.render()
+    assert worker.delta_since(worker.snapshot()) == []
+
+
+def test_worker_waits_for_on_event_before_calling_the_llm(pool):
+    events = []
+
+    def on_event(event):
+        events.append(event)
+        if event["event"] == "crew_started":
+            # A batch's LLM rate limit blocks here; the worker's first LLM call has to wait for it
+            time.sleep(0.5)
+
+    pool.plan("Learn Rust macros", on_event=on_event)
+    finished = next(event for event in events if event["event"] == "task_finished")
+    # Timed in the worker: the 0.5 s wait plus the fake LLM's 1 s
+    assert finished["elapsed"] >= 1.5
+
+
+def test_failing_on_event_returns_the_worker_to_the_pool(pool):
+    def on_event(event):
+        raise ValueError("client went away")
+
+    with pytest.raises(ValueError, match="client went away"):
+        pool.plan("Learn Rust async", on_event=on_event)
+    assert pool._idle.qsize() == 1
+    assert json.loads(pool.plan("After the failed callback"))
+
+
+def test_cancel_while_waiting_for_a_worker(pool):
+    busy = threading.Thread(target=pool.plan, args=("Busy topic",))
+    busy.start()
+    time.sleep(0.2)
+    token = CancelToken()
+    threading.Timer(0.3, token.cancel).start()
+    before = CREW_RUNS_CANCELLED.value(reason=CANCELLED, phase="queued")
+    with pytest.raises(RunCancelled) as info:
+        pool.plan("Cancelled topic", cancel=token)
+    assert info.value.reason == CANCELLED
+    assert CREW_RUNS_CANCELLED.value(reason=CANCELLED, phase="queued") == before + 1
+    busy.join()
+
+
+def test_cancelled_run_is_counted_once(pool):
+    before = CREW_RUNS_CANCELLED.value(reason=CANCELLED, phase="running")
+    for topic in ("Cancelled early", "Cancelled again"):
+        token = CancelToken()
+
+        def on_event(event):
+            # Cancelled before the worker's first LLM call, which then refuses to run
+            if event["event"] == "crew_started":
+                token.cancel()
+
+        with pytest.raises(RunCancelled):
+            pool.plan(topic, on_event=on_event, cancel=token)
+    assert CREW_RUNS_CANCELLED.value(reason=CANCELLED, phase="running") == before + 2
+
+
+def test_crashed_worker_is_replaced(pool):
+    pid = pool.pids()[0]
+    threading.Timer(0.3, os.kill, (pid, signal.SIGKILL)).start()
+    with pytest.raises(Exception, match="exited during the run"):
+        pool.plan("Crash topic")
+    assert pool.wait_ready()
+    assert pool.pids() != [pid]
+    assert json.loads(pool.plan("After the crash"))